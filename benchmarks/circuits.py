@@ -0,0 +1,402 @@
+"""
+Performance benchmark of the zkSNARK circuits.
+
+Every benchmark compiles a small main circuit instantiating a template of circuits/circuits (SSZ, Poseidon,
+SHA-256, hash to field, the pairing library) or a reduced-size variant of the step and rotate circuits, with a sync
+committee of SYNC_COMMITTEE_SIZE validators. Valid inputs (keys, signatures) are generated with py_ecc.
+For every benchmark it reports the number of constraints (read from the r1cs header), the witness generation time
+and the rapidsnark proving time. Results can be stored as a baseline, later runs are compared against it and the
+benchmarks whose templates changed are reported.
+
+Usage (from the repository root):
+    python -m benchmarks.circuits run [--only NAME ...] [--no-prove] [--save-baseline]
+    python -m benchmarks.circuits list
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import struct
+import time
+
+from py_ecc.bls.hash_to_curve import hash_to_field_FQ2, hash_to_G2
+from py_ecc.bls.point_compression import compress_G1
+from py_ecc.optimized_bls12_381 import G1, multiply, normalize, curve_order, field_modulus
+
+from utils.circuit_build import INCLUDE_PATHS, source_digests, digest, snarkjs, run_command
+from utils.poseidon import N, K, to_limbs, sync_committee_poseidon
+
+BENCH_DIR = './build/bench'
+BASELINE_FILE = './benchmarks/baselines/circuits.json'
+PROVER = './resources/rapidsnark/build/prover'
+# The smallest available ptau fitting the circuit is used for the setup
+PTAU_PATTERN = './resources/powersOfTau28_hez_final_{:02d}.ptau'
+MAX_PTAU_POWER = 28
+
+SYNC_COMMITTEE_SIZE = 16
+LOG_2_SYNC_COMMITTEE_SIZE = 4
+G1_POINT_SIZE = 48
+DST = b'BLS_SIG_BLS12381G2_XMD:SHA-256_SSWU_RO_POP_'
+
+WITNESS_RUNS = 3
+# Relative increase of the witness or proving time reported as a regression (any increase of constraints is one)
+TIME_REGRESSION_THRESHOLD = 0.1
+
+ROTATE_REDUCED = '''
+template RotateReduced(SYNC_COMMITTEE_SIZE, LOG_2_SYNC_COMMITTEE_SIZE, N, K) {
+    signal input pubkeysBytes[SYNC_COMMITTEE_SIZE][48];
+    signal input aggregatePubkeyBytes[48];
+    signal input pubkeysBigIntX[SYNC_COMMITTEE_SIZE][K];
+    signal input pubkeysBigIntY[SYNC_COMMITTEE_SIZE][K];
+    signal output syncCommitteeSSZ[32];
+    signal output syncCommitteePoseidon;
+
+    component g1BytesToBigInt[SYNC_COMMITTEE_SIZE];
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        g1BytesToBigInt[i] = G1BytesToBigInt(N, K, 48);
+        for (var j = 0; j < 48; j++) {
+            g1BytesToBigInt[i].in[j] <== pubkeysBytes[i][j];
+        }
+        for (var j = 0; j < K; j++) {
+            g1BytesToBigInt[i].out[j] === pubkeysBigIntX[i][j];
+        }
+    }
+
+    component sszSyncCommittee = SSZPhase0SyncCommittee(SYNC_COMMITTEE_SIZE, LOG_2_SYNC_COMMITTEE_SIZE, 48);
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        for (var j = 0; j < 48; j++) {
+            sszSyncCommittee.pubkeys[i][j] <== pubkeysBytes[i][j];
+        }
+    }
+    for (var i = 0; i < 48; i++) {
+        sszSyncCommittee.aggregatePubkey[i] <== aggregatePubkeyBytes[i];
+    }
+    for (var i = 0; i < 32; i++) {
+        syncCommitteeSSZ[i] <== sszSyncCommittee.out[i];
+    }
+
+    component computePoseidonRoot = PoseidonG1Array(SYNC_COMMITTEE_SIZE, N, K);
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        for (var j = 0; j < K; j++) {
+            computePoseidonRoot.pubkeys[i][0][j] <== pubkeysBigIntX[i][j];
+            computePoseidonRoot.pubkeys[i][1][j] <== pubkeysBigIntY[i][j];
+        }
+    }
+    syncCommitteePoseidon <== computePoseidonRoot.out;
+}
+'''
+
+FINAL_EXPONENTIATE = '''
+template FinalExponentiateBLS(N, K) {
+    var q[50] = get_BLS12_381_prime(N, K);
+    signal input in[6][2][K];
+    signal output out[6][2][K];
+
+    component finalExponentiate = FinalExponentiate(N, K, q);
+    for (var i = 0; i < 6; i++) for (var j = 0; j < 2; j++) for (var l = 0; l < K; l++) {
+        finalExponentiate.in[i][j][l] <== in[i][j][l];
+    }
+    for (var i = 0; i < 6; i++) for (var j = 0; j < 2; j++) for (var l = 0; l < K; l++) {
+        out[i][j][l] <== finalExponentiate.out[i][j][l];
+    }
+}
+'''
+
+
+class Committee:
+    """
+    Deterministic test sync committee with an aggregated signature over a random signing root
+    """
+
+    def __init__(self, seed=0, size=SYNC_COMMITTEE_SIZE):
+        self.rng = random.Random(seed)
+        self.secret_keys = [self.rng.randrange(1, curve_order) for _ in range(size)]
+        self.points = [multiply(G1, secret_key) for secret_key in self.secret_keys]
+        self.pubkeys = [normalize(point) for point in self.points]
+        self.bits = [1 if i == 0 or self.rng.random() < 0.9 else 0 for i in range(size)]
+        self.signing_root = self.random_bytes(32)
+        aggregate_secret_key = sum(sk for sk, bit in zip(self.secret_keys, self.bits) if bit) % curve_order
+        self.signature = normalize(multiply(hash_to_G2(bytes(self.signing_root), DST, hashlib.sha256),
+                                            aggregate_secret_key))
+
+    def random_bytes(self, length):
+        return [self.rng.randrange(256) for _ in range(length)]
+
+    def pubkey_bytes(self):
+        return [list(compress_G1(point).to_bytes(G1_POINT_SIZE, 'big')) for point in self.points]
+
+    def pubkey_limbs(self):
+        return [[to_limbs(int(x)), to_limbs(int(y))] for x, y in self.pubkeys]
+
+    def signature_limbs(self):
+        return [fp2_limbs(point) for point in self.signature]
+
+    def poseidon(self):
+        return int(sync_committee_poseidon([bytes(pubkey) for pubkey in self.pubkey_bytes()]), 16)
+
+
+def fp2_limbs(element):
+    return [to_limbs(int(coefficient)) for coefficient in element.coeffs]
+
+
+def sha256_inputs():
+    return {'in': Committee().random_bytes(64)}
+
+
+def hash_to_field_inputs():
+    return {'msg': Committee().random_bytes(32)}
+
+
+def ssz_inputs():
+    committee = Committee()
+    return {'pubkeys': committee.pubkey_bytes(), 'aggregatePubkey': committee.random_bytes(G1_POINT_SIZE)}
+
+
+def poseidon_inputs():
+    return {'pubkeys': Committee().pubkey_limbs()}
+
+
+def g1_add_many_inputs():
+    committee = Committee()
+    return {'pubkeys': committee.pubkey_limbs(), 'bits': committee.bits}
+
+
+def final_exponentiate_inputs():
+    rng = random.Random(0)
+    return {'in': [[to_limbs(rng.randrange(field_modulus)) for _ in range(2)] for _ in range(6)]}
+
+
+def core_verify_inputs():
+    committee = Committee(size=1)
+    return {
+        'pubkey': committee.pubkey_limbs()[0],
+        'signature': committee.signature_limbs(),
+        'hash': [fp2_limbs(u) for u in hash_to_field_FQ2(bytes(committee.signing_root), 2, DST, hashlib.sha256)],
+    }
+
+
+def step_inputs():
+    committee = Committee()
+    return {
+        'pubkeys': committee.pubkey_limbs(),
+        'aggregationBits': committee.bits,
+        'signature': committee.signature_limbs(),
+        'signingRoot': committee.signing_root,
+        'syncCommitteeRoot': committee.poseidon(),
+    }
+
+
+def rotate_inputs():
+    committee = Committee()
+    limbs = committee.pubkey_limbs()
+    return {
+        'pubkeysBytes': committee.pubkey_bytes(),
+        'aggregatePubkeyBytes': committee.pubkey_bytes()[0],
+        'pubkeysBigIntX': [x for x, _ in limbs],
+        'pubkeysBigIntY': [y for _, y in limbs],
+    }
+
+
+S, L = SYNC_COMMITTEE_SIZE, LOG_2_SYNC_COMMITTEE_SIZE
+# name: (included files, main circuit source, input generator)
+BENCHMARKS = {
+    'sha256_bytes_64': (['sha256.circom'], 'component main = Sha256Bytes(64);', sha256_inputs),
+    'hash_to_field': (['hash_to_field.circom'], 'component main = HashToField(32);', hash_to_field_inputs),
+    'ssz_sync_committee': (['ssz.circom'], f'component main = SSZPhase0SyncCommittee({S}, {L}, {G1_POINT_SIZE});',
+                           ssz_inputs),
+    'poseidon_g1_array': (['poseidon.circom'], f'component main = PoseidonG1Array({S}, {N}, {K});', poseidon_inputs),
+    'g1_add_many': (['bls.circom'], f'component main = G1AddMany({S}, {L}, {N}, {K});', g1_add_many_inputs),
+    'final_exponentiate': (['pairing/final_exp.circom', 'pairing/bls12_381_func.circom'],
+                           FINAL_EXPONENTIATE + f'component main = FinalExponentiateBLS({N}, {K});',
+                           final_exponentiate_inputs),
+    'core_verify_pubkey_g1': (['pairing/bls_signature.circom'], f'component main = CoreVerifyPubkeyG1({N}, {K});',
+                              core_verify_inputs),
+    'step_reduced': (['sync_committee.circom'],
+                     'component main {public [signingRoot, syncCommitteeRoot]} = '
+                     f'VerifySyncCommitteeSignature({S}, {L}, {N}, {K});',
+                     step_inputs),
+    'rotate_reduced': (['bls.circom', 'ssz.circom', 'poseidon.circom'],
+                       ROTATE_REDUCED + f'component main = RotateReduced({S}, {L}, {N}, {K});', rotate_inputs),
+}
+
+
+def stringify(value):
+    """
+    Inputs as expected by the witness generator: numbers as decimal strings, big integers included
+    """
+    if isinstance(value, (list, tuple)):
+        return [stringify(item) for item in value]
+    if isinstance(value, dict):
+        return {key: stringify(item) for key, item in value.items()}
+    return str(int(value))
+
+
+def read_r1cs_header(path):
+    """
+    Read the header section of a r1cs file (iden3 binary format)
+    """
+    with open(path, 'rb') as file:
+        magic, _, sections = struct.unpack('<4sII', file.read(12))
+        assert magic == b'r1cs', f"{path} is not a r1cs file"
+        for _ in range(sections):
+            section_type, size = struct.unpack('<IQ', file.read(12))
+            if section_type == 1:
+                field_size, = struct.unpack('<I', file.read(4))
+                file.seek(field_size, 1)
+                wires, public_outputs, public_inputs, private_inputs, _, constraints = \
+                    struct.unpack('<IIIIQI', file.read(28))
+                return {
+                    'constraints': constraints,
+                    'wires': wires,
+                    'public_outputs': public_outputs,
+                    'public_inputs': public_inputs,
+                    'private_inputs': private_inputs,
+                }
+            file.seek(size, 1)
+    raise ValueError(f"{path} has no header section")
+
+
+def select_ptau(header):
+    """
+    Return the smallest available ptau supporting the circuit, None if there is none
+    """
+    power = (header['constraints'] + header['public_inputs'] + header['public_outputs']).bit_length()
+    for candidate in range(power, MAX_PTAU_POWER + 1):
+        if os.path.exists(PTAU_PATTERN.format(candidate)):
+            return PTAU_PATTERN.format(candidate)
+    return None
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'bench_manifest.json'), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(directory, manifest):
+    with open(os.path.join(directory, 'bench_manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+
+def timed(command):
+    start_time = time.perf_counter()
+    peak_rss = run_command(command)
+    return time.perf_counter() - start_time, peak_rss
+
+
+def run_benchmark(name, prove):
+    """
+    Compile (if the sources changed), generate the witness and prove a benchmark circuit
+    """
+    includes, main, inputs = BENCHMARKS[name]
+    directory = os.path.join(BENCH_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    main_path = os.path.join(directory, f'{name}.circom')
+    with open(main_path, 'w') as file:
+        file.write('pragma circom 2.0.5;\n\n')
+        file.write(''.join(f'include "{include}";\n' for include in includes))
+        file.write(main + '\n')
+    input_path = os.path.join(directory, 'input.json')
+    with open(input_path, 'w') as file:
+        json.dump(stringify(inputs()), file)
+
+    manifest = read_manifest(directory)
+    r1cs = os.path.join(directory, f'{name}.r1cs')
+    witness_generator = os.path.join(directory, f'{name}_cpp', name)
+    fingerprint = digest(source_digests(main_path))
+    if manifest.get('sources') != fingerprint or not os.path.exists(witness_generator):
+        include_flags = [flag for path in INCLUDE_PATHS for flag in ['-l', path]]
+        compile_s, _ = timed(['circom', main_path, '--O1', '--r1cs', '--c', *include_flags, '--output', directory])
+        run_command(['make', '-C', os.path.join(directory, f'{name}_cpp')])
+        manifest = {'sources': fingerprint, 'compile_s': compile_s}
+        write_manifest(directory, manifest)
+
+    result = {'sources': fingerprint, 'compile_s': manifest['compile_s'], **read_r1cs_header(r1cs)}
+
+    witness = os.path.join(directory, 'witness.wtns')
+    result['witness_s'] = statistics.median(
+        timed([witness_generator, input_path, witness])[0] for _ in range(WITNESS_RUNS))
+
+    if prove:
+        ptau = select_ptau(result)
+        if ptau is None:
+            print(f"{name}: no ptau large enough, proving skipped")
+            return result
+        zkey = os.path.join(directory, f'{name}.zkey')
+        if manifest.get('zkey') != [fingerprint, ptau] or not os.path.exists(zkey):
+            run_command(snarkjs('groth16', 'setup', r1cs, ptau, zkey))
+            manifest['zkey'] = [fingerprint, ptau]
+            write_manifest(directory, manifest)
+        result['prove_s'], result['prove_peak_rss'] = timed([
+            PROVER, zkey, witness, os.path.join(directory, 'proof.json'), os.path.join(directory, 'public.json')])
+    return result
+
+
+def compare(report, baseline):
+    """
+    Print the changes with respect to the baseline, return the regressions found
+    """
+    regressions = []
+    for name, result in report.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base['sources'] != result['sources']:
+            print("  %-24s templates changed" % name)
+        change = result['constraints'] - base['constraints']
+        print("  %-24s %-12s %+d" % (name, 'constraints', change))
+        if change > 0:
+            regressions.append((name, 'constraints', change / base['constraints']))
+        for metric in ['witness_s', 'prove_s']:
+            if metric not in result or metric not in base:
+                continue
+            change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0
+            print("  %-24s %-12s %+.2f%%" % (name, metric, change * 100))
+            if change > TIME_REGRESSION_THRESHOLD:
+                regressions.append((name, metric, change))
+    return regressions
+
+
+def run(only, prove, save_baseline):
+    report = {}
+    for name in only or BENCHMARKS:
+        result = run_benchmark(name, prove)
+        report[name] = result
+        print("%-24s constraints %10d  witness %8.3f s%s" % (
+            name, result['constraints'], result['witness_s'],
+            "  prove %8.3f s  peak memory %.2f GiB" % (result['prove_s'], result['prove_peak_rss'] / 2 ** 30)
+            if 'prove_s' in result else ''))
+
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r') as file:
+            baseline = json.load(file)
+        print("Change with respect to the baseline:")
+        for regression in compare(report, baseline):
+            print("REGRESSION: %s %s %+.2f%%" % (*regression[:2], regression[2] * 100))
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+        with open(BASELINE_FILE, 'w') as file:
+            json.dump(report, file, indent=2)
+        print("Baseline written to", BASELINE_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Constraint count, witness and proving time of the circuits")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="list the benchmarks")
+    run_parser = subparsers.add_parser('run', help="run the benchmarks and compare them with the baseline")
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=None)
+    run_parser.add_argument('--no-prove', action='store_true', help="skip the setup and the proving")
+    run_parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name, (includes, _, _) in BENCHMARKS.items():
+            print("%-24s %s" % (name, ', '.join(includes)))
+    else:
+        run(args.only, not args.no_prove, args.save_baseline)
@@ -0,0 +1,293 @@
+"""
+Gas and calldata benchmark for the light client contract.
+
+Recorded beacon chain data (bootstrap, sync committee updates and finality updates) is replayed against a
+freshly deployed light client, either on an in-process EVM (eth-tester) or on a local development node.
+The Groth16 verifiers are replaced by stubs accepting any proof, so that no proving is needed: the measured gas
+covers everything but the pairing checks, which have a constant cost per proof.
+
+For every call it reports the gas used, the calldata size and the time spent by contract_middleware to encode it.
+Results can be stored as a baseline, later runs are compared against it.
+
+Usage (from the repository root):
+    python -m benchmarks.gas record [--finality-updates N] [--interval SECONDS]
+    python -m benchmarks.gas run [--rpc URL] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from utils.beacon_middleware import beacon_api, get_trusted_block_root, ENDPOINT_NODE_URL
+from utils.parsing import parse_light_client_bootstrap, parse_light_client_update, parse_light_client_finality_update
+from utils.specs import Root, compute_sync_committee_period_at_slot, is_sync_committee_update
+from utils.ssz.ssz_impl import hash_tree_root
+from utils import contract_middleware
+
+from relay import finality_update_to_light_client_update
+
+RECORDING_FILE = './benchmarks/data/recording.json'
+BASELINE_FILE = './benchmarks/baselines/gas.json'
+# Relative increase (gas or calldata) reported as a regression when comparing against the baseline
+REGRESSION_THRESHOLD = 0.01
+
+STUB_PROOF = [[0, 0], [[0, 0], [0, 0]], [0, 0]]
+
+# Verifiers accepting any proof, they replace the ones generated by snarkjs
+STUB_VERIFIERS = {
+    'BLSAggregatedSignatureVerifier.sol': '''pragma solidity ^0.8.17;
+
+contract BLSAggregatedSignatureVerifier {
+    function verifySignatureProof(
+        uint256[2] memory,
+        uint256[2][2] memory,
+        uint256[2] memory,
+        uint256[33] memory
+    ) public pure returns (bool) {
+        return true;
+    }
+}
+''',
+    'PoseidonCommitmentVerifier.sol': '''pragma solidity ^0.8.17;
+
+contract PoseidonCommitmentVerifier {
+    function verifyCommitmentMappingProof(
+        uint256[2] memory,
+        uint256[2][2] memory,
+        uint256[2] memory,
+        uint256[33] memory
+    ) public pure returns (bool) {
+        return true;
+    }
+}
+''',
+}
+
+
+def record(finality_updates, interval):
+    """
+    Record a bootstrap, the sync committee update of its period and a sequence of finality updates
+    """
+    trusted_block_root = get_trusted_block_root()
+    bootstrap = beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/bootstrap/{trusted_block_root}")['data']
+    genesis_validators_root = beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/genesis")['data']['genesis_validators_root']
+    period = compute_sync_committee_period_at_slot(int(bootstrap['header']['beacon']['slot']))
+    updates = beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/updates?start_period={period}&count=1")
+
+    recorded_finality_updates = []
+    for i in range(finality_updates):
+        if i > 0:
+            time.sleep(interval)
+        recorded_finality_updates.append(
+            beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/finality_update")['data'])
+        print("Recorded finality update", i + 1, "of", finality_updates)
+
+    os.makedirs(os.path.dirname(RECORDING_FILE), exist_ok=True)
+    with open(RECORDING_FILE, 'w') as file:
+        json.dump({
+            'trusted_block_root': str(trusted_block_root),
+            'genesis_validators_root': genesis_validators_root,
+            'bootstrap': bootstrap,
+            'updates': [update['data'] for update in updates],
+            'finality_updates': recorded_finality_updates,
+        }, file)
+    print("Recording written to", RECORDING_FILE)
+
+
+def stub_contracts(directory):
+    """
+    Copy the contracts into the given directory replacing the Groth16 verifiers with stubs
+    """
+    shutil.copytree('./contracts', directory, dirs_exist_ok=True)
+    for name, source in STUB_VERIFIERS.items():
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write(source)
+
+
+def stub_poseidon(sync_committee):
+    """
+    Stand-in for the poseidon commitment of a sync committee, accepted by the stubbed verifiers
+    """
+    return str(hash_tree_root(sync_committee))
+
+
+def measure(target, function, call):
+    """
+    Encode and send a contract call, returning its gas, calldata size and encoding time
+    """
+    start_time = time.perf_counter()
+    data = call.build_transaction({'gas': contract_middleware.TRANSACTION_GAS})['data']
+    encode_time = time.perf_counter() - start_time
+
+    result = {
+        'function': function,
+        'gas': 0,
+        'calldata_bytes': (len(data) - 2) // 2,
+        'encode_ms': encode_time * 1000,
+        'status': 0,
+    }
+    # the in-process EVM raises on reverted transactions, a development node returns a failed receipt
+    try:
+        receipt = target.transact(call)
+    except Exception as e:
+        print("Transaction reverted:", e)
+        return result
+    result['gas'] = receipt.gasUsed
+    result['status'] = receipt.status
+    return result
+
+
+def replay(recording, mode, committee_commitment, provider, contracts_dir):
+    """
+    Deploy a light client and replay the recording, in the given calldata mode
+    """
+    target = contract_middleware.LightClientTarget(mode, provider)
+    target.deploy(*contract_middleware.compile_contract(contracts_dir))
+    genesis_validators_root = Root(recording['genesis_validators_root'])
+    bootstrap = parse_light_client_bootstrap(recording['bootstrap'])
+    results = []
+
+    # encoding the bootstrap includes serializing it
+    start_time = time.perf_counter()
+    call = target.initialize_light_client_store_call(
+        bootstrap, Root(recording['trusted_block_root']),
+        stub_poseidon(bootstrap.current_sync_committee), genesis_validators_root)
+    serialize_time = time.perf_counter() - start_time
+    result = measure(target, 'initializeLightClientStore', call)
+    result['encode_ms'] += serialize_time * 1000
+    results.append(result)
+
+    # local view of the store, used to choose the overload and the signing sync committee
+    beacon_slot = bootstrap.header.beacon.slot
+    current_sync_committee = bootstrap.current_sync_committee
+    next_sync_committee = None
+
+    updates = [parse_light_client_update(update) for update in recording['updates']]
+    updates += [finality_update_to_light_client_update(parse_light_client_finality_update(update))
+                for update in recording['finality_updates']]
+
+    for update in updates:
+        store_period = compute_sync_committee_period_at_slot(beacon_slot)
+        signature_period = compute_sync_committee_period_at_slot(update.signature_slot)
+        finalized_period = compute_sync_committee_period_at_slot(update.finalized_header.beacon.slot)
+        sync_committee = current_sync_committee if signature_period == store_period else next_sync_committee
+
+        function = 'processLightClientUpdate'
+        poseidon = None
+        rotation = is_sync_committee_update(update) and (
+            next_sync_committee is None or finalized_period == store_period + 1)
+        if rotation:
+            function += '[sync committee update]'
+            poseidon = stub_poseidon(update.next_sync_committee)
+
+        start_time = time.perf_counter()
+        call = target.process_light_client_update_call(
+            update, update.signature_slot, sync_committee, STUB_PROOF,
+            poseidon, STUB_PROOF if rotation else None, committee_commitment)
+        serialize_time = time.perf_counter() - start_time
+        result = measure(target, function, call)
+        result['encode_ms'] += serialize_time * 1000
+        results.append(result)
+
+        if rotation:
+            if next_sync_committee is None:
+                next_sync_committee = update.next_sync_committee
+            else:
+                current_sync_committee = next_sync_committee
+                next_sync_committee = update.next_sync_committee
+        if update.finalized_header.beacon.slot > beacon_slot:
+            beacon_slot = update.finalized_header.beacon.slot
+
+    return results
+
+
+def summarize(results):
+    """
+    Aggregate per function results
+    """
+    summary = {}
+    for result in results:
+        summary.setdefault(result['function'], []).append(result)
+    return {
+        function: {
+            'calls': len(rows),
+            'gas_mean': statistics.mean(row['gas'] for row in rows),
+            'gas_max': max(row['gas'] for row in rows),
+            'calldata_bytes_mean': statistics.mean(row['calldata_bytes'] for row in rows),
+            'encode_ms_mean': statistics.mean(row['encode_ms'] for row in rows),
+        }
+        for function, rows in summary.items()
+    }
+
+
+def compare(report, baseline):
+    """
+    Print the relative change of gas and calldata with respect to the baseline, return the regressions found
+    """
+    regressions = []
+    for mode, summary in report.items():
+        for function, stats in summary.items():
+            base = baseline.get(mode, {}).get(function)
+            if base is None:
+                continue
+            for metric in ['gas_mean', 'calldata_bytes_mean']:
+                change = (stats[metric] - base[metric]) / base[metric] if base[metric] else 0
+                print("  %-12s %-45s %-20s %+.2f%%" % (mode, function, metric, change * 100))
+                if change > REGRESSION_THRESHOLD:
+                    regressions.append((mode, function, metric, change))
+    return regressions
+
+
+def run(rpc, save_baseline):
+    with open(RECORDING_FILE, 'r') as file:
+        recording = json.load(file)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as contracts_dir:
+        stub_contracts(contracts_dir)
+        for mode, committee_commitment in [('committee', False), ('commitment', True)]:
+            if rpc is None:
+                from web3 import EthereumTesterProvider
+                provider = EthereumTesterProvider()
+            else:
+                from web3 import HTTPProvider
+                provider = HTTPProvider(rpc, request_kwargs={'timeout': 300})
+            results = replay(recording, mode, committee_commitment, provider, contracts_dir)
+            for result in results:
+                print("%-12s %-45s gas %10d  calldata %7d B  encode %8.2f ms%s" % (
+                    mode, result['function'], result['gas'], result['calldata_bytes'], result['encode_ms'],
+                    '' if result['status'] == 1 else '  (reverted)'))
+            report[mode] = summarize(results)
+
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r') as file:
+            baseline = json.load(file)
+        print("Change with respect to the baseline:")
+        for regression in compare(report, baseline):
+            print("REGRESSION: %s %s %s %+.2f%%" % (*regression[:3], regression[3] * 100))
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+        with open(BASELINE_FILE, 'w') as file:
+            json.dump(report, file, indent=2)
+        print("Baseline written to", BASELINE_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gas and calldata benchmark for the light client contract")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help="record beacon chain data to replay")
+    record_parser.add_argument('--finality-updates', type=int, default=3)
+    record_parser.add_argument('--interval', type=int, default=384, help="seconds between finality updates")
+    run_parser = subparsers.add_parser('run', help="replay the recording and report the costs")
+    run_parser.add_argument('--rpc', default=None, help="local development node, in-process EVM if omitted")
+    run_parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.finality_updates, args.interval)
+    else:
+        run(args.rpc, args.save_baseline)
@@ -0,0 +1,272 @@
+"""
+Replay harness running the relayer end to end without a beacon chain node, a public destination chain or the circuits.
+
+The recording of benchmarks/gas.py is served by a local stand-in of the beacon chain node API, which publishes the
+finality updates as the node did: at any time, the latest one whose signature slot has started. The relayer
+(relay.main) runs against it driven by an accelerated clock (see utils/clock), on an in-process EVM (eth-tester) or
+a local development node, with the Groth16 verifiers of the contracts replaced by stubs. Proving is replaced by a
+fake prover returning stub proofs, optionally after a fixed delay, so that the measures cover everything else.
+
+For every update it reports the latency from its publication by the stand-in to the transaction receipt,
+together with the throughput of the run.
+
+Usage (from the repository root):
+    python -m benchmarks.replay [--speed N] [--rpc URL] [--prover-delay SECONDS] [--optimistic]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from utils.specs import compute_sync_committee_period_at_slot, is_sync_committee_update
+from utils import beacon_middleware, clock, contract_middleware
+
+import relay
+from benchmarks.gas import RECORDING_FILE, STUB_PROOF, stub_contracts, stub_poseidon
+
+DEFAULT_SPEED = 100
+# Clock seconds the relayer keeps running after the publication of the last finality update
+DRAIN_SECONDS = 3 * relay.FINALITY_UPDATE_POLL_INTERVAL
+# Real seconds between two checks of the end of the replay
+END_CHECK_INTERVAL = 0.1
+
+
+def signature_slot(update) -> int:
+    return int(update['signature_slot'])
+
+
+def attested_slot(update) -> int:
+    return int(update['attested_header']['beacon']['slot'])
+
+
+class BeaconNodeStandIn:
+    """
+    Local HTTP server answering the beacon chain node API calls of the relayer from a recording.
+    The time at which every update is first served is kept to measure its latency.
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.finality_updates = sorted(recording['finality_updates'], key=signature_slot)
+        self.published = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), stand_in_handler(self))
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='beacon-stand-in', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def publish(self, kind, update):
+        with self.lock:
+            self.published.setdefault((kind, attested_slot(update)), time.perf_counter())
+
+    def latest_finality_update(self):
+        """
+        Latest finality update signed before the current slot of the clock
+        """
+        current_slot = int(clock.get_current_slot())
+        published = [update for update in self.finality_updates if signature_slot(update) <= current_slot]
+        return published[-1] if published else None
+
+    def respond(self, path, query):
+        """
+        Return the status and the JSON body answering a request
+        """
+        if path == '/eth/v1/beacon/genesis':
+            return 200, {'data': {'genesis_validators_root': self.recording['genesis_validators_root']}}
+        if path == '/eth/v1/beacon/headers/finalized':
+            return 200, {'data': {'root': self.recording['trusted_block_root']}}
+        if path.startswith('/eth/v1/beacon/light_client/bootstrap/'):
+            if path.rsplit('/', 1)[1] != self.recording['trusted_block_root']:
+                return 404, {'message': 'Bootstrap not available'}
+            return 200, {'data': self.recording['bootstrap']}
+        if path == '/eth/v1/beacon/light_client/updates':
+            start_period, count = int(query['start_period'][0]), int(query['count'][0])
+            updates = [update for update in self.recording['updates']
+                       if start_period <= compute_sync_committee_period_at_slot(attested_slot(update)) < start_period + count]
+            for update in updates:
+                self.publish('update', update)
+            return 200, [{'data': update} for update in updates]
+        if path in ['/eth/v1/beacon/light_client/finality_update', '/eth/v1/beacon/light_client/optimistic_update']:
+            update = self.latest_finality_update()
+            if update is None:
+                return 404, {'message': 'No update available'}
+            if path.endswith('finality_update'):
+                self.publish('update', update)
+                return 200, {'data': update}
+            self.publish('optimistic', update)
+            return 200, {'data': {key: update[key] for key in ['attested_header', 'sync_aggregate', 'signature_slot']}}
+        return 404, {'message': f'Unsupported endpoint {path}'}
+
+
+def stand_in_handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            status, body = stand_in.respond(url.path, parse_qs(url.query))
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def install_fake_prover(delay):
+    """
+    Replace the circuits with stub proofs, accepted by the stubbed verifiers
+    """
+    def fake_signature_proof(*args):
+        time.sleep(delay)
+        return STUB_PROOF
+
+    def fake_poseidon_committment(sync_committee):
+        time.sleep(delay)
+        return STUB_PROOF, stub_poseidon(sync_committee)
+
+    contract_middleware.validate_light_client_update = fake_signature_proof
+    contract_middleware.poseidon_committment = fake_poseidon_committment
+    contract_middleware.compute_sync_committee_poseidon = stub_poseidon
+
+
+def time_submissions(target, stand_in, results):
+    """
+    Record the latency of the updates successfully submitted to the target
+    """
+    submit = target.submit_light_client_update
+
+    def timed_submit(proven_update):
+        tx_receipt = submit(proven_update)
+        if tx_receipt is not None and tx_receipt.status == 1:
+            update = proven_update.update
+            if proven_update.optimistic:
+                kind = 'optimistic'
+            elif is_sync_committee_update(update):
+                kind = 'sync committee'
+            else:
+                kind = 'finality'
+            published = stand_in.published.get(
+                ('optimistic' if proven_update.optimistic else 'update', int(update.attested_header.beacon.slot)))
+            results.append({
+                'kind': kind,
+                'slot': int(update.attested_header.beacon.slot),
+                'latency': time.perf_counter() - published if published is not None else None,
+                'gas': tx_receipt.gasUsed,
+            })
+        return tx_receipt
+
+    target.submit_light_client_update = timed_submit
+
+
+async def replay(end_time, optimistic):
+    """
+    Run the relayer until the clock reaches end_time
+    """
+    task = asyncio.create_task(relay.main(optimistic))
+    while clock.now() < end_time and not task.done():
+        await asyncio.sleep(END_CHECK_INTERVAL)
+    if task.done():
+        # the relayer stopped on its own, e.g. because of an error
+        task.result()
+    task.cancel()
+
+
+def summarize(results, duration):
+    summary = {'submitted': len(results), 'seconds': duration, 'updates_per_second': len(results) / duration}
+    for kind in sorted({result['kind'] for result in results}):
+        latencies = sorted(result['latency'] for result in results
+                           if result['kind'] == kind and result['latency'] is not None)
+        summary[kind] = {
+            'submitted': sum(1 for result in results if result['kind'] == kind),
+            'latency_mean': statistics.mean(latencies) if latencies else None,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+            'latency_max': latencies[-1] if latencies else None,
+        }
+    return summary
+
+
+def run(recording_file, speed, rpc, prover_delay, optimistic):
+    with open(recording_file, 'r') as file:
+        recording = json.load(file)
+    assert recording['finality_updates'], "The recording has no finality updates"
+
+    stand_in = BeaconNodeStandIn(recording)
+    stand_in.start()
+    # the relayer starts when the first recorded finality update is published
+    finality_updates = stand_in.finality_updates
+    start_time = clock.compute_time_at_slot(signature_slot(finality_updates[0]))
+    end_time = clock.compute_time_at_slot(signature_slot(finality_updates[-1])) + DRAIN_SECONDS
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # isolate the run from the caches and the header database of the relayer
+        beacon_middleware.ENDPOINT_NODE_URL = stand_in.url
+        beacon_middleware.UPDATES_CACHE_DIR = f'{directory}/updates'
+        beacon_middleware.update_cache = None
+        contract_middleware.HEADER_DB_PATH = f'{directory}/headers.sqlite'
+        contract_middleware.header_db = None
+        contract_middleware.COMBINED_ROTATION_PROOFS = False
+        install_fake_prover(prover_delay)
+
+        contracts_dir = f'{directory}/contracts'
+        stub_contracts(contracts_dir)
+        if rpc is None:
+            from web3 import EthereumTesterProvider
+            provider = EthereumTesterProvider()
+        else:
+            from web3 import HTTPProvider
+            provider = HTTPProvider(rpc, request_kwargs={'timeout': 300})
+        contract_middleware.init_contract([provider], contracts_dir)
+        for target in contract_middleware.targets:
+            time_submissions(target, stand_in, results)
+
+        clock.set_clock(clock.AcceleratedClock(start_time, speed).time, speed)
+        real_start_time = time.perf_counter()
+        try:
+            asyncio.run(replay(end_time, optimistic))
+            # let the proving and submission in progress complete
+            relay.prover_executor.shutdown(wait=True)
+            for target in contract_middleware.targets:
+                target.executor.shutdown(wait=True)
+        finally:
+            clock.set_clock()
+            stand_in.stop()
+        duration = time.perf_counter() - real_start_time
+
+    for result in results:
+        print("%-15s slot %10d  latency %8.3f s  gas %10d" % (
+            result['kind'], result['slot'], result['latency'] or 0, result['gas']))
+    summary = summarize(results, duration)
+    print("Replayed %.0f clock seconds in %.1f s (%gx), %d updates submitted, %.2f updates/s" % (
+        end_time - start_time, duration, speed, summary['submitted'], summary['updates_per_second']))
+    for kind, stats in summary.items():
+        if isinstance(stats, dict) and stats['latency_mean'] is not None:
+            print("  %-15s %3d submitted, latency mean %.3f s, p50 %.3f s, max %.3f s" % (
+                kind, stats['submitted'], stats['latency_mean'], stats['latency_p50'], stats['latency_max']))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recording through the relayer with an accelerated clock")
+    parser.add_argument('--recording', default=RECORDING_FILE, help="recording of benchmarks.gas record")
+    parser.add_argument('--speed', type=float, default=DEFAULT_SPEED, help="clock speed with respect to real time")
+    parser.add_argument('--rpc', default=None, help="local development node, in-process EVM if omitted")
+    parser.add_argument('--prover-delay', type=float, default=0, help="real seconds spent by the fake prover per proof")
+    parser.add_argument('--optimistic', action='store_true', help="also relay the optimistic header")
+    args = parser.parse_args()
+
+    run(args.recording, args.speed, args.rpc, args.prover_delay, args.optimistic)
@@ -0,0 +1,127 @@
+pragma circom 2.0.5;
+
+include "./utils/bls.circom";
+include "./utils/constants.circom";
+include "./utils/poseidon.circom";
+include "./utils/ssz.circom";
+include "./utils/sync_committee.circom";
+
+/*
+ * Combines step.circom and rotate.circom for the light client updates with a sync
+ * committee update: a single proof verifies the aggregated BLS signature by the sync
+ * committee and maps the SSZ root of the next sync committee to its Poseidon root,
+ * so that the contract checks one proof instead of two.
+ *
+ * @input  pubkeysX                     X-coordinate of the public keys of the sync committee in bigint form.
+ * @input  pubkeysY                     Y-coordinate of the public keys of the sync committee in bigint form.
+ * @input  aggregationBits              Bitmap indicating which validators have signed
+ * @input  signature                    An aggregated signature over signingRoot
+ * @input  signingRoot                  sha256(attestedHeaderRoot, domain)
+ * @input  participation                sum(aggregationBits)
+ * @input  syncCommitteePoseidon        A commitment to the sync committee pubkeys.
+ * @input  nextPubkeysBytes             The next sync committee pubkeys in bytes
+ * @input  nextAggregatePubkeyBytes     The aggregate pubkey of the next sync committee in bytes
+ * @input  nextPubkeysBigIntX           The next sync committee pubkeys in bigint form, X coordinate.
+ * @input  nextPubkeysBigIntY           The next sync committee pubkeys in bigint form, Y coordinate.
+ * @input  nextSyncCommitteeSSZ         A SSZ commitment to the next sync committee
+ * @output nextSyncCommitteePoseidon    A Poseidon commitment to the next sync committee
+ */
+template StepRotate() {
+    var N = getNumBitsPerRegister();
+    var K = getNumRegisters();
+    var SYNC_COMMITTEE_SIZE = getSyncCommitteeSize();
+    var LOG_2_SYNC_COMMITTEE_SIZE = getLog2SyncCommitteeSize();
+    var G1_POINT_SIZE = getG1PointSize();
+
+    /* Signing Sync Committee */
+    signal input syncCommitteePoseidon;
+    signal input signingRoot[32];
+    signal input pubkeysX[SYNC_COMMITTEE_SIZE][K];
+    signal input pubkeysY[SYNC_COMMITTEE_SIZE][K];
+    signal input aggregationBits[SYNC_COMMITTEE_SIZE];
+    signal input signature[2][2][K];
+    signal input participation;
+
+    /* Next Sync Committee */
+    signal input nextSyncCommitteeSSZ[32];
+    signal input nextPubkeysBytes[SYNC_COMMITTEE_SIZE][G1_POINT_SIZE];
+    signal input nextAggregatePubkeyBytes[G1_POINT_SIZE];
+    signal input nextPubkeysBigIntX[SYNC_COMMITTEE_SIZE][K];
+    signal input nextPubkeysBigIntY[SYNC_COMMITTEE_SIZE][K];
+
+    signal output nextSyncCommitteePoseidon;
+
+    /* VERIFY SYNC COMMITTEE SIGNATURE AND COMPUTE PARTICIPATION */
+    component verifySignature = VerifySyncCommitteeSignature(
+        SYNC_COMMITTEE_SIZE,
+        LOG_2_SYNC_COMMITTEE_SIZE,
+        N,
+        K
+    );
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        verifySignature.aggregationBits[i] <== aggregationBits[i];
+        for (var j = 0; j < K; j++) {
+            verifySignature.pubkeys[i][0][j] <== pubkeysX[i][j];
+            verifySignature.pubkeys[i][1][j] <== pubkeysY[i][j];
+        }
+    }
+    for (var i = 0; i < 2; i++) {
+        for (var j = 0; j < 2; j++) {
+            for (var l = 0; l < K; l++) {
+                verifySignature.signature[i][j][l] <== signature[i][j][l];
+            }
+        }
+    }
+    for (var i = 0; i < 32; i++) {
+        verifySignature.signingRoot[i] <== signingRoot[i];
+    }
+    verifySignature.syncCommitteeRoot <== syncCommitteePoseidon;
+    verifySignature.participation === participation;
+
+    /* VERIFY BYTE AND BIG INT REPRESENTATION OF THE NEXT G1 POINTS MATCH */
+    component g1BytesToBigInt[SYNC_COMMITTEE_SIZE];
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        g1BytesToBigInt[i] = G1BytesToBigInt(N, K, G1_POINT_SIZE);
+        for (var j = 0; j < G1_POINT_SIZE; j++) {
+            g1BytesToBigInt[i].in[j] <== nextPubkeysBytes[i][j];
+        }
+        for (var j = 0; j < K; j++) {
+            g1BytesToBigInt[i].out[j] === nextPubkeysBigIntX[i][j];
+        }
+    }
+
+    /* VERIFY THE SSZ ROOT OF THE NEXT SYNC COMMITTEE */
+    component sszSyncCommittee = SSZPhase0SyncCommittee(
+        SYNC_COMMITTEE_SIZE,
+        LOG_2_SYNC_COMMITTEE_SIZE,
+        G1_POINT_SIZE
+    );
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        for (var j = 0; j < G1_POINT_SIZE; j++) {
+            sszSyncCommittee.pubkeys[i][j] <== nextPubkeysBytes[i][j];
+        }
+    }
+    for (var i = 0; i < G1_POINT_SIZE; i++) {
+        sszSyncCommittee.aggregatePubkey[i] <== nextAggregatePubkeyBytes[i];
+    }
+    for (var i = 0; i < 32; i++) {
+        nextSyncCommitteeSSZ[i] === sszSyncCommittee.out[i];
+    }
+
+    /* COMPUTE THE POSEIDON ROOT OF THE NEXT SYNC COMMITTEE */
+    component computePoseidonRoot = PoseidonG1Array(
+        SYNC_COMMITTEE_SIZE,
+        N,
+        K
+    );
+    for (var i = 0; i < SYNC_COMMITTEE_SIZE; i++) {
+        for (var j = 0; j < K; j++) {
+            computePoseidonRoot.pubkeys[i][0][j] <== nextPubkeysBigIntX[i][j];
+            computePoseidonRoot.pubkeys[i][1][j] <== nextPubkeysBigIntY[i][j];
+        }
+    }
+    nextSyncCommitteePoseidon <== computePoseidonRoot.out;
+}
+
+// Public signals: nextSyncCommitteePoseidon, syncCommitteePoseidon, signingRoot, nextSyncCommitteeSSZ
+component main {public [syncCommitteePoseidon, signingRoot, nextSyncCommitteeSSZ]} = StepRotate();
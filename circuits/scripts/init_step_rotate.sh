@@ -0,0 +1,8 @@
+#!/bin/bash
+# Compile the combined step and rotate circuit and generate its keys and verifier contract, reusing the unchanged stages
+# (see utils/circuit_build.py). Extra arguments are passed to the orchestrator, e.g. --force zkey
+CIRCUIT_NAME=step_rotate
+cd `dirname "$0"`/../..
+
+mkdir -p logs
+python -m utils.circuit_build "$@" "$CIRCUIT_NAME" 2>&1 | tee logs/"$CIRCUIT_NAME"_$(date '+%Y-%m-%d-%H-%M').log
@@ -0,0 +1,14 @@
+pragma solidity ^0.8.17;
+
+/*
+* @dev Verifier of the combined step and rotate zkSNARK (circuits/circuits/step_rotate.circom), as exported by snarkjs.
+*   Public signals are [nextSyncCommitteePoseidon, syncCommitteePoseidon] + signingRoot[0..32] + nextSyncCommitteeSSZ[0..32].
+*/
+interface IStepRotateVerifier {
+    function verifyProof(
+        uint256[2] calldata a,
+        uint256[2][2] calldata b,
+        uint256[2] calldata c,
+        uint256[66] calldata input
+    ) external view returns (bool);
+}
@@ -8,6 +8,8 @@ import "./Validator.sol";
 
 // Verifier for the zkSNARK ssz-poseidon commitment mapping proof.
 import "./PoseidonCommitmentVerifier.sol";
+// Verifier for the combined zkSNARK proving both the signature and the commitment mapping of the next sync committee.
+import "./IStepRotateVerifier.sol";
 
 /*
 * @dev The light client is a contract that stores the state of the beacon chain and allows to validate updates.
@@ -22,8 +24,19 @@ contract LightClient is PoseidonCommitmentVerifier {
     // Stores the poseidon root for a given sync committee. Used to verify the header validity.
     mapping(bytes32 => bytes32) public sszToPoseidon;
 
+    // Most recent header attested by a sync committee supermajority (optimistic header), not finalized yet.
+    Structs.BeaconBlockHeader public optimisticHeader;
+    // Hash of the execution block of the optimistic header.
+    bytes32 public optimisticBlockHash;
+
+    // Verifier of the combined signature and commitment mapping proofs, unset if combined proofs are not used.
+    IStepRotateVerifier public stepRotateVerifier;
+    // Account allowed to set the verifier of the combined proofs.
+    address deployer;
+
     constructor() {
         validator = new Validator();
+        deployer = msg.sender;
     }
 
     // Events
@@ -31,6 +44,8 @@ contract LightClient is PoseidonCommitmentVerifier {
     event BootstrapComplete(uint64 slot);
     // Emitted when a light client update is processed.
     event UpdateProcessed(uint64 slot);
+    // Emitted when an optimistic update is processed.
+    event OptimisticUpdateProcessed(uint64 slot, bytes32 blockHash);
 
     // External functions
     /*
@@ -71,6 +86,41 @@ contract LightClient is PoseidonCommitmentVerifier {
         emit BootstrapComplete(bootstrap.header.beacon.slot);
     }
 
+    /*
+    * @dev Enables the combined proofs by setting their verifier, which can only be done once by the deployer.
+    * @param verifier The address of the verifier contract exported for the step_rotate circuit.
+    */
+    function setStepRotateVerifier(address verifier) external {
+        require(msg.sender == deployer, "Only the deployer can set the verifier");
+        require(address(stepRotateVerifier) == address(0), "Verifier already set");
+        stepRotateVerifier = IStepRotateVerifier(verifier);
+    }
+
+    /*
+    * @dev Returns the light client store together with the poseidon roots of its sync committees,
+    *   so that the relayer can check its local view of the store with a single call.
+    * @return beaconSlot The slot of the latest finalized header.
+    * @return currentSyncCommitteeRoot The root of the current sync committee.
+    * @return nextSyncCommitteeRoot The root of the next sync committee (zero if it is not known).
+    * @return currentSyncCommitteePoseidon The poseidon root of the current sync committee.
+    * @return nextSyncCommitteePoseidon The poseidon root of the next sync committee (zero if it is not known).
+    */
+    function getLightClientStore() external view returns (
+        uint64 beaconSlot,
+        bytes32 currentSyncCommitteeRoot,
+        bytes32 nextSyncCommitteeRoot,
+        bytes32 currentSyncCommitteePoseidon,
+        bytes32 nextSyncCommitteePoseidon
+    ) {
+        return (
+            store.beaconSlot,
+            store.currentSyncCommitteeRoot,
+            store.nextSyncCommitteeRoot,
+            sszToPoseidon[store.currentSyncCommitteeRoot],
+            sszToPoseidon[store.nextSyncCommitteeRoot]
+        );
+    }
+
     // Struct used to store variables for the processLightClientUpdate function, to avoid stack too deep errors.
     struct ProcessLightClientUpdateVars {
         uint64 currentParticipants; // Number of participants in the sync committee.
@@ -80,6 +130,8 @@ contract LightClient is PoseidonCommitmentVerifier {
         bool isFinalityUpdate; // True if the update is a finality update.
         uint64 finalizedHeaderSyncCommitteePeriod; // The sync committee period of the finalized header.
         uint64 attestedHeaderSyncCommitteePeriod; // The sync committee period of the attested header.
+        bytes32 signingRoot; // The signing root of the update, for combined proofs.
+        bytes32 nextSyncCommitteeRoot; // The root of the next sync committee, for combined proofs.
     }
 
     /*
@@ -174,6 +226,206 @@ contract LightClient is PoseidonCommitmentVerifier {
         return update.finalizedHeader.execution;
     }
 
+    /*
+    * @dev Processes a light client update without a sync committee update.
+    *   The signing sync committee is not part of the calldata: its poseidon commitment is taken from the
+    *   sync committees stored by the light client, which the signature proof is bound to.
+    * @param update The light client update to process.
+    * @param currentSlot The current slot of the beacon chain.
+    * @param signatureProof The proof that the sync committee signed the update.
+    */
+    function processLightClientUpdate(
+        Structs.LightClientUpdate calldata update,
+        uint64 currentSlot,
+        Structs.Groth16Proof calldata signatureProof
+    ) external returns (Structs.ExecutionPayloadHeader memory) {
+        ProcessLightClientUpdateVars memory vars;
+
+        // Count the number of participants in the sync committee.
+        for (uint256 i; i < SYNC_COMMITTEE_SIZE; ++i) {
+            if (update.syncAggregate.syncCommitteeBits[i]) {++vars.currentParticipants; }
+        }
+
+        // Check if 2/3 of the sync committee signed the update and if the update is more recent than the current known value.
+        if (vars.currentParticipants * 3 >= SYNC_COMMITTEE_SIZE * 2 && update.finalizedHeader.beacon.slot > store.beaconSlot) {
+            // Validate update.
+            validator.validateLightClientUpdate(
+                store, 
+                update, 
+                currentSlot, 
+                signingSyncCommitteePoseidon(update.signatureSlot),
+                signatureProof);
+
+            store.beaconSlot = update.finalizedHeader.beacon.slot;
+        }
+        emit UpdateProcessed(update.finalizedHeader.beacon.slot);
+        return update.finalizedHeader.execution;
+    }
+
+    /*
+    * @dev Processes a light client update with a sync committee update.
+    *   The signing sync committee is not part of the calldata: its poseidon commitment is taken from the
+    *   sync committees stored by the light client, which the signature proof is bound to.
+    * @param update The light client update to process.
+    * @param currentSlot The current slot of the beacon chain.
+    * @param nextSyncCommitteePoseidon The poseidon root of the next sync committee.
+    * @param commitmentMappingProof The proof for the sync committee committment mapping.
+    * @param signatureProof The proof that the sync committee signed the update.
+    */
+    function processLightClientUpdate(
+        Structs.LightClientUpdate calldata update,
+        uint64 currentSlot,
+        uint256 nextSyncCommitteePoseidon, 
+        Structs.Groth16Proof memory commitmentMappingProof,
+        Structs.Groth16Proof calldata signatureProof
+    ) external returns (Structs.ExecutionPayloadHeader memory) {
+        ProcessLightClientUpdateVars memory vars;
+
+        // Count the number of participants in the sync committee.
+        for (uint256 i; i < SYNC_COMMITTEE_SIZE; ++i) {
+            if (update.syncAggregate.syncCommitteeBits[i]) {++vars.currentParticipants; }
+        }
+
+        vars.isNextSyncCommitteeKnown = validator.isNextSyncCommitteeKnown(store.nextSyncCommitteeRoot);
+        vars.isSyncCommitteeUpdate = validator.isSyncCommitteeUpdate(update);
+        vars.isFinalityUpdate = validator.isFinalityUpdate(update);
+        vars.finalizedHeaderSyncCommitteePeriod = Utils.computeSyncCommitteePeriodAtSlot(update.finalizedHeader.beacon.slot);
+        vars.attestedHeaderSyncCommitteePeriod = Utils.computeSyncCommitteePeriodAtSlot(update.attestedHeader.beacon.slot);
+        
+        vars.updateHasFinalizedNextSyncCommittee = (
+            !vars.isNextSyncCommitteeKnown &&
+            vars.isSyncCommitteeUpdate &&
+            vars.isFinalityUpdate &&
+            (vars.finalizedHeaderSyncCommitteePeriod == vars.attestedHeaderSyncCommitteePeriod)
+        );
+
+        // Check if 2/3 of the sync committee signed the update and if either the update is more recent than the current known value or there is a sync committee update.
+        if (vars.currentParticipants * 3 >= SYNC_COMMITTEE_SIZE * 2 && ( update.finalizedHeader.beacon.slot > store.beaconSlot || vars.updateHasFinalizedNextSyncCommittee)) {
+            // Validate update.
+            validator.validateLightClientUpdate(
+                store, 
+                update, 
+                currentSlot,
+                signingSyncCommitteePoseidon(update.signatureSlot),
+                signatureProof);
+            // Apply the update.
+            applyLightClientUpdate(update, nextSyncCommitteePoseidon, commitmentMappingProof);
+        }
+
+        emit UpdateProcessed(update.finalizedHeader.beacon.slot);
+        return update.finalizedHeader.execution;
+    }
+
+    /*
+    * @dev Processes a light client update with a sync committee update, proven by a single combined proof
+    *   of the sync committee signature and of the commitment mapping of the next sync committee.
+    *   The signing sync committee is taken from the sync committees stored by the light client.
+    * @param update The light client update to process.
+    * @param currentSlot The current slot of the beacon chain.
+    * @param nextSyncCommitteePoseidon The poseidon root of the next sync committee.
+    * @param combinedProof The proof of both the signature and the sync committee committment mapping.
+    */
+    function processLightClientUpdateCombined(
+        Structs.LightClientUpdate calldata update,
+        uint64 currentSlot,
+        uint256 nextSyncCommitteePoseidon,
+        Structs.Groth16Proof calldata combinedProof
+    ) external returns (Structs.ExecutionPayloadHeader memory) {
+        require(address(stepRotateVerifier) != address(0), "Combined proofs are not enabled");
+        ProcessLightClientUpdateVars memory vars;
+
+        // Count the number of participants in the sync committee.
+        for (uint256 i; i < SYNC_COMMITTEE_SIZE; ++i) {
+            if (update.syncAggregate.syncCommitteeBits[i]) {++vars.currentParticipants; }
+        }
+
+        vars.isNextSyncCommitteeKnown = validator.isNextSyncCommitteeKnown(store.nextSyncCommitteeRoot);
+        vars.isSyncCommitteeUpdate = validator.isSyncCommitteeUpdate(update);
+        vars.isFinalityUpdate = validator.isFinalityUpdate(update);
+        vars.finalizedHeaderSyncCommitteePeriod = Utils.computeSyncCommitteePeriodAtSlot(update.finalizedHeader.beacon.slot);
+        vars.attestedHeaderSyncCommitteePeriod = Utils.computeSyncCommitteePeriodAtSlot(update.attestedHeader.beacon.slot);
+        
+        vars.updateHasFinalizedNextSyncCommittee = (
+            !vars.isNextSyncCommitteeKnown &&
+            vars.isSyncCommitteeUpdate &&
+            vars.isFinalityUpdate &&
+            (vars.finalizedHeaderSyncCommitteePeriod == vars.attestedHeaderSyncCommitteePeriod)
+        );
+
+        // Check if 2/3 of the sync committee signed the update and if either the update is more recent than the current known value or there is a sync committee update.
+        if (vars.currentParticipants * 3 >= SYNC_COMMITTEE_SIZE * 2 && ( update.finalizedHeader.beacon.slot > store.beaconSlot || vars.updateHasFinalizedNextSyncCommittee)) {
+            // Validate update, the signature is verified by the combined proof.
+            vars.signingRoot = validator.validateLightClientUpdateWithoutSignature(store, update, currentSlot);
+            vars.nextSyncCommitteeRoot = validator.hashTreeRoot(update.nextSyncCommittee);
+            require(
+                zkStepRotateVerify(
+                    vars.signingRoot,
+                    signingSyncCommitteePoseidon(update.signatureSlot),
+                    vars.nextSyncCommitteeRoot,
+                    nextSyncCommitteePoseidon,
+                    combinedProof
+                ), "Proof is invalid"
+            );
+            sszToPoseidon[vars.nextSyncCommitteeRoot] = bytes32(nextSyncCommitteePoseidon);
+            // Apply the update.
+            applySyncCommitteeUpdate(update, vars.nextSyncCommitteeRoot);
+        }
+
+        emit UpdateProcessed(update.finalizedHeader.beacon.slot);
+        return update.finalizedHeader.execution;
+    }
+
+    /*
+    * @dev Processes an optimistic update, i.e., a light client update without finalized header and sync committee update.
+    *   Only the optimistic header is updated: the finalized store is left untouched.
+    *   The signing sync committee is taken from the sync committees stored by the light client.
+    * @param update The light client update to process.
+    * @param currentSlot The current slot of the beacon chain.
+    * @param signatureProof The proof that the sync committee signed the update.
+    */
+    function processLightClientOptimisticUpdate(
+        Structs.LightClientUpdate calldata update,
+        uint64 currentSlot,
+        Structs.Groth16Proof calldata signatureProof
+    ) external returns (Structs.ExecutionPayloadHeader memory) {
+        ProcessLightClientUpdateVars memory vars;
+
+        // Count the number of participants in the sync committee.
+        for (uint256 i; i < SYNC_COMMITTEE_SIZE; ++i) {
+            if (update.syncAggregate.syncCommitteeBits[i]) {++vars.currentParticipants; }
+        }
+
+        // Check if 2/3 of the sync committee signed the update and if the update is more recent than the current optimistic header.
+        if (vars.currentParticipants * 3 >= SYNC_COMMITTEE_SIZE * 2 && update.attestedHeader.beacon.slot > optimisticHeader.slot) {
+            require(!validator.isFinalityUpdate(update) && !validator.isSyncCommitteeUpdate(update), "Not an optimistic update");
+            // Validate update.
+            validator.validateLightClientUpdate(
+                store, 
+                update, 
+                currentSlot, 
+                signingSyncCommitteePoseidon(update.signatureSlot),
+                signatureProof);
+
+            optimisticHeader = update.attestedHeader.beacon;
+            optimisticBlockHash = update.attestedHeader.execution.blockHash;
+        }
+        emit OptimisticUpdateProcessed(update.attestedHeader.beacon.slot, update.attestedHeader.execution.blockHash);
+        return update.attestedHeader.execution;
+    }
+
+    /*
+    * @dev Returns the poseidon root of the sync committee expected to sign an update, according to the store.
+    * @param signatureSlot The slot at which the update was signed.
+    * @return The poseidon root of the current sync committee if the update was signed in the store period,
+    *   the one of the next sync committee otherwise (zero if it is not known).
+    */
+    function signingSyncCommitteePoseidon(uint64 signatureSlot) private view returns (bytes32) {
+        if (Utils.computeSyncCommitteePeriodAtSlot(signatureSlot) == Utils.computeSyncCommitteePeriodAtSlot(store.beaconSlot)) {
+            return sszToPoseidon[store.currentSyncCommitteeRoot];
+        }
+        return sszToPoseidon[store.nextSyncCommitteeRoot];
+    }
+
     /*
     * @dev Applies a light client update.
     * @param update The light client update to apply.
@@ -185,12 +437,23 @@ contract LightClient is PoseidonCommitmentVerifier {
         uint256 nextSyncCommitteePoseidon, 
         Structs.Groth16Proof memory commitmentMappingProof
     ) private {
-        uint64 storePeriod = Utils.computeSyncCommitteePeriodAtSlot(store.beaconSlot);
-        uint64 updateFinalizedPeriod = Utils.computeSyncCommitteePeriodAtSlot(update.finalizedHeader.beacon.slot);
-
         // Verify the proof for the sync committee committment mapping.
         bytes32 updateNextSyncCommitteeRoot = validator.hashTreeRoot(update.nextSyncCommittee);
         zkMapSSZToPoseidon(updateNextSyncCommitteeRoot, nextSyncCommitteePoseidon, commitmentMappingProof);
+        applySyncCommitteeUpdate(update, updateNextSyncCommitteeRoot);
+    }
+
+    /*
+    * @dev Applies a light client update whose next sync committee has been mapped to its poseidon root.
+    * @param update The light client update to apply.
+    * @param updateNextSyncCommitteeRoot The root of the next sync committee of the update.
+    */
+    function applySyncCommitteeUpdate(
+        Structs.LightClientUpdate calldata update,
+        bytes32 updateNextSyncCommitteeRoot
+    ) private {
+        uint64 storePeriod = Utils.computeSyncCommitteePeriodAtSlot(store.beaconSlot);
+        uint64 updateFinalizedPeriod = Utils.computeSyncCommitteePeriodAtSlot(update.finalizedHeader.beacon.slot);
 
         if(!validator.isNextSyncCommitteeKnown(store.nextSyncCommitteeRoot)){ // if the next sync committee is not known
             require(updateFinalizedPeriod == storePeriod, "Invalid finalized period");
@@ -221,4 +484,32 @@ contract LightClient is PoseidonCommitmentVerifier {
         require(verifyCommitmentMappingProof(proof.a, proof.b, proof.c, inputs), "Proof is invalid");
         sszToPoseidon[sszCommitment] = bytes32(poseidonCommitment);
     }
-}
\ No newline at end of file
+
+    /*
+    * @dev Verifies a combined zkSNARK proof. The proof asserts that:
+    *   the sync committee with poseidon root syncCommitteePoseidon signed signingRoot (see zkBLSVerify) and
+    *   SimpleSerialize(nextSyncCommittee) == nextSyncCommitteeRoot, Poseidon(nextSyncCommittee) == nextSyncCommitteePoseidon.
+    */
+    function zkStepRotateVerify(
+        bytes32 signingRoot,
+        bytes32 syncCommitteePoseidon,
+        bytes32 nextSyncCommitteeRoot,
+        uint256 nextSyncCommitteePoseidon,
+        Structs.Groth16Proof calldata proof
+    ) private view returns (bool) {
+        require(syncCommitteePoseidon != 0, "Must map SSZ commitment to Poseidon commitment");
+        // inputs is [nextSyncCommitteePoseidon, syncCommitteePoseidon] + signingRoot[0..32] + nextSyncCommitteeSSZ[0..32]
+        uint256[66] memory inputs;
+        inputs[0] = nextSyncCommitteePoseidon;
+        inputs[1] = uint256(syncCommitteePoseidon);
+        uint256 signingRootNumeric = uint256(signingRoot);
+        uint256 sszCommitmentNumeric = uint256(nextSyncCommitteeRoot);
+        for (uint256 i = 0; i < 32; i++) {
+            inputs[2 + (32 - 1 - i)] = signingRootNumeric % 2**8;
+            signingRootNumeric = signingRootNumeric / 2**8;
+            inputs[34 + (32 - 1 - i)] = sszCommitmentNumeric % 2**8;
+            sszCommitmentNumeric = sszCommitmentNumeric / 2**8;
+        }
+        return stepRotateVerifier.verifyProof(proof.a, proof.b, proof.c, inputs);
+    }
+}
@@ -42,6 +42,25 @@ contract Validator is BLSAggregatedSignatureVerifier, Merkleize {
         bytes32 syncCommitteePoseidonRoot,
         Structs.Groth16Proof calldata proof
     ) public view{
+        bytes32 signingRoot = validateLightClientUpdateWithoutSignature(store, update, currentSlot);
+
+        // BLS signature proof verification
+        require(zkBLSVerify(signingRoot, syncCommitteePoseidonRoot, proof), "Signature is invalid");
+    }
+
+    /*
+    * @dev Validates a light client update except for its signature, which the caller has to verify.
+    *   Used when the signature is proven together with the sync committee commitment mapping.
+    * @param store The light client store.
+    * @param update The light client update.
+    * @param currentSlot The current slot.
+    * @return The signing root of the update.
+    */
+    function validateLightClientUpdateWithoutSignature(
+        Structs.LightClientStore memory store,
+        Structs.LightClientUpdate calldata update, 
+        uint64 currentSlot
+    ) public view returns (bytes32) {
         LightClientUpdateVars memory vars;
 
         // Calculate the number of participants in the sync committee.
@@ -122,9 +141,7 @@ contract Validator is BLSAggregatedSignatureVerifier, Merkleize {
                 store.genesisValidatorsRoot
             )
         );
-
-        // BLS signature proof verification
-        require(zkBLSVerify(vars.signingRoot, syncCommitteePoseidonRoot, proof), "Signature is invalid");
+        return vars.signingRoot;
     }
 
     /*
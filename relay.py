@@ -18,13 +18,18 @@ The life cycle of the light client is the following:
         2a. Get the sync committee updates from the trusted block sync period to the current sync period
         2b. Process and update the light client store
     3. Start the following tasks:
-        (removed) 3a. Poll for optimistic updates
+        3a. Poll for optimistic updates (optimistic mode only)
         3b. Poll for finality updates
         3c. Poll for sync committee updates
 """
 
+# installed first (if enabled by the RELAY_IMPORT_TIMES environment variable), so that the startup report accounts
+# for the import of every package
+from utils import startup
+startup.install_import_timer()
+
 from utils.ssz.ssz_typing import Bytes32
-from utils.clock import get_current_slot, time_until_next_epoch
+from utils.clock import get_current_slot, time_until_next_epoch, time_until_next_slot, sleep
 # specs is the package that contains the executable specifications of the Ethereum Beacon chain
 from utils.specs import (
     Root, compute_sync_committee_period_at_slot, MAX_REQUEST_LIGHT_CLIENT_UPDATES,
@@ -32,20 +37,50 @@ from utils.specs import (
     LightClientFinalityUpdate, EPOCHS_PER_SYNC_COMMITTEE_PERIOD, compute_epoch_at_slot,
     SyncCommittee, LightClientHeader)
 from utils.beacon_middleware import (
-    get_trusted_block_root, get_light_client_bootstrap, get_finality_update, get_updates_for_period, get_genesis_validators_root
+    get_trusted_block_root, get_light_client_bootstrap, get_finality_update, get_updates_for_period, get_genesis_validators_root,
+    get_update_cache, iter_updates_for_period, get_optimistic_update
 )
 from utils.contract_middleware import (
-    init_contract, initialize_light_client_store, process_light_client_update
+    init_contract, initialize_light_client_store, process_light_client_update,
+    ProvenUpdate, encode_light_client_update, submit_proven_update, COMMITTEE_COMMITMENT_CALLDATA
+)
+from utils import contract_middleware, profiling
+from utils.bundle import (
+    BundleWriter, read_bundles, encode_bootstrap_record, encode_update_record,
+    decode_bootstrap_record, decode_update_record, RECORD_BOOTSTRAP
 )
-import math, asyncio
+from utils.parsing import parse_light_client_bootstrap, parse_light_client_update, parse_light_client_finality_update
+from utils.circuit_middleware import get_signature_proof_cache, proof_verification_stats
+from utils.event_loop import LoopLagMonitor
+from concurrent.futures import ThreadPoolExecutor, wait
+import argparse, json, math, asyncio, sys
 
 # Takes into account possible clock drifts. The low value provides protection against a server sending updates too far in the future
 MAX_CLOCK_DISPARITY_SEC = 10
 FINALITY_UPDATE_POLL_INTERVAL = 48
+# Optimistic mode: the optimistic header is followed every slot, polling once the next block is expected to be imported
+OPTIMISTIC_MODE = False
+OPTIMISTIC_UPDATE_POLL_DELAY = 4
 LOOKAHEAD_EPOCHS_COMMITTEE_SYNC = 8
 NEXT_SYNC_COMMITTEE_INDEX_LOG_2 = 5
 FINALIZED_ROOT_INDEX_LOG_2 = 6
 
+# Concurrency model: the event loop only schedules the tasks. Blocking network calls to the beacon chain node run
+# on a pool of I/O threads, while proving and submission (subprocesses and blocking web3 calls) run on a single
+# worker, since they share the local view of the light client store. The tasks hand the updates over to the worker
+# through a bounded queue, which blocks them when proving falls behind.
+IO_WORKERS = 4
+UPDATE_QUEUE_SIZE = 4
+LOOP_STATS_INTERVAL = 600
+
+# RPC endpoints of the chains the light client contract is deployed on. Updates are proven once and submitted to all
+DESTINATION_CHAINS = ['http://localhost:8545']
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='io')
+prover_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prover')
+loop_lag_monitor = LoopLagMonitor()
+latest_optimistic_update = None
+
 import time
 
 def bootstrap():
@@ -85,13 +120,11 @@ def chunkify_range(from_period, to_period, items_per_chunk):
     return chunks
 
 
-def process_light_client_finality_update(finality_update: LightClientFinalityUpdate,
-                                         current_slot: Slot,
-                                         genesis_validators_root: Root) -> None:
+def finality_update_to_light_client_update(finality_update: LightClientFinalityUpdate) -> LightClientUpdate:
     """
-    Process a finality update by calling the light client contract
+    Convert a finality update to a light client update without sync committee update
     """
-    update = LightClientUpdate(
+    return LightClientUpdate(
         attested_header=finality_update.attested_header,
         next_sync_committee=SyncCommittee(),
         next_sync_committee_branch=[Bytes32() for _ in range(NEXT_SYNC_COMMITTEE_INDEX_LOG_2)],
@@ -101,16 +134,12 @@ def process_light_client_finality_update(finality_update: LightClientFinalityUpd
         signature_slot=finality_update.signature_slot,
     )
 
-    process_light_client_update(update, current_slot, genesis_validators_root)
-
 
-def process_light_client_optimistic_update(optimistic_update: LightClientOptimisticUpdate,
-                                           current_slot: Slot,
-                                           genesis_validators_root: Root) -> None:
+def optimistic_update_to_light_client_update(optimistic_update: LightClientOptimisticUpdate) -> LightClientUpdate:
     """
-    Process an optimistic update by calling the light client contract
+    Convert an optimistic update to a light client update without finalized header and sync committee update
     """
-    update = LightClientUpdate(
+    return LightClientUpdate(
         attested_header=optimistic_update.attested_header,
         next_sync_committee=SyncCommittee(),
         next_sync_committee_branch=[Bytes32() for _ in range(NEXT_SYNC_COMMITTEE_INDEX_LOG_2)],
@@ -120,40 +149,151 @@ def process_light_client_optimistic_update(optimistic_update: LightClientOptimis
         signature_slot=optimistic_update.signature_slot,
     )
 
+
+def process_light_client_finality_update(finality_update: LightClientFinalityUpdate,
+                                         current_slot: Slot,
+                                         genesis_validators_root: Root) -> None:
+    """
+    Process a finality update by calling the light client contract
+    """
+    update = finality_update_to_light_client_update(finality_update)
+
     process_light_client_update(update, current_slot, genesis_validators_root)
 
 
+def process_light_client_optimistic_update(optimistic_update: LightClientOptimisticUpdate,
+                                           current_slot: Slot,
+                                           genesis_validators_root: Root):
+    """
+    Process an optimistic update by calling the light client contract.
+    The update is not proven if a more recent optimistic update was retrieved while it was waiting.
+    """
+    update = optimistic_update_to_light_client_update(optimistic_update)
+    slot = optimistic_update.attested_header.beacon.slot
+
+    return contract_middleware.process_light_client_optimistic_update(
+        update, current_slot, genesis_validators_root,
+        is_superseded=lambda: latest_optimistic_update.attested_header.beacon.slot > slot
+    )
+
+
+async def run_io(function, *args):
+    """
+    Run a blocking call to the beacon chain node on the I/O executor
+    """
+    return await asyncio.get_running_loop().run_in_executor(io_executor, function, *args)
+
+
+async def run_prover(function, *args):
+    """
+    Run proving and submission work on the prover executor
+    """
+    return await asyncio.get_running_loop().run_in_executor(prover_executor, function, *args)
+
+
+async def process_updates():
+    """
+    Task which processes the queued light client updates, one at a time
+    """
+    while True:
+        update = await update_queue.get()
+        start_time = time.time()
+        try:
+            print("Processing update: attested slot", update.attested_header.beacon.slot)
+            proven_update = await run_prover(process_light_client_update,
+                                             update,
+                                             get_current_slot(tolerance=MAX_CLOCK_DISPARITY_SEC),
+                                             genesis_validators_root)
+            if proven_update is not None:
+                startup.mark('first update proven')
+        except Exception as e:
+            print("Unable to process update:", e)
+        finally:
+            update_queue.task_done()
+        end_time = time.time()
+        if(end_time - start_time > 1):
+            print("Update: %s" % (end_time - start_time))
+            print("Signature proof cache: %s" % get_signature_proof_cache().stats())
+            print("Local proof verification: %s" % proof_verification_stats)
+            if profiling.PROFILING:
+                print("Profiling: %s" % profiling.profiling_stats)
+
+
 async def handle_finality_updates():
     """
-    Task which periodically retrieves the latest finality update from the beacon chain node and processes it
+    Task which periodically retrieves the latest finality update from the beacon chain node and queues it
     """
     last_finality_update = None
     while True:
         try:
-            start_time = time.time()
-            finality_update = get_finality_update()
+            finality_update = await run_io(get_finality_update)
             if last_finality_update is None or last_finality_update.finalized_header.beacon.slot != finality_update.finalized_header.beacon.slot:
                 last_finality_update = finality_update
-                print("Processing finality update: slot",
+                print("Queueing finality update: slot",
                       last_finality_update.finalized_header.beacon.slot)
-                process_light_client_finality_update(finality_update,
-                                                     get_current_slot(
-                                                         tolerance=MAX_CLOCK_DISPARITY_SEC),
-                                                     genesis_validators_root)
-            end_time = time.time()
-            if(end_time - start_time > 1):
-                print("Update: %s" % (end_time - start_time))
+                await update_queue.put(finality_update_to_light_client_update(finality_update))
         # In case of sync_committee_bits length is less than 512, remerkleable throws an Exception
         # In case of failure during API call, beacon_api throws an AssertionError
         except (AssertionError, Exception):
             print("Unable to retrieve finality update")
 
-        await asyncio.sleep(FINALITY_UPDATE_POLL_INTERVAL)
+        await sleep(FINALITY_UPDATE_POLL_INTERVAL)
+
+
+async def handle_optimistic_updates():
+    """
+    Task which retrieves the latest optimistic update every slot, only the most recent one is kept for proving
+    """
+    global latest_optimistic_update
+    while True:
+        await sleep(time_until_next_slot() + OPTIMISTIC_UPDATE_POLL_DELAY)
+        try:
+            optimistic_update = await run_io(get_optimistic_update)
+        except (AssertionError, Exception):
+            print("Unable to retrieve optimistic update")
+            continue
+        if latest_optimistic_update is None or \
+                optimistic_update.attested_header.beacon.slot > latest_optimistic_update.attested_header.beacon.slot:
+            latest_optimistic_update = optimistic_update
+            optimistic_update_available.set()
+
+
+async def process_optimistic_updates():
+    """
+    Task which proves and submits the most recent optimistic update, skipping the ones superseded in the meantime
+    """
+    while True:
+        await optimistic_update_available.wait()
+        optimistic_update_available.clear()
+        optimistic_update = latest_optimistic_update
+        start_time = time.time()
+        try:
+            proven_update = await run_prover(process_light_client_optimistic_update,
+                                             optimistic_update,
+                                             get_current_slot(tolerance=MAX_CLOCK_DISPARITY_SEC),
+                                             genesis_validators_root)
+            if proven_update is not None:
+                print("Optimistic update: attested slot %s proven in %.1fs" % (
+                    optimistic_update.attested_header.beacon.slot, time.time() - start_time))
+        except Exception as e:
+            print("Unable to process optimistic update:", e)
+
+
+async def report_loop_stats():
+    """
+    Task which periodically reports the responsiveness of the event loop and the length of the update queue
+    """
+    while True:
+        await asyncio.sleep(LOOP_STATS_INTERVAL)
+        print("Event loop lag: %s, queued updates: %d" % (loop_lag_monitor.stats(), update_queue.qsize()))
+        if latest_optimistic_update is not None:
+            print("Optimistic headers: %s" % contract_middleware.optimistic_stats)
 
 
-def sync(last_period, current_period):
+async def sync(last_period, current_period):
     """
-    Sync the light client store with the beacon chain for a given sync committee period range
+    Sync the light client store with the beacon chain for a given sync committee period range,
+    by queueing the sync committee updates of the range
     """
     # split the period range into chunks of MAX_REQUEST_LIGHT_CLIENT_UPDATES
     period_ranges = chunkify_range(
@@ -162,23 +302,34 @@ def sync(last_period, current_period):
     for (from_period, to_period) in period_ranges:
         count = to_period + 1 - from_period
         start_time = time.time()
-        updates = get_updates_for_period(from_period, count)
-
-        for update in updates:
-            print("Processing update")
-            process_light_client_update(update, get_current_slot(tolerance=MAX_CLOCK_DISPARITY_SEC), genesis_validators_root)
-        print("Sync: %s" % (time.time() - start_time))
+        # pages of updates are fetched a few ahead and parsed one update at a time, the bounded queue keeps the
+        # prover from falling behind the fetched pages
+        updates = iter_updates_for_period(from_period, count)
+        while (update := await run_io(next, updates, None)) is not None:
+            await update_queue.put(update)
+        print("Sync: %s, update cache: %s, period updates: %s" % (
+            time.time() - start_time, get_update_cache().stats(), contract_middleware.update_tracker.stats()))
             
 
-async def main():
+async def main(optimistic_mode=OPTIMISTIC_MODE):
     """
     Main function of the light client
     """
-    global genesis_validators_root
-    genesis_validators_root = get_genesis_validators_root()
+    global genesis_validators_root, update_queue, optimistic_update_available
+    update_queue = asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE)
+    optimistic_update_available = asyncio.Event()
+    # keep a reference to the background tasks, so that they are not garbage collected
+    tasks = [
+        asyncio.create_task(loop_lag_monitor.run()),
+        asyncio.create_task(report_loop_stats()),
+        asyncio.create_task(process_updates()),
+    ]
+
+    genesis_validators_root = await run_io(get_genesis_validators_root)
         
     print("Processing bootstrap")
-    bootstrap_slot = bootstrap()
+    bootstrap_slot = await run_prover(bootstrap)
+    startup.mark('bootstrap')
     print("Processing bootstrap done")
 
     print("Start syncing")
@@ -189,11 +340,16 @@ async def main():
     last_period = compute_sync_committee_period_at_slot(bootstrap_slot)
 
     # Sync the light client store with the beacon chain
-    sync(last_period, current_period)
+    await sync(last_period, current_period)
+    await update_queue.join()
     print("Sync done")
     # Subscribe
     print("Start finality update handler")
-    asyncio.create_task(handle_finality_updates())
+    tasks.append(asyncio.create_task(handle_finality_updates()))
+    if optimistic_mode:
+        print("Start optimistic update handler")
+        tasks.append(asyncio.create_task(handle_optimistic_updates()))
+        tasks.append(asyncio.create_task(process_optimistic_updates()))
 
     while True:
         # When close to the end of a sync period poll for sync committee updates
@@ -202,12 +358,119 @@ async def main():
 
         if (EPOCHS_PER_SYNC_COMMITTEE_PERIOD - epoch_in_sync_period <= LOOKAHEAD_EPOCHS_COMMITTEE_SYNC):
             period = compute_sync_committee_period_at_slot(current_slot)
-            sync(period, period)
+            await sync(period, period)
 
         print("Polling next sync committee update in", time_until_next_epoch(), "secs")
-        await asyncio.sleep(time_until_next_epoch())
+        await sleep(time_until_next_epoch())
+
+
+def prove_bundles(output, recording=None, include_sync_committee=not COMMITTEE_COMMITMENT_CALLDATA):
+    """
+    Prove-only mode: prove the updates from the bootstrap period onwards, from the beacon chain node or from
+    a recording (see benchmarks/gas.py), and write them as proof bundles without submitting them
+    """
+    if recording is not None:
+        with open(recording, 'r') as file:
+            recording = json.load(file)
+        genesis_validators_root = Root(recording['genesis_validators_root'])
+        trusted_block_root = Root(recording['trusted_block_root'])
+        light_client_bootstrap = parse_light_client_bootstrap(recording['bootstrap'])
+        updates = [parse_light_client_update(update) for update in recording['updates']]
+        updates += [finality_update_to_light_client_update(parse_light_client_finality_update(update))
+                    for update in recording['finality_updates']]
+    else:
+        genesis_validators_root = get_genesis_validators_root()
+        trusted_block_root = get_trusted_block_root()
+        light_client_bootstrap = get_light_client_bootstrap(trusted_block_root)
+        period_ranges = chunkify_range(compute_sync_committee_period_at_slot(light_client_bootstrap.header.beacon.slot),
+                                       compute_sync_committee_period_at_slot(get_current_slot()),
+                                       MAX_REQUEST_LIGHT_CLIENT_UPDATES)
+        updates = []
+        for (from_period, to_period) in period_ranges:
+            updates += get_updates_for_period(from_period, to_period + 1 - from_period)
+        updates.append(finality_update_to_light_client_update(get_finality_update()))
+
+    # no destination chains: updates are only proven against the local view of the light client store
+    initialize_light_client_store(trusted_block_root, light_client_bootstrap, genesis_validators_root)
+    with BundleWriter(output) as writer:
+        writer.write(encode_bootstrap_record(trusted_block_root, genesis_validators_root,
+                                             contract_middleware.store.current_sync_committee_poseidon,
+                                             light_client_bootstrap))
+        for update in updates:
+            start_time = time.time()
+            proven_update = process_light_client_update(
+                update, get_current_slot(tolerance=MAX_CLOCK_DISPARITY_SEC), genesis_validators_root)
+            if proven_update is not None:
+                writer.write(encode_update_record(proven_update, include_sync_committee))
+                print("Proven update: attested slot %s in %.1fs" % (
+                    update.attested_header.beacon.slot, time.time() - start_time))
+
+
+def check_bundles(path, committee_commitment_calldata=COMMITTEE_COMMITMENT_CALLDATA):
+    """
+    Check that the proof bundles of a file can be submitted, before deploying the contracts: without committee
+    commitment calldata, the contract needs the signing sync committee of every update
+    """
+    if committee_commitment_calldata:
+        return
+    for record_type, record in read_bundles(path):
+        if record_type == RECORD_BOOTSTRAP:
+            continue
+        fields = decode_update_record(record)
+        if fields['sync_committee'] is None:
+            sys.exit("%s: the update of attested slot %s was bundled without its signing sync committee, which is "
+                     "needed without committee commitment calldata (prove it again with --include-sync-committee)" % (
+                         path, fields['update'].attested_header.beacon.slot))
+
+
+def submit_bundles(path, destination_chains):
+    """
+    Submit the proof bundles of a file to the destination chains, in order
+    """
+    check_bundles(path)
+    init_contract(destination_chains)
+    for record_type, record in read_bundles(path):
+        if record_type == RECORD_BOOTSTRAP:
+            trusted_block_root, genesis_validators_root, sync_committee_poseidon, light_client_bootstrap = \
+                decode_bootstrap_record(record)
+            initialize_light_client_store(trusted_block_root, light_client_bootstrap, genesis_validators_root,
+                                          sync_committee_poseidon)
+            continue
+        fields = decode_update_record(record)
+        proven_update = ProvenUpdate(encoded_update=encode_light_client_update(fields['update']), **fields)
+        # wait for the submission, so that bundles are read only as fast as they are submitted
+        wait(submit_proven_update(proven_update))
+        print("Submitted update: attested slot", proven_update.update.attested_header.beacon.slot)
 
 
 if __name__ == "__main__":
-    init_contract()
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Relayer of the Ethereum beacon chain light client")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="prove and submit updates as they are produced (default)")
+    run_parser.add_argument('--optimistic', action='store_true', default=OPTIMISTIC_MODE,
+                            help="also relay the optimistic header every slot")
+    run_parser.add_argument('--profile', action='store_true', default=profiling.PROFILING,
+                            help="profile the updates, dumping the profile of the slow ones to " + profiling.PROFILE_DIR)
+    run_parser.add_argument('--slow-update-seconds', type=float, default=profiling.SLOW_UPDATE_SECONDS,
+                            help="duration of an update above which its profile is dumped")
+    prove_parser = subparsers.add_parser('prove', help="prove updates and write them as proof bundles")
+    prove_parser.add_argument('output', help="bundle file, overwritten if it exists")
+    prove_parser.add_argument('--recording', default=None, help="recorded updates, beacon chain node if omitted")
+    prove_parser.add_argument('--include-sync-committee', action='store_true', default=not COMMITTEE_COMMITMENT_CALLDATA,
+                              help="include the signing sync committee, needed without committee commitment calldata")
+    submit_parser = subparsers.add_parser('submit', help="submit proof bundles to the destination chains")
+    submit_parser.add_argument('bundles', help="bundle file")
+    submit_parser.add_argument('--rpc', action='append', default=None, help="destination chain, can be repeated")
+    args = parser.parse_args()
+
+    if args.command == 'prove':
+        prove_bundles(args.output, args.recording, args.include_sync_committee)
+    elif args.command == 'submit':
+        submit_bundles(args.bundles, args.rpc or DESTINATION_CHAINS)
+    else:
+        profiling.PROFILING = getattr(args, 'profile', profiling.PROFILING)
+        profiling.SLOW_UPDATE_SECONDS = getattr(args, 'slow_update_seconds', profiling.SLOW_UPDATE_SECONDS)
+        startup.mark('imports')
+        init_contract(DESTINATION_CHAINS)
+        startup.mark('contracts deployed')
+        asyncio.run(main(getattr(args, 'optimistic', OPTIMISTIC_MODE)))
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the relayer modules from the repository root, as relay.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
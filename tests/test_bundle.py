@@ -0,0 +1,108 @@
+import pytest
+
+from utils.bundle import (
+    BundleWriter, read_bundles, encode_bootstrap_record, decode_bootstrap_record, encode_update_record,
+    decode_update_record, RECORD_BOOTSTRAP, RECORD_UPDATE
+)
+from utils.contract_middleware import ProvenUpdate
+from utils.specs import (
+    LightClientBootstrap, LightClientUpdate, Root, Slot, BLSPubkey, SyncCommittee, SYNC_COMMITTEE_SIZE
+)
+from utils.sync_committee import CompactSyncCommittee
+
+SIGNATURE_PROOF = [[1, 2], [[3, 4], [5, 6]], [7, 8]]
+MAPPING_PROOF = [[9, 10], [[11, 12], [13, 14]], [2 ** 254, 16]]
+
+
+def make_update() -> LightClientUpdate:
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = 100
+    update.signature_slot = 101
+    update.sync_aggregate.sync_committee_bits = [i % 3 == 0 for i in range(SYNC_COMMITTEE_SIZE)]
+    return update
+
+
+def make_sync_committee() -> CompactSyncCommittee:
+    return CompactSyncCommittee.from_view(SyncCommittee(
+        pubkeys=[BLSPubkey(bytes([i % 256]) * 48) for i in range(SYNC_COMMITTEE_SIZE)],
+        aggregate_pubkey=BLSPubkey(b'\xaa' * 48),
+    ))
+
+
+def make_proven_update(**fields) -> ProvenUpdate:
+    return ProvenUpdate(
+        update=make_update(), encoded_update=None, current_slot=Slot(102), sync_committee=make_sync_committee(),
+        sync_committee_poseidon='0x2a', signature_proof=SIGNATURE_PROOF, **fields
+    )
+
+
+@pytest.mark.parametrize('fields', [
+    {},
+    {'next_sync_committee_poseidon': '0x2b', 'commitment_mapping_proof': MAPPING_PROOF},
+    {'next_sync_committee_poseidon': '0x2b', 'combined': True},
+])
+@pytest.mark.parametrize('include_sync_committee', [False, True])
+def test_update_record_roundtrip(fields, include_sync_committee):
+    proven_update = make_proven_update(**fields)
+    record = encode_update_record(proven_update, include_sync_committee)
+    assert record[0] == RECORD_UPDATE
+    decoded = decode_update_record(memoryview(record))
+
+    assert decoded['update'] == proven_update.update
+    assert decoded['current_slot'] == proven_update.current_slot
+    assert decoded['sync_committee_poseidon'] == proven_update.sync_committee_poseidon
+    assert decoded['signature_proof'] == SIGNATURE_PROOF
+    assert decoded['next_sync_committee_poseidon'] == proven_update.next_sync_committee_poseidon
+    assert decoded['commitment_mapping_proof'] == proven_update.commitment_mapping_proof
+    assert decoded['combined'] == proven_update.combined
+    if include_sync_committee:
+        assert decoded['sync_committee'] == proven_update.sync_committee
+    else:
+        assert decoded['sync_committee'] is None
+
+
+def test_bootstrap_record_roundtrip():
+    bootstrap = LightClientBootstrap()
+    bootstrap.header.beacon.slot = 64
+    record = encode_bootstrap_record(Root(b'\x01' * 32), Root(b'\x02' * 32), '0x2a', bootstrap)
+    assert record[0] == RECORD_BOOTSTRAP
+    assert decode_bootstrap_record(memoryview(record)) == (Root(b'\x01' * 32), Root(b'\x02' * 32), '0x2a', bootstrap)
+
+
+def test_bundle_file(tmp_path):
+    path = str(tmp_path / 'bundle')
+    records = [b'\x00bootstrap', b'\x01first update', b'\x01']
+    with BundleWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    assert [(record_type, bytes(record)) for record_type, record in read_bundles(path)] == \
+        [(record[0], record) for record in records]
+
+
+def test_truncated_bundle_file(tmp_path):
+    path = tmp_path / 'bundle'
+    with BundleWriter(str(path)) as writer:
+        writer.write(b'\x01first update')
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(AssertionError, match="Truncated proof bundle"):
+        list(read_bundles(str(path)))
+
+
+def test_not_a_bundle_file(tmp_path):
+    path = tmp_path / 'bundle'
+    path.write_bytes(b'PK\x03\x04')
+    with pytest.raises(AssertionError, match="Not a proof bundle file"):
+        list(read_bundles(str(path)))
+
+
+def test_submit_requires_signing_sync_committee(tmp_path):
+    relay = pytest.importorskip('relay')
+    path = str(tmp_path / 'bundle')
+    with BundleWriter(path) as writer:
+        writer.write(encode_update_record(make_proven_update(), include_sync_committee=True))
+        writer.write(encode_update_record(make_proven_update()))
+
+    # the committee commitment calldata mode does not need the sync committee
+    relay.check_bundles(path, committee_commitment_calldata=True)
+    with pytest.raises(SystemExit, match="attested slot 100 was bundled without its signing sync committee"):
+        relay.check_bundles(path, committee_commitment_calldata=False)
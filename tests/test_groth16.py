@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+pytest.importorskip('py_ecc')
+from py_ecc.optimized_bn128 import G1, G2, multiply, normalize, curve_order
+
+from utils import groth16
+
+# toxic waste of the synthetic setup: alpha, beta, gamma, delta and the scalars of IC_0..IC_2
+ALPHA, BETA, GAMMA, DELTA = 11, 13, 17, 19
+IC = [23, 29, 31]
+PUBLIC_SIGNALS = ['1234', '5678']
+
+
+def g1_json(scalar):
+    x, y = normalize(multiply(G1, scalar))
+    return [str(x.n), str(y.n), '1']
+
+
+def g2_json(scalar):
+    x, y = normalize(multiply(G2, scalar))
+    return [[str(c) for c in x.coeffs], [str(c) for c in y.coeffs], ['1', '0']]
+
+
+def make_vkey():
+    return {
+        'protocol': 'groth16',
+        'curve': 'bn128',
+        'nPublic': len(IC) - 1,
+        'vk_alpha_1': g1_json(ALPHA),
+        'vk_beta_2': g2_json(BETA),
+        'vk_gamma_2': g2_json(GAMMA),
+        'vk_delta_2': g2_json(DELTA),
+        'IC': [g1_json(scalar) for scalar in IC],
+    }
+
+
+def make_proof(public_signals, a=37, c=41):
+    """
+    Proof satisfying the verification equation, with B solved from the chosen A and C
+    """
+    x = (IC[0] + sum(int(signal) * scalar for signal, scalar in zip(public_signals, IC[1:]))) % curve_order
+    b = (ALPHA * BETA + x * GAMMA + c * DELTA) * pow(a, -1, curve_order) % curve_order
+    return {'pi_a': g1_json(a), 'pi_b': g2_json(b), 'pi_c': g1_json(c), 'protocol': 'groth16', 'curve': 'bn128'}
+
+
+@pytest.fixture(scope='module')
+def vkey(tmp_path_factory):
+    path = tmp_path_factory.mktemp('vkey') / 'synthetic_vkey.json'
+    path.write_text(json.dumps(make_vkey()))
+    return groth16.load_verification_key(str(path))
+
+
+@pytest.fixture(scope='module')
+def proof():
+    return make_proof(PUBLIC_SIGNALS)
+
+
+def test_valid_proof(vkey, proof):
+    assert groth16.verify(vkey, proof, PUBLIC_SIGNALS)
+
+
+def test_changed_public_signal(vkey, proof):
+    assert not groth16.verify(vkey, proof, ['1235', '5678'])
+
+
+def test_point_not_on_curve(vkey, proof):
+    off_curve = dict(proof, pi_a=[proof['pi_a'][0], str(int(proof['pi_a'][1]) + 1), '1'])
+    assert not groth16.verify(vkey, off_curve, PUBLIC_SIGNALS)
+
+
+def test_signal_outside_field(vkey, proof):
+    # same value modulo the field order, which the verifier must not accept as an alias
+    assert not groth16.verify(vkey, proof, [str(int(PUBLIC_SIGNALS[0]) + curve_order), PUBLIC_SIGNALS[1]])
+
+
+def test_wrong_signal_count(vkey, proof):
+    assert not groth16.verify(vkey, proof, PUBLIC_SIGNALS[:1])
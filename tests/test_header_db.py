@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from utils import contract_middleware
+from utils.header_db import HeaderDatabase
+from utils.specs import LightClientHeader
+from utils.ssz.ssz_impl import hash_tree_root
+
+
+def make_header(slot) -> LightClientHeader:
+    header = LightClientHeader()
+    header.beacon.slot = slot
+    header.beacon.state_root = bytes([slot % 256]) * 32
+    header.execution.block_number = slot + 1000
+    header.execution.block_hash = bytes([slot % 256, 0xab]) * 16
+    return header
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = HeaderDatabase(str(tmp_path / 'headers.sqlite'))
+    for slot in [64, 96, 128]:
+        database.add_header('chain-a', make_header(slot), '0x%064x' % slot)
+    database.add_header('chain-b', make_header(96), '0x%064x' % 1)
+    yield database
+    database.close()
+
+
+def test_get_by_slot(database):
+    headers = database.get_by_slot(96)
+    assert [header['chain'] for header in headers] == ['chain-a', 'chain-b']
+    assert headers[0]['execution_block_number'] == 1096
+    assert headers[0]['tx_hash'] == '0x%064x' % 96
+    assert [header['chain'] for header in database.get_by_slot(96, 'chain-b')] == ['chain-b']
+    assert database.get_by_slot(97) == []
+
+
+def test_get_by_roots_and_block(database):
+    header = make_header(128)
+    beacon_root = '0x' + bytes(hash_tree_root(header.beacon)).hex()
+    # hashes are matched regardless of their case
+    block_hash = '0x' + bytes(header.execution.block_hash).hex().upper()
+    assert [row['beacon_slot'] for row in database.get_by_beacon_root(beacon_root)] == [128]
+    assert [row['beacon_slot'] for row in database.get_by_block_hash(block_hash)] == [128]
+    assert [row['beacon_slot'] for row in database.get_by_block_number(1128)] == [128]
+
+
+def test_get_range_and_latest(database):
+    assert [(row['beacon_slot'], row['chain']) for row in database.get_range(64, 96)] == \
+        [(64, 'chain-a'), (96, 'chain-a'), (96, 'chain-b')]
+    assert [row['beacon_slot'] for row in database.get_range(65, 200, 'chain-a')] == [96, 128]
+    assert database.latest()['beacon_slot'] == 128
+    assert database.latest('chain-b')['beacon_slot'] == 96
+    assert database.latest('chain-c') is None
+
+
+def test_resubmitted_header_is_replaced(database):
+    database.add_header('chain-a', make_header(64), '0x%064x' % 2)
+    headers = database.get_by_slot(64)
+    assert len(headers) == 1
+    assert headers[0]['tx_hash'] == '0x%064x' % 2
+
+
+def test_persistence(tmp_path):
+    path = str(tmp_path / 'headers.sqlite')
+    database = HeaderDatabase(path)
+    database.add_header('chain-a', make_header(64), '0x%064x' % 64)
+    database.close()
+    assert HeaderDatabase(path).latest()['beacon_slot'] == 64
+
+
+def test_get_header_db_opens_a_single_database(tmp_path, monkeypatch):
+    opened = []
+
+    class SlowHeaderDatabase:
+        def __init__(self, path):
+            # leave time to the other threads to check the global
+            time.sleep(0.05)
+            opened.append(path)
+
+    monkeypatch.setattr(contract_middleware, 'HEADER_DB_PATH', str(tmp_path / 'headers.sqlite'))
+    monkeypatch.setattr(contract_middleware, 'HeaderDatabase', SlowHeaderDatabase)
+    monkeypatch.setattr(contract_middleware, 'header_db', None)
+    databases = []
+    threads = [threading.Thread(target=lambda: databases.append(contract_middleware.get_header_db()))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+    assert len(databases) == 4 and all(database is databases[0] for database in databases)
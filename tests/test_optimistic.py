@@ -0,0 +1,121 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from utils import contract_middleware
+from utils.specs import LightClientUpdate, MyLightClientStore, SYNC_COMMITTEE_SIZE
+from utils.ssz.ssz_typing import uint64
+from utils.sync_committee import CompactSyncCommittee
+
+
+def make_store() -> MyLightClientStore:
+    return MyLightClientStore(
+        beacon_slot=uint64(0),
+        current_sync_committee=CompactSyncCommittee.empty(),
+        next_sync_committee=CompactSyncCommittee.empty(),
+        previous_max_active_participants=uint64(0),
+        current_max_active_participants=uint64(0),
+        current_sync_committee_poseidon='0x1',
+    )
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class FakeTarget(contract_middleware.LightClientTarget):
+    """
+    Destination chain whose transactions get the given receipt statuses, in order
+    """
+
+    def __init__(self, name, statuses):
+        self.name = name
+        self.store = make_store()
+        self.executor = ImmediateExecutor()
+        self.statuses = list(statuses)
+
+    def process_light_client_optimistic_update_call(self, *args, **kwargs):
+        return None
+
+    def transact(self, call):
+        return SimpleNamespace(status=self.statuses.pop(0), transactionHash=bytes(32))
+
+    def reconcile(self):
+        return True
+
+
+def test_optimistic_slot_advances_once_accepted(monkeypatch):
+    def fake_prove(store, update, current_slot, genesis_validators_root):
+        return contract_middleware.ProvenUpdate(
+            update=update, encoded_update=None, current_slot=current_slot, sync_committee=None,
+            sync_committee_poseidon='0x1', signature_proof=None
+        )
+
+    target = FakeTarget('chain', statuses=[0, 1])
+    monkeypatch.setattr(contract_middleware, 'targets', [target])
+    monkeypatch.setattr(contract_middleware, 'store', make_store())
+    monkeypatch.setattr(contract_middleware, 'preflight_light_client_update', lambda *args, **kwargs: None)
+    monkeypatch.setattr(contract_middleware, 'prove_signature', fake_prove)
+
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = 100
+    update.signature_slot = 101
+    update.sync_aggregate.sync_committee_bits = [True] * SYNC_COMMITTEE_SIZE
+
+    # the transaction reverts: neither the prover nor the destination chain advance
+    contract_middleware.process_light_client_optimistic_update(update, 102, None)
+    assert contract_middleware.store.optimistic_slot == 0
+    assert target.store.optimistic_slot == 0
+
+    contract_middleware.process_light_client_optimistic_update(update, 102, None)
+    assert contract_middleware.store.optimistic_slot == 100
+    assert target.store.optimistic_slot == 100
+
+
+def test_header_superseded_while_proving_is_submitted(monkeypatch):
+    latest_polled = {'slot': 100}
+
+    def slow_prove(store, update, current_slot, genesis_validators_root):
+        # newer optimistic updates are polled every slot while proving
+        latest_polled['slot'] = 110
+        return contract_middleware.ProvenUpdate(
+            update=update, encoded_update=None, current_slot=current_slot, sync_committee=None,
+            sync_committee_poseidon='0x1', signature_proof=None
+        )
+
+    target = FakeTarget('chain', statuses=[1])
+    monkeypatch.setattr(contract_middleware, 'targets', [target])
+    monkeypatch.setattr(contract_middleware, 'store', make_store())
+    monkeypatch.setattr(contract_middleware, 'preflight_light_client_update', lambda *args, **kwargs: None)
+    monkeypatch.setattr(contract_middleware, 'prove_signature', slow_prove)
+
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = 100
+    update.signature_slot = 101
+    update.sync_aggregate.sync_committee_bits = [True] * SYNC_COMMITTEE_SIZE
+
+    proven_update = contract_middleware.process_light_client_optimistic_update(
+        update, 102, None, is_superseded=lambda: latest_polled['slot'] > 100)
+    assert proven_update is not None
+    assert target.statuses == []
+    assert target.store.optimistic_slot == 100
+
+
+def test_header_superseded_before_proving_is_dropped(monkeypatch):
+    def prove(*args):
+        raise AssertionError("superseded headers are not proven")
+
+    monkeypatch.setattr(contract_middleware, 'targets', [FakeTarget('chain', statuses=[])])
+    monkeypatch.setattr(contract_middleware, 'store', make_store())
+    monkeypatch.setattr(contract_middleware, 'preflight_light_client_update', lambda *args, **kwargs: None)
+    monkeypatch.setattr(contract_middleware, 'prove_signature', prove)
+
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = 100
+    assert contract_middleware.process_light_client_optimistic_update(
+        update, 102, None, is_superseded=lambda: True) is None
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+import requests
+
+from utils import beacon_middleware
+from utils.parsing import iter_json_array, TruncatedJSONError
+
+ELEMENTS = [
+    {'data': {'slot': '1', 'branch': ['0x00', '0x01']}},
+    {'data': {'text': 'braces } ] { [ and "quotes" \\ in strings', 'unicode': 'période'}},
+    {'data': {'nested': [[1, 2], {'a': []}], 'empty': {}}},
+]
+
+
+def split(data: bytes, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 1 << 20])
+def test_iter_json_array_split_chunks(size):
+    data = json.dumps(ELEMENTS, ensure_ascii=False, indent=1).encode()
+    assert list(iter_json_array(split(data, size))) == ELEMENTS
+
+
+def test_iter_json_array_yields_complete_elements_only():
+    data = json.dumps(ELEMENTS).encode()
+    first_end = len(json.dumps([ELEMENTS[0]]).encode()) - 1
+    elements = iter_json_array(split(data, first_end))
+    assert next(elements) == ELEMENTS[0]
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array([b' [ ', b' ] '])) == []
+
+
+@pytest.mark.parametrize('size', [1, 5, 1 << 20])
+def test_iter_json_array_truncated(size):
+    data = json.dumps(ELEMENTS).encode()
+    elements = []
+    with pytest.raises(TruncatedJSONError):
+        for element in iter_json_array(split(data[:-20], size)):
+            elements.append(element)
+    assert elements == ELEMENTS[:2]
+
+
+def test_iter_json_array_not_an_array():
+    with pytest.raises(AssertionError):
+        list(iter_json_array([b'{"data": []}']))
+
+
+def test_truncated_stream_is_retryable(monkeypatch):
+    class Response:
+        ok = True
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def iter_content(self, chunk_size):
+            return split(json.dumps(ELEMENTS).encode()[:-20], 16)
+
+    monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: Response())
+    with pytest.raises(requests.RequestException):
+        list(beacon_middleware.stream_beacon_api('http://localhost/eth/v1/beacon/light_client/updates'))
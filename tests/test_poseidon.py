@@ -0,0 +1,260 @@
+import json
+import os
+
+import pytest
+
+from utils import circuit_middleware, poseidon
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+# input of a run of the rotate circuit (./data/sync_committee_poseidon_data.json) and its public signals
+# (./build/rotate/rotate_public.json)
+ROTATE_DATA_FIXTURE = os.path.join(FIXTURES_DIR, 'rotate_data.json')
+ROTATE_PUBLIC_FIXTURE = os.path.join(FIXTURES_DIR, 'rotate_public.json')
+P = poseidon.FIELD_MODULUS
+
+
+def grain_constants(t, n_rounds_p, n_rounds_f=poseidon.N_ROUNDS_F):
+    """
+    Round constants and MDS matrix of the reference Poseidon instance (Grain LFSR, x^5 S-box, 254 bits), as in circomlib
+    """
+    bits = [0, 1, 0, 0, 0, 0] + [int(b) for b in '{:012b}{:012b}{:010b}{:010b}'.format(254, t, n_rounds_f, n_rounds_p)]
+    bits += [1] * 30
+
+    def next_bit():
+        bit = bits[62] ^ bits[51] ^ bits[38] ^ bits[23] ^ bits[13] ^ bits[0]
+        bits.pop(0)
+        bits.append(bit)
+        return bit
+
+    def next_element():
+        value = []
+        while len(value) < 254:
+            if next_bit():
+                value.append(next_bit())
+            else:
+                next_bit()
+        return int(''.join(map(str, value)), 2)
+
+    for _ in range(160):
+        next_bit()
+    round_constants = []
+    while len(round_constants) < t * (n_rounds_f + n_rounds_p):
+        value = next_element()
+        if value < P:
+            round_constants.append(value)
+    xy = [next_element() % P for _ in range(2 * t)]
+    mds = [[pow(xy[i] + xy[t + j], -1, P) for j in range(t)] for i in range(t)]
+    return [round_constants[r * t:(r + 1) * t] for r in range(n_rounds_f + n_rounds_p)], mds
+
+
+def mat_vec(matrix, vector):
+    return [sum(a * b for a, b in zip(row, vector)) % P for row in matrix]
+
+
+def mat_mul(x, y):
+    return [[sum(a * b for a, b in zip(row, column)) % P for column in zip(*y)] for row in x]
+
+
+def mat_inv(matrix):
+    n = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for c in range(n):
+        pivot = next(r for r in range(c, n) if rows[r][c])
+        rows[c], rows[pivot] = rows[pivot], rows[c]
+        inverse = pow(rows[c][c], -1, P)
+        rows[c] = [x * inverse % P for x in rows[c]]
+        for r in range(n):
+            if r != c and rows[r][c]:
+                factor = rows[r][c]
+                rows[r] = [(x - factor * y) % P for x, y in zip(rows[r], rows[c])]
+    return [row[n:] for row in rows]
+
+
+def reference_permutation(state, round_constants, mds, n_rounds_f=poseidon.N_ROUNDS_F):
+    """
+    Unoptimized Poseidon permutation: add round constants, S-box (full or first element only), mix
+    """
+    n_rounds_p = len(round_constants) - n_rounds_f
+    for r, constants in enumerate(round_constants):
+        state = [(x + c) % P for x, c in zip(state, constants)]
+        if n_rounds_f // 2 <= r < n_rounds_f // 2 + n_rounds_p:
+            state = [pow(state[0], 5, P)] + state[1:]
+        else:
+            state = [pow(x, 5, P) for x in state]
+        state = mat_vec(mds, state)
+    return state
+
+
+def optimized_constants(round_constants, mds, n_rounds_f=poseidon.N_ROUNDS_F):
+    """
+    C, S, M, P of the reference instance in the layout of circomlib's poseidon_constants.circom
+    """
+    t = len(mds)
+    n_rounds_p = len(round_constants) - n_rounds_f
+    half = n_rounds_f // 2
+    mds_inv = mat_inv(mds)
+    # the constants of a round are added after the S-box of the previous one, before its mix
+    c = list(round_constants[0])
+    for r in range(1, half):
+        c += mat_vec(mds_inv, round_constants[r])
+    # partial rounds only add to the S-boxed element, the rest of their constants is moved to the previous rounds
+    carry = mat_vec(mds_inv, round_constants[half + n_rounds_p])
+    partial = []
+    for r in reversed(range(half, half + n_rounds_p)):
+        partial.insert(0, carry[0])
+        carry = mat_vec(mds_inv, [round_constants[r][0]] + [(a + b) % P for a, b in zip(round_constants[r][1:], carry[1:])])
+    c += carry + partial
+    for r in range(half + n_rounds_p + 1, n_rounds_f + n_rounds_p):
+        c += mat_vec(mds_inv, round_constants[r])
+
+    # partial round mixes as sparse matrices, the dense remainder is moved to the mix before the partial rounds
+    matrix = mds
+    s = []
+    for _ in range(n_rounds_p):
+        inner = [row[1:] for row in matrix[1:]]
+        first_row = [matrix[0][0]] + mat_vec(list(map(list, zip(*mat_inv(inner)))), matrix[0][1:])
+        s = first_row + [row[0] for row in matrix[1:]] + s
+        matrix = mat_mul([[1] + [0] * (t - 1)] + [[0] + row for row in inner], mds)
+    # circomlib stores the matrices transposed
+    return {'C': c, 'S': s, 'M': [list(column) for column in zip(*mds)], 'P': [list(column) for column in zip(*matrix)]}
+
+
+@pytest.fixture
+def reference_instances(monkeypatch):
+    """
+    Use the reference instances through poseidon_ex, without the circomlib sources
+    """
+    instances = {}
+    monkeypatch.setattr(poseidon, 'constants', {})
+
+    def load(t):
+        if t not in instances:
+            instances[t] = grain_constants(t, poseidon.N_ROUNDS_P[t - 2])
+            poseidon.constants[t] = optimized_constants(*instances[t])
+        return instances[t]
+    return load
+
+
+def test_decompress_g1():
+    point_compression = pytest.importorskip('py_ecc.bls.point_compression')
+    optimized_bls12_381 = pytest.importorskip('py_ecc.optimized_bls12_381')
+    for scalar in [1, 2, 12345]:
+        point = optimized_bls12_381.multiply(optimized_bls12_381.G1, scalar)
+        pubkey = point_compression.compress_G1(point).to_bytes(48, 'big')
+        x, y = optimized_bls12_381.normalize(point)
+        assert poseidon.decompress_g1(pubkey) == (x.n, y.n)
+
+
+def test_poseidon_ex_known_answers(reference_instances):
+    # circomlib's poseidon test vectors
+    reference_instances(3)
+    reference_instances(5)
+    assert poseidon.poseidon_ex([1, 2])[0] == 0x115cc0f5e7d690413df64c6b9662e9cf2a3617f2743245519e19607a4417189a
+    assert poseidon.poseidon_ex([1, 2, 3, 4])[0] == \
+        0x299c867db6c1fdd79dcefa40e4510b9837e60ebb1ce0663dbaa525df65250465
+
+
+def test_poseidon_ex_matches_reference_permutation(reference_instances):
+    round_constants, mds = reference_instances(3)
+    assert poseidon.poseidon_ex([5, 6], initial_state=7, n_outs=3) == \
+        reference_permutation([7, 5, 6], round_constants, mds)
+
+
+def test_sync_committee_poseidon_matches_reference(reference_instances):
+    optimized_bls12_381 = pytest.importorskip('py_ecc.optimized_bls12_381')
+    point_compression = pytest.importorskip('py_ecc.bls.point_compression')
+    round_constants, mds = reference_instances(poseidon.SPONGE_SIZE + 1)
+    # 8 pubkeys fill 7 sponge rounds, enough to cover the chaining of the rounds
+    points = [optimized_bls12_381.multiply(optimized_bls12_381.G1, 1000 + i) for i in range(8)]
+    pubkeys = [point_compression.compress_G1(point).to_bytes(48, 'big') for point in points]
+
+    # PoseidonG1Array: 55 bit limbs of x and y interleaved, absorbed 16 at a time, the last round squeezing twice
+    inputs = []
+    for x, y in map(optimized_bls12_381.normalize, points):
+        for j in range(poseidon.K):
+            inputs += [(x.n >> (poseidon.N * j)) % (1 << poseidon.N), (y.n >> (poseidon.N * j)) % (1 << poseidon.N)]
+    state = 0
+    for i in range(0, len(inputs), poseidon.SPONGE_SIZE):
+        outputs = reference_permutation([state] + inputs[i:i + poseidon.SPONGE_SIZE], round_constants, mds)
+        state = outputs[0]
+    assert int(poseidon.sync_committee_poseidon(pubkeys), 16) == outputs[1]
+
+
+def test_sync_committee_poseidon_matches_rotate_circuit():
+    if not os.path.exists(ROTATE_DATA_FIXTURE) or not os.path.exists(ROTATE_PUBLIC_FIXTURE):
+        pytest.skip("no recorded run of the rotate circuit in tests/fixtures")
+    if not os.path.exists(poseidon.POSEIDON_CONSTANTS_PATH):
+        pytest.skip("circomlib constants not installed")
+    with open(ROTATE_DATA_FIXTURE, 'r') as file:
+        pubkeys = [bytes.fromhex(pubkey[2:]) for pubkey in json.load(file)['pubkeys']]
+    with open(ROTATE_PUBLIC_FIXTURE, 'r') as file:
+        expected = int(json.load(file)[1])
+    assert int(poseidon.sync_committee_poseidon(pubkeys), 16) == expected
+
+
+def test_native_poseidon_used_once_verified(monkeypatch):
+    circuit_runs = []
+
+    def fake_poseidon_committment(sync_committee):
+        circuit_runs.append(sync_committee)
+        circuit_middleware.check_native_poseidon(sync_committee, '0x2a')
+        return None, '0x2a'
+
+    monkeypatch.setattr(circuit_middleware, 'NATIVE_POSEIDON', True)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_verified', False)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_mismatch', False)
+    monkeypatch.setattr(circuit_middleware, 'poseidon_committment', fake_poseidon_committment)
+    monkeypatch.setattr(circuit_middleware, 'native_sync_committee_poseidon', lambda sync_committee: '0x2a')
+
+    assert circuit_middleware.compute_sync_committee_poseidon('bootstrap') == '0x2a'
+    assert circuit_runs == ['bootstrap']
+    assert circuit_middleware.compute_sync_committee_poseidon('next') == '0x2a'
+    assert circuit_runs == ['bootstrap']
+
+
+def test_native_poseidon_disabled_on_mismatch(monkeypatch):
+    circuit_runs = []
+
+    def fake_poseidon_committment(sync_committee):
+        circuit_runs.append(sync_committee)
+        circuit_middleware.check_native_poseidon(sync_committee, '0x2a')
+        return None, '0x2a'
+
+    monkeypatch.setattr(circuit_middleware, 'NATIVE_POSEIDON', True)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_verified', False)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_mismatch', False)
+    monkeypatch.setattr(circuit_middleware, 'poseidon_committment', fake_poseidon_committment)
+    monkeypatch.setattr(circuit_middleware, 'native_sync_committee_poseidon', lambda sync_committee: '0x2b')
+
+    assert circuit_middleware.compute_sync_committee_poseidon('bootstrap') == '0x2a'
+    assert circuit_middleware.compute_sync_committee_poseidon('next') == '0x2a'
+    assert circuit_runs == ['bootstrap', 'next']
+
+
+@pytest.mark.parametrize('error', [OSError("missing"), ValueError("malformed"), KeyError('C'),
+                                   json.JSONDecodeError("truncated", "", 0)])
+def test_native_poseidon_unavailable(monkeypatch, error):
+    def failing_native_poseidon(sync_committee):
+        raise error
+
+    monkeypatch.setattr(circuit_middleware, 'NATIVE_POSEIDON', True)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_verified', False)
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_mismatch', False)
+    monkeypatch.setattr(circuit_middleware, 'native_sync_committee_poseidon', failing_native_poseidon)
+    circuit_middleware.check_native_poseidon('bootstrap', '0x2a')
+    assert not circuit_middleware.native_poseidon_verified
+    assert not circuit_middleware.native_poseidon_mismatch
+
+    # even once verified, a failure falls back to the rotate circuit
+    monkeypatch.setattr(circuit_middleware, 'native_poseidon_verified', True)
+    monkeypatch.setattr(circuit_middleware, 'poseidon_committment', lambda sync_committee: (None, '0x2a'))
+    assert circuit_middleware.compute_sync_committee_poseidon('next') == '0x2a'
+
+
+def test_read_constant_malformed():
+    with pytest.raises(ValueError):
+        poseidon.read_constant("function POSEIDON_C(t) {\n    if (t==2) {\n        return [0x1, 0x2];\n    }\n}\n",
+                               'POSEIDON_C', 3)
+    with pytest.raises(ValueError):
+        poseidon.read_constant("function POSEIDON_C(t) {\n    if (t==3) {\n        return [0x1, 0x2 +];\n    }\n}\n",
+                               'POSEIDON_C', 3)
@@ -0,0 +1,121 @@
+import pytest
+
+from utils.preflight import preflight_light_client_update
+from utils.specs import (
+    LightClientUpdate, MyLightClientStore, SyncCommittee, BLSPubkey, BLSSignature, Bytes32, Root, Slot,
+    SYNC_COMMITTEE_SIZE, FINALIZED_ROOT_INDEX, NEXT_SYNC_COMMITTEE_INDEX, DOMAIN_SYNC_COMMITTEE, floorlog2, hash,
+    hash_tree_root, compute_fork_version, compute_epoch_at_slot, compute_domain, compute_signing_root
+)
+from utils.ssz.ssz_typing import uint64
+from utils.sync_committee import CompactSyncCommittee
+
+STORE_SLOT = 100
+
+
+def make_store() -> MyLightClientStore:
+    return MyLightClientStore(
+        beacon_slot=uint64(STORE_SLOT),
+        current_sync_committee=CompactSyncCommittee.empty(),
+        next_sync_committee=CompactSyncCommittee.empty(),
+        previous_max_active_participants=uint64(0),
+        current_max_active_participants=uint64(0),
+    )
+
+
+def make_sync_committee_update(attested_slot, finalized_slot=None) -> LightClientUpdate:
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = attested_slot
+    update.signature_slot = attested_slot + 1
+    update.sync_aggregate.sync_committee_bits = [True] * SYNC_COMMITTEE_SIZE
+    update.next_sync_committee_branch = [Bytes32(b'\x01' * 32)] * floorlog2(NEXT_SYNC_COMMITTEE_INDEX)
+    if finalized_slot is not None:
+        update.finalized_header.beacon.slot = finalized_slot
+        update.finality_branch = [Bytes32(b'\x01' * 32)] * floorlog2(FINALIZED_ROOT_INDEX)
+    return update
+
+
+def test_non_finalized_sync_committee_update_at_store_period():
+    # the contract ignores a sync committee update whose next sync committee is not finalized
+    update = make_sync_committee_update(STORE_SLOT + 20)
+    with pytest.raises(AssertionError, match="Stale finalized header"):
+        preflight_light_client_update(make_store(), update, STORE_SLOT + 30, Bytes32())
+
+
+def test_finalized_sync_committee_update_at_store_period():
+    # the update finalizes the next sync committee: it is relevant, and fails later on its (fake) finality branch
+    update = make_sync_committee_update(STORE_SLOT + 20, finalized_slot=STORE_SLOT - 10)
+    with pytest.raises(AssertionError, match="Invalid finality branch"):
+        preflight_light_client_update(make_store(), update, STORE_SLOT + 30, Bytes32())
+
+
+def test_finalized_sync_committee_update_of_another_period():
+    # the finalized header is in the previous period of the attested one
+    update = make_sync_committee_update(8192 + 20, finalized_slot=STORE_SLOT - 10)
+    store = make_store()
+    store.beacon_slot = uint64(8192 + 10)
+    with pytest.raises(AssertionError, match="Stale finalized header"):
+        preflight_light_client_update(store, update, 8192 + 30, Bytes32())
+
+
+def state_root_and_branches(leaves):
+    """
+    Root of a state whose only known nodes are the given leaves (by generalized index), and the branch of each leaf
+    """
+    def node(gindex):
+        if gindex in leaves:
+            return leaves[gindex]
+        if any(leaf >> (leaf.bit_length() - gindex.bit_length()) == gindex for leaf in leaves if leaf > gindex):
+            return hash(node(2 * gindex) + node(2 * gindex + 1))
+        # any other subtree of the state
+        return Bytes32(gindex.to_bytes(32, 'big'))
+
+    branches = {}
+    for leaf in leaves:
+        branch, gindex = [], leaf
+        while gindex > 1:
+            branch.append(node(gindex ^ 1))
+            gindex //= 2
+        branches[leaf] = branch
+    return node(1), branches
+
+
+def test_signed_update_passes():
+    bls = pytest.importorskip('milagro_bls_binding')
+    # validators may appear several times in a sync committee
+    secret_keys = [(i + 1).to_bytes(32, 'big') for i in range(16)]
+    members = [i % len(secret_keys) for i in range(SYNC_COMMITTEE_SIZE)]
+    pubkeys = [bls.SkToPk(secret_key) for secret_key in secret_keys]
+    sync_committee = SyncCommittee(
+        pubkeys=[BLSPubkey(pubkeys[member]) for member in members],
+        aggregate_pubkey=BLSPubkey(bls._AggregatePKs([pubkeys[member] for member in members])),
+    )
+    store = make_store()
+    store.current_sync_committee = CompactSyncCommittee.from_view(sync_committee)
+
+    # finalizes the next sync committee of the store period
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = STORE_SLOT + 20
+    update.signature_slot = STORE_SLOT + 21
+    update.finalized_header.beacon.slot = STORE_SLOT + 10
+    update.next_sync_committee = sync_committee
+    state_root, branches = state_root_and_branches({
+        FINALIZED_ROOT_INDEX: hash_tree_root(update.finalized_header.beacon),
+        NEXT_SYNC_COMMITTEE_INDEX: hash_tree_root(sync_committee),
+    })
+    update.attested_header.beacon.state_root = state_root
+    update.finality_branch = branches[FINALIZED_ROOT_INDEX]
+    update.next_sync_committee_branch = branches[NEXT_SYNC_COMMITTEE_INDEX]
+
+    genesis_validators_root = Root(b'\x42' * 32)
+    fork_version = compute_fork_version(compute_epoch_at_slot(update.signature_slot - Slot(1)))
+    domain = compute_domain(DOMAIN_SYNC_COMMITTEE, fork_version, genesis_validators_root)
+    signing_root = bytes(compute_signing_root(update.attested_header.beacon, domain))
+    signatures = [bls.Sign(secret_key, signing_root) for secret_key in secret_keys]
+    update.sync_aggregate.sync_committee_bits = [True] * SYNC_COMMITTEE_SIZE
+    update.sync_aggregate.sync_committee_signature = BLSSignature(
+        bls.Aggregate([signatures[member] for member in members]))
+
+    preflight_light_client_update(store, update, STORE_SLOT + 30, genesis_validators_root)
+    # signed for another chain
+    with pytest.raises(AssertionError, match="Invalid sync committee signature"):
+        preflight_light_client_update(store, update, STORE_SLOT + 30, Root(b'\x43' * 32))
@@ -0,0 +1,95 @@
+import os
+
+from utils.circuit_middleware import snarkjs_proof, step_public_signals
+from utils.proof_cache import ProofCache
+
+PROOF = [[1, 2], [[3, 4], [5, 6]], [7, 8]]
+
+
+def test_invalid_entries_loaded_from_disk_are_dropped(tmp_path):
+    ProofCache(4, str(tmp_path)).put('key', PROOF)
+
+    cache = ProofCache(4, str(tmp_path))
+    assert cache.get('key', validate=lambda proof: False) is None
+    assert not os.path.exists(tmp_path / 'key.json')
+    assert cache.get('key') is None
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'invalid': 1, 'entries': 0}
+
+
+def test_valid_entries_loaded_from_disk_are_checked_once(tmp_path):
+    ProofCache(4, str(tmp_path)).put('key', PROOF)
+
+    checked = []
+    cache = ProofCache(4, str(tmp_path))
+    assert cache.get('key', validate=lambda proof: checked.append(proof) or True) == PROOF
+    assert cache.get('key', validate=lambda proof: checked.append(proof) or True) == PROOF
+    assert checked == [PROOF]
+
+
+def test_snarkjs_proof():
+    # read_proof swaps the coordinates of pi_b for the contract
+    proof = snarkjs_proof(PROOF)
+    assert proof['pi_a'][:2] == ['1', '2']
+    assert proof['pi_b'][:2] == [['4', '3'], ['6', '5']]
+    assert proof['pi_c'][:2] == ['7', '8']
+
+
+def test_step_public_signals():
+    signals = step_public_signals('0x2a', bytes(range(32)))
+    assert signals == ['42'] + [str(i) for i in range(32)]
+
+
+def test_lru_eviction():
+    cache = ProofCache(2)
+    cache.put('a', PROOF)
+    cache.put('b', PROOF)
+    assert cache.get('a') == PROOF
+    cache.put('c', PROOF)
+    # b is the least recently used entry
+    assert cache.get('b') is None
+    assert cache.get('a') == PROOF
+    assert cache.get('c') == PROOF
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'invalid': 0, 'entries': 2}
+
+
+def test_eviction_removes_files(tmp_path):
+    cache = ProofCache(2, str(tmp_path))
+    for key in ['a', 'b', 'c']:
+        cache.put(key, PROOF)
+    assert sorted(os.listdir(tmp_path)) == ['b.json', 'c.json']
+
+
+def test_reload_from_disk(tmp_path):
+    cache = ProofCache(3, str(tmp_path))
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, PROOF)
+        # the least recently used order is restored from the modification times
+        os.utime(tmp_path / f'{key}.json', (i, i))
+
+    reloaded = ProofCache(2, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['b.json', 'c.json']
+    assert reloaded.stats()['entries'] == 2
+    assert reloaded.get('a') is None
+    assert reloaded.get('b') == PROOF
+    assert reloaded.get('c') == PROOF
+
+
+def test_use_order_survives_reopening(tmp_path):
+    cache = ProofCache(3, str(tmp_path))
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, PROOF)
+        os.utime(tmp_path / f'{key}.json', (i, i))
+
+    # a, the oldest entry, is used after a restart: b becomes the least recently used one
+    assert ProofCache(3, str(tmp_path)).get('a') == PROOF
+    reloaded = ProofCache(2, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'c.json']
+    assert reloaded.get('a') == PROOF
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    ProofCache(2, str(tmp_path)).put('a', PROOF)
+    (tmp_path / 'a.json').write_text('{"truncated')
+    cache = ProofCache(2, str(tmp_path))
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
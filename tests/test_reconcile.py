@@ -0,0 +1,101 @@
+from utils import contract_middleware
+from utils.specs import MyLightClientStore, SyncCommittee, BLSPubkey, SYNC_COMMITTEE_SIZE
+from utils.ssz.ssz_typing import uint64
+from utils.sync_committee import CompactSyncCommittee
+
+
+def make_sync_committee(seed) -> CompactSyncCommittee:
+    return CompactSyncCommittee.from_view(SyncCommittee(
+        pubkeys=[BLSPubkey(bytes([seed]) * 48)] * SYNC_COMMITTEE_SIZE,
+        aggregate_pubkey=BLSPubkey(bytes([seed]) * 48),
+    ))
+
+
+def make_store(beacon_slot, current, next_sync_committee, current_poseidon, next_poseidon) -> MyLightClientStore:
+    return MyLightClientStore(
+        beacon_slot=uint64(beacon_slot),
+        current_sync_committee=current,
+        next_sync_committee=next_sync_committee,
+        previous_max_active_participants=uint64(0),
+        current_max_active_participants=uint64(0),
+        current_sync_committee_poseidon=current_poseidon,
+        next_sync_committee_poseidon=next_poseidon,
+    )
+
+
+def onchain_store(store):
+    def poseidon(value):
+        return bytes(32) if value is None else int(value, 16).to_bytes(32, 'big')
+
+    return {
+        'beacon_slot': int(store.beacon_slot),
+        'current_sync_committee_root': contract_middleware.sync_committee_root(store.current_sync_committee),
+        'next_sync_committee_root': contract_middleware.sync_committee_root(store.next_sync_committee),
+        'current_sync_committee_poseidon': poseidon(store.current_sync_committee_poseidon),
+        'next_sync_committee_poseidon': poseidon(store.next_sync_committee_poseidon),
+    }
+
+
+class FakeTarget(contract_middleware.LightClientTarget):
+    """
+    Destination chain whose contract holds the given light client store
+    """
+
+    def __init__(self, store, onchain):
+        self.name = 'chain'
+        self.store = store
+        self.onchain = onchain
+
+    def read_light_client_store(self):
+        return self.onchain
+
+
+def test_reconcile_after_missed_rotation(monkeypatch):
+    first, second, third = make_sync_committee(1), make_sync_committee(2), make_sync_committee(3)
+    # the local view applied a rotation the contract did not
+    local = make_store(8192 * 2, second, third, '0x2', '0x3')
+    contract = make_store(8192, first, second, '0x1', '0x2')
+    monkeypatch.setattr(contract_middleware, 'store', make_store(8192, first, second, '0x1', '0x2'))
+
+    target = FakeTarget(local, onchain_store(contract))
+    assert target.reconcile()
+    assert target.store == contract
+    assert target.reconcile()
+
+
+def test_reconcile_unknown_next_sync_committee(monkeypatch):
+    first, second = make_sync_committee(1), make_sync_committee(2)
+    # the local view applied a sync committee update the contract did not, no store holds an empty committee
+    monkeypatch.setattr(contract_middleware, 'store', make_store(8192, first, second, '0x1', '0x2'))
+    contract = make_store(8192, first, CompactSyncCommittee.empty(), '0x1', None)
+    onchain = onchain_store(contract)
+    # a poseidon left for the zero root is not trusted
+    onchain['next_sync_committee_poseidon'] = (2).to_bytes(32, 'big')
+
+    target = FakeTarget(make_store(8192, first, second, '0x1', '0x2'), onchain)
+    assert target.reconcile()
+    assert target.store.next_sync_committee.is_empty()
+    assert target.store.next_sync_committee_poseidon is None
+    assert target.store == contract
+
+
+def test_reconcile_unknown_sync_committee(monkeypatch):
+    first, second = make_sync_committee(1), make_sync_committee(2)
+    monkeypatch.setattr(contract_middleware, 'store', None)
+    contract = make_store(8192, first, second, '0x1', '0x2')
+
+    target = FakeTarget(make_store(8192, first, CompactSyncCommittee.empty(), '0x1', None), onchain_store(contract))
+    # the next sync committee of the contract is not known locally: a new bootstrap is needed
+    assert not target.reconcile()
+    # the poseidon commitment stays consistent with the local sync committee
+    assert target.store.next_sync_committee.is_empty()
+    assert target.store.next_sync_committee_poseidon is None
+
+
+def test_reconcile_unreadable_store():
+    class UnreachableTarget(FakeTarget):
+        def read_light_client_store(self):
+            raise ConnectionError("unreachable")
+
+    assert not UnreachableTarget(make_store(0, make_sync_committee(1), CompactSyncCommittee.empty(), '0x1', None),
+                                 None).reconcile()
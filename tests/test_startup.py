@@ -0,0 +1,24 @@
+import sys
+
+from utils import startup
+
+
+def remove_import_timer():
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, startup._ImportTimer)]
+
+
+def test_import_timer_is_opt_in(monkeypatch):
+    remove_import_timer()
+    monkeypatch.delenv(startup.IMPORT_TIMER_ENV, raising=False)
+    startup.install_import_timer()
+    assert not startup.import_timer_installed()
+
+    monkeypatch.setenv(startup.IMPORT_TIMER_ENV, '1')
+    try:
+        startup.install_import_timer()
+        assert startup.import_timer_installed()
+        # installed once
+        startup.install_import_timer()
+        assert sum(isinstance(finder, startup._ImportTimer) for finder in sys.meta_path) == 1
+    finally:
+        remove_import_timer()
@@ -0,0 +1,85 @@
+import json
+
+from utils import circuit_middleware
+from utils.proof_cache import ProofCache
+from utils.specs import SyncAggregate, SyncCommittee, BLSPubkey, Bytes32, SYNC_COMMITTEE_SIZE
+from utils.sync_committee import CompactSyncCommittee, BLS_PUBKEY_LENGTH
+
+K = 7
+PROOF = ([1, 2], [[3, 4], [5, 6]], [7, 8])
+
+
+def make_next_sync_committee(seed) -> CompactSyncCommittee:
+    return CompactSyncCommittee.from_view(SyncCommittee(
+        pubkeys=[BLSPubkey(bytes([seed]) + i.to_bytes(2, 'big') + bytes(BLS_PUBKEY_LENGTH - 3)) for i in range(SYNC_COMMITTEE_SIZE)],
+        aggregate_pubkey=BLSPubkey(bytes([seed]) * BLS_PUBKEY_LENGTH),
+    ))
+
+
+def stub_inputs(directory):
+    """
+    Inputs as written by the step and rotate converters, with a signal the combined circuit does not take
+    """
+    limbs = [[str(j) for j in range(K)] for _ in range(SYNC_COMMITTEE_SIZE)]
+    step_input = {
+        'pubkeysBigIntX': limbs,
+        'pubkeysBigIntY': limbs,
+        'aggregationBits': ['1'] * SYNC_COMMITTEE_SIZE,
+        'signature': [[[str(j) for j in range(K)]] * 2] * 2,
+        'signingRoot': ['0'] * 32,
+        'participation': str(SYNC_COMMITTEE_SIZE),
+        'syncCommitteePoseidon': '42',
+        'unused': '0',
+    }
+    rotate_input = {
+        'pubkeysBytes': [['0'] * BLS_PUBKEY_LENGTH] * SYNC_COMMITTEE_SIZE,
+        'pubkeysBigIntX': limbs,
+        'pubkeysBigIntY': limbs,
+        'syncCommitteeSSZ': ['1'] * 32,
+    }
+    with open(directory / 'input_step.json', 'w') as file:
+        json.dump(step_input, file)
+    with open(directory / 'input_rotate.json', 'w') as file:
+        json.dump(rotate_input, file)
+
+
+def test_step_rotate_input_and_cache(tmp_path, monkeypatch):
+    (tmp_path / 'data').mkdir()
+    stub_inputs(tmp_path / 'data')
+    monkeypatch.chdir(tmp_path)
+    commands = []
+    monkeypatch.setattr(circuit_middleware.profiling, 'run', lambda args, **kwargs: commands.append(args[0]))
+    monkeypatch.setattr(circuit_middleware, 'step_data_to_JSON', lambda *args: '{}')
+    monkeypatch.setattr(circuit_middleware, 'convert_rotate_data_to_JSON', lambda *args: '{}')
+    monkeypatch.setattr(circuit_middleware, 'read_proof', lambda circuit: (PROOF, ['43'] + ['0'] * 65))
+    monkeypatch.setattr(circuit_middleware, 'signature_proof_cache', ProofCache(4))
+
+    sync_aggregate = SyncAggregate()
+    next_sync_committee = make_next_sync_committee(1)
+
+    def prove(next_sync_committee):
+        return circuit_middleware.step_rotate_proof(
+            None, sync_aggregate.sync_committee_bits, sync_aggregate.sync_committee_signature, Bytes32(), 0, '0x2a',
+            next_sync_committee)
+
+    assert prove(next_sync_committee) == (PROOF, '0x2b')
+    assert commands.count('./circuits/scripts/step_rotate.sh') == 1
+
+    with open(tmp_path / 'data' / 'input_step_rotate.json', 'r') as file:
+        step_rotate_input = json.load(file)
+    assert set(step_rotate_input) == set(circuit_middleware.STEP_ROTATE_STEP_INPUTS) | \
+        set(circuit_middleware.STEP_ROTATE_ROTATE_INPUTS) | {'nextPubkeysBytes', 'nextAggregatePubkeyBytes'}
+    for name in ['pubkeysX', 'pubkeysY', 'nextPubkeysBigIntX', 'nextPubkeysBigIntY']:
+        assert len(step_rotate_input[name]) == SYNC_COMMITTEE_SIZE
+        assert all(len(limbs) == K for limbs in step_rotate_input[name])
+    assert len(step_rotate_input['nextSyncCommitteeSSZ']) == 32
+    assert len(step_rotate_input['nextPubkeysBytes']) == SYNC_COMMITTEE_SIZE
+    assert step_rotate_input['nextPubkeysBytes'][0] == list(next_sync_committee.pubkey(0))
+    assert step_rotate_input['nextAggregatePubkeyBytes'] == [1] * BLS_PUBKEY_LENGTH
+
+    # the same signature and next sync committee are served from the cache
+    assert prove(next_sync_committee) == (PROOF, '0x2b')
+    assert commands.count('./circuits/scripts/step_rotate.sh') == 1
+    # another next sync committee is proven again
+    prove(make_next_sync_committee(2))
+    assert commands.count('./circuits/scripts/step_rotate.sh') == 2
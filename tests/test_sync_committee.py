@@ -0,0 +1,52 @@
+import gc
+import weakref
+
+from utils.specs import SyncCommittee, BLSPubkey, SYNC_COMMITTEE_SIZE
+from utils.ssz.ssz_impl import hash_tree_root
+from utils.sync_committee import CompactSyncCommittee, BLS_PUBKEY_LENGTH
+
+
+def make_sync_committee() -> SyncCommittee:
+    return SyncCommittee(
+        pubkeys=[BLSPubkey(i.to_bytes(2, 'big') * (BLS_PUBKEY_LENGTH // 2)) for i in range(SYNC_COMMITTEE_SIZE)],
+        aggregate_pubkey=BLSPubkey(b'\xaa' * BLS_PUBKEY_LENGTH),
+    )
+
+
+def test_empty():
+    empty = CompactSyncCommittee.empty()
+    assert empty.is_empty()
+    assert empty == SyncCommittee()
+    assert not CompactSyncCommittee.from_view(make_sync_committee()).is_empty()
+
+
+def test_from_view_roundtrip():
+    sync_committee = make_sync_committee()
+    compact = CompactSyncCommittee.from_view(sync_committee)
+    assert compact == sync_committee
+    assert compact.to_view() == sync_committee
+    assert bytes(compact.pubkey(3)) == bytes(sync_committee.pubkeys[3])
+    assert compact.hex_pubkeys()[3] == '0x' + bytes(sync_committee.pubkeys[3]).hex()
+    assert compact.hex_aggregate_pubkey() == '0x' + 'aa' * BLS_PUBKEY_LENGTH
+
+
+def test_hash_tree_root_does_not_keep_the_view(monkeypatch):
+    views = []
+    decode_bytes = SyncCommittee.decode_bytes
+
+    def tracked_decode_bytes(data):
+        view = decode_bytes(data)
+        views.append(weakref.ref(view))
+        return view
+
+    monkeypatch.setattr(SyncCommittee, 'decode_bytes', tracked_decode_bytes)
+    sync_committee = make_sync_committee()
+    compact = CompactSyncCommittee.from_view(sync_committee)
+    assert compact.hash_tree_root() == hash_tree_root(sync_committee)
+    gc.collect()
+    # a view was built for hashing, and nothing references it anymore
+    assert len(views) == 1
+    assert views[0]() is None
+    # the root is cached, no view is built again
+    assert compact.hash_tree_root() == hash_tree_root(sync_committee)
+    assert len(views) == 1
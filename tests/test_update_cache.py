@@ -0,0 +1,138 @@
+import gzip
+import re
+import threading
+
+import pytest
+
+from utils import beacon_middleware
+from utils.update_cache import UpdateCache
+
+SLOTS_PER_PERIOD = 8192
+
+
+def raw_update(period, tag='node'):
+    return {'data': {'attested_header': {'beacon': {'slot': str(period * SLOTS_PER_PERIOD + 10)}}, 'tag': tag}}
+
+
+def test_put_get(tmp_path):
+    cache = UpdateCache(str(tmp_path))
+    assert cache.get(3) is None
+    cache.put(3, raw_update(3))
+    assert cache.contains(3)
+    assert cache.get(3) == raw_update(3)
+    assert UpdateCache(str(tmp_path)).get(3) == raw_update(3)
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_damaged_entry(tmp_path):
+    cache = UpdateCache(str(tmp_path))
+    cache.put(3, raw_update(3))
+    with open(cache.path(3), 'rb') as file:
+        data = file.read()
+    with open(cache.path(3), 'wb') as file:
+        file.write(data[:len(data) // 2])
+    assert cache.get(3) is None
+    with gzip.open(cache.path(4), 'wt') as file:
+        file.write('{"truncated')
+    assert cache.get(4) is None
+
+
+def test_only_immutable_periods_are_cached(tmp_path, monkeypatch):
+    requests = []
+
+    def fake_stream(url):
+        start, count = map(int, re.search(r'start_period=(\d+)&count=(\d+)', url).groups())
+        requests.append((start, count))
+        return [raw_update(period) for period in range(start, start + count)]
+
+    cache = UpdateCache(str(tmp_path))
+    cache.put(2, raw_update(2, 'cache'))
+    # an entry of the live period, e.g. written by an older version, must not be served
+    cache.put(5, raw_update(5, 'cache'))
+    monkeypatch.setattr(beacon_middleware, 'update_cache', cache)
+    monkeypatch.setattr(beacon_middleware, 'stream_beacon_api', fake_stream)
+    monkeypatch.setattr(beacon_middleware, 'parse_light_client_update', lambda data: data)
+    # period 5 is live, period 4 ended long enough ago to be immutable
+    monkeypatch.setattr(beacon_middleware, 'get_current_slot', lambda: 5 * SLOTS_PER_PERIOD + 1000)
+
+    updates = list(beacon_middleware.iter_updates_for_period(1, 5))
+    assert [update['tag'] for update in updates] == ['node', 'cache', 'node', 'node', 'node']
+    assert requests == [(1, 1), (3, 3)]
+    # the immutable periods are now cached, the live one is not replaced
+    assert [cache.get(period)['data']['tag'] for period in range(1, 6)] == ['node', 'cache', 'node', 'node', 'cache']
+
+    requests.clear()
+    updates = list(beacon_middleware.iter_updates_for_period(1, 5))
+    assert [update['tag'] for update in updates] == ['node', 'cache', 'node', 'node', 'node']
+    assert requests == [(5, 1)]
+
+
+def test_period_becomes_immutable_after_finality(tmp_path, monkeypatch):
+    monkeypatch.setattr(beacon_middleware, 'update_cache', UpdateCache(str(tmp_path)))
+    monkeypatch.setattr(beacon_middleware, 'stream_beacon_api', lambda url: [raw_update(4)])
+    monkeypatch.setattr(beacon_middleware, 'parse_light_client_update', lambda data: data)
+
+    # the last slots of period 4 are not finalized yet
+    monkeypatch.setattr(beacon_middleware, 'get_current_slot', lambda: 5 * SLOTS_PER_PERIOD + 10)
+    list(beacon_middleware.iter_updates_for_period(4, 1))
+    assert not beacon_middleware.update_cache.contains(4)
+
+    monkeypatch.setattr(beacon_middleware, 'get_current_slot',
+                        lambda: 5 * SLOTS_PER_PERIOD + int(beacon_middleware.UPDATE_FINALITY_SLOTS))
+    list(beacon_middleware.iter_updates_for_period(4, 1))
+    assert beacon_middleware.update_cache.contains(4)
+
+
+def test_page_retries_are_per_page(tmp_path, monkeypatch):
+    failures = {1: 2, 2: 2, 3: 2}
+
+    def fake_stream(url):
+        start = int(re.search(r'start_period=(\d+)', url).group(1))
+        if failures.get(start, 0) > 0:
+            failures[start] -= 1
+            yield raw_update(start)
+            raise beacon_middleware.requests.exceptions.ChunkedEncodingError("interrupted")
+        yield raw_update(start)
+
+    monkeypatch.setattr(beacon_middleware, 'update_cache', UpdateCache(str(tmp_path)))
+    monkeypatch.setattr(beacon_middleware, 'UPDATE_FETCH_CHUNK', 1)
+    monkeypatch.setattr(beacon_middleware, 'UPDATE_STREAM_RETRIES', 2)
+    monkeypatch.setattr(beacon_middleware, 'stream_beacon_api', fake_stream)
+    monkeypatch.setattr(beacon_middleware, 'parse_light_client_update', lambda data: data)
+    monkeypatch.setattr(beacon_middleware, 'get_current_slot', lambda: 10 * SLOTS_PER_PERIOD)
+
+    # more interruptions than retries overall, but within the limit for each page; partial pages are not yielded
+    updates = list(beacon_middleware.iter_updates_for_period(1, 3))
+    assert [update['tag'] for update in updates] == ['node'] * 3
+
+    failures[5] = 3
+    with pytest.raises(beacon_middleware.requests.exceptions.ChunkedEncodingError):
+        list(beacon_middleware.iter_updates_for_period(5, 1))
+
+
+def test_pages_are_fetched_ahead(tmp_path, monkeypatch):
+    requested = []
+    all_requested = threading.Event()
+
+    def fake_stream(url):
+        start = int(re.search(r'start_period=(\d+)', url).group(1))
+        requested.append(start)
+        if len(requested) == 3:
+            all_requested.set()
+        return [raw_update(start)]
+
+    monkeypatch.setattr(beacon_middleware, 'update_cache', UpdateCache(str(tmp_path)))
+    monkeypatch.setattr(beacon_middleware, 'UPDATE_FETCH_CHUNK', 1)
+    monkeypatch.setattr(beacon_middleware, 'UPDATE_FETCH_WORKERS', 3)
+    monkeypatch.setattr(beacon_middleware, 'stream_beacon_api', fake_stream)
+    monkeypatch.setattr(beacon_middleware, 'parse_light_client_update', lambda data: data)
+    monkeypatch.setattr(beacon_middleware, 'get_current_slot', lambda: 10 * SLOTS_PER_PERIOD)
+
+    updates = beacon_middleware.iter_updates_for_period(1, 5)
+    first = next(updates)
+    assert first['attested_header']['beacon']['slot'] == str(SLOTS_PER_PERIOD + 10)
+    # while the first update is being processed, the next pages are already being fetched
+    assert all_requested.wait(timeout=5)
+    assert sorted(requested[:3]) == [1, 2, 3]
+    assert len(list(updates)) == 4
+    assert sorted(requested) == [1, 2, 3, 4, 5]
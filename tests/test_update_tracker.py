@@ -0,0 +1,217 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from utils import contract_middleware
+from utils.specs import (
+    LightClientUpdate, MyLightClientStore, Bytes32, BLSPubkey, SYNC_COMMITTEE_SIZE, NEXT_SYNC_COMMITTEE_INDEX,
+    FINALIZED_ROOT_INDEX, floorlog2, is_better_update
+)
+from utils.ssz.ssz_typing import uint64
+from utils.sync_committee import CompactSyncCommittee
+from utils.update_tracker import UpdateTracker
+
+
+def make_update(attested_slot, participants=SYNC_COMMITTEE_SIZE, sync_committee_update=True, finalized_slot=None,
+                signature_slot=None) -> LightClientUpdate:
+    update = LightClientUpdate()
+    update.attested_header.beacon.slot = attested_slot
+    update.signature_slot = attested_slot + 1 if signature_slot is None else signature_slot
+    if sync_committee_update:
+        update.next_sync_committee.aggregate_pubkey = BLSPubkey(b'\x01' * 48)
+        update.next_sync_committee_branch = [Bytes32(b'\x01' * 32)] * floorlog2(NEXT_SYNC_COMMITTEE_INDEX)
+    if finalized_slot is not None:
+        update.finalized_header.beacon.slot = finalized_slot
+        update.finality_branch = [Bytes32(b'\x01' * 32)] * floorlog2(FINALIZED_ROOT_INDEX)
+    update.sync_aggregate.sync_committee_bits = [i < participants for i in range(SYNC_COMMITTEE_SIZE)]
+    return update
+
+
+def make_store() -> MyLightClientStore:
+    return MyLightClientStore(
+        beacon_slot=uint64(0),
+        current_sync_committee=CompactSyncCommittee.empty(),
+        next_sync_committee=CompactSyncCommittee.empty(),
+        previous_max_active_participants=uint64(0),
+        current_max_active_participants=uint64(0),
+        current_sync_committee_poseidon='0x1',
+    )
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class DeferredExecutor:
+    """
+    Executor running the submitted calls only when asked to, as a submitter busy with another chain transaction
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((future, fn, args))
+        return future
+
+    def run(self):
+        for future, fn, args in self.calls:
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        self.calls = []
+
+
+class FakeTarget(contract_middleware.LightClientTarget):
+    """
+    Destination chain whose transactions get the given receipt statuses, in order
+    """
+
+    def __init__(self, name, statuses):
+        self.name = name
+        self.store = make_store()
+        self.executor = ImmediateExecutor()
+        self.statuses = list(statuses)
+
+    def process_light_client_update_call(self, *args, **kwargs):
+        return None
+
+    def transact(self, call):
+        return SimpleNamespace(status=self.statuses.pop(0), transactionHash=bytes(32))
+
+    def reconcile(self):
+        return True
+
+
+def test_is_better_update_ordering():
+    # from the best to the worst update of period 1 (slots 8192 to 16383)
+    ranked = [
+        # supermajority, relevant sync committee, finalized in the attested period, then most participants
+        make_update(8300, participants=500, finalized_slot=8200),
+        make_update(8300, participants=400, finalized_slot=8200),
+        # older attested header, then older signature slot
+        make_update(8400, participants=400, finalized_slot=8200),
+        make_update(8400, participants=400, finalized_slot=8200, signature_slot=8500),
+        # finalized header in the previous period
+        make_update(8300, participants=500, finalized_slot=8100),
+        # no finality
+        make_update(8300, participants=500),
+        # sync committee signed in the next period: not relevant
+        make_update(16380, participants=500, finalized_slot=16300, signature_slot=16390),
+        # no sync committee update, otherwise ranked as the updates without a relevant one
+        make_update(16381, participants=500, sync_committee_update=False, finalized_slot=16300, signature_slot=16391),
+        # no supermajority: most participants first, whatever the rest
+        make_update(8300, participants=300),
+        make_update(8300, participants=200, finalized_slot=8200),
+    ]
+    for i, better in enumerate(ranked):
+        for worse in ranked[i + 1:]:
+            assert is_better_update(better, worse)
+            assert not is_better_update(worse, better)
+        assert not is_better_update(better, better)
+
+
+def test_tracker_candidates():
+    tracker = UpdateTracker()
+    update = make_update(100, participants=400)
+    assert tracker.is_candidate(update)
+    tracker.mark_proven(update)
+    assert not tracker.is_candidate(update)
+    assert not tracker.is_candidate(make_update(101, participants=390))
+    assert tracker.is_candidate(make_update(101, participants=500))
+    # a worse update does not replace the best one
+    tracker.mark_proven(make_update(102, participants=350))
+    assert not tracker.is_candidate(make_update(101, participants=390))
+    assert tracker.stats()['skipped'] == 3
+
+
+def test_tracker_in_flight():
+    tracker = UpdateTracker()
+    update = make_update(100, participants=400)
+    tracker.mark_in_flight(update)
+    assert not tracker.is_candidate(update)
+    assert tracker.is_candidate(make_update(101, participants=500))
+    # a better update handed over in the meantime stays in flight
+    better = make_update(101, participants=500)
+    tracker.mark_in_flight(better)
+    tracker.clear_in_flight(update)
+    assert not tracker.is_candidate(make_update(101, participants=500))
+    tracker.clear_in_flight(better)
+    assert tracker.is_candidate(update)
+    assert tracker.stats()['in_flight'] == 0
+
+
+def setup_relayer(monkeypatch, target):
+    proven = []
+
+    def fake_preflight(store, update, current_slot, genesis_validators_root):
+        # as the contract does, a period whose next sync committee is known ignores the update
+        assert store.next_sync_committee.is_empty(), "Stale finalized header"
+
+    def fake_prove(store, update, current_slot, genesis_validators_root):
+        proven.append(update)
+        return contract_middleware.ProvenUpdate(
+            update=update, encoded_update=None, current_slot=current_slot, sync_committee=None,
+            sync_committee_poseidon='0x1', signature_proof=None, next_sync_committee_poseidon='0x2'
+        )
+
+    monkeypatch.setattr(contract_middleware, 'update_tracker', UpdateTracker())
+    monkeypatch.setattr(contract_middleware, 'targets', [target])
+    monkeypatch.setattr(contract_middleware, 'store', make_store())
+    monkeypatch.setattr(contract_middleware, 'resync_store', False)
+    monkeypatch.setattr(contract_middleware, 'preflight_light_client_update', fake_preflight)
+    monkeypatch.setattr(contract_middleware, 'prove_light_client_update', fake_prove)
+    return proven
+
+
+def test_failed_submission_is_retried(monkeypatch):
+    target = FakeTarget('chain', statuses=[0, 1])
+    proven = setup_relayer(monkeypatch, target)
+
+    update = make_update(100)
+    # the submission reverts: the update is not marked as proven and the local view is resynchronized
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 1
+    assert contract_middleware.resync_store
+    assert not contract_middleware.update_tracker.is_applied(update)
+    assert target.store.next_sync_committee.is_empty()
+
+    # the same update, fetched again, is proven and submitted again
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 2
+    assert contract_middleware.update_tracker.is_applied(update)
+    assert not target.store.next_sync_committee.is_empty()
+
+    # once applied, it is not proven a third time
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 2
+
+
+def test_update_in_flight_is_not_proven_again(monkeypatch):
+    target = FakeTarget('chain', statuses=[0, 1])
+    target.executor = DeferredExecutor()
+    proven = setup_relayer(monkeypatch, target)
+
+    update = make_update(100)
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 1
+    # fetched again while its submission is pending: the same update is not proven twice
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 1
+    assert contract_middleware.update_tracker.stats()['skipped'] == 1
+
+    # the submission reverts: no longer in flight, the update is proven again
+    target.executor.run()
+    assert not contract_middleware.update_tracker.in_flight
+    contract_middleware.process_light_client_update(update, 102, None)
+    assert len(proven) == 2
+    target.executor.run()
+    assert contract_middleware.update_tracker.is_applied(update)
+    assert not contract_middleware.update_tracker.in_flight
@@ -2,12 +2,33 @@
 Middleware for beacon chain data
 """
 import requests
-from utils.specs import Root, LightClientBootstrap, LightClientFinalityUpdate
-from utils.parsing import parse_header, parse_sync_committee, parse_sync_aggregate, parse_light_client_updates
+from utils.specs import Root, SLOTS_PER_EPOCH, compute_sync_committee_period_at_slot
+from utils.parsing import (
+    parse_light_client_bootstrap, parse_light_client_finality_update, parse_light_client_optimistic_update,
+    parse_light_client_update,
+    parse_light_client_updates, iter_json_array, TruncatedJSONError
+)
+from utils.update_cache import UpdateCache
+from utils.clock import get_current_slot
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 
 # Fixed beacon chain node endpoint
 ENDPOINT_NODE_URL = "https://lodestar-mainnet.chainsafe.io"
 
+# Updates of past sync committee periods are served from disk
+UPDATES_CACHE_DIR = './data/updates'
+# A period is considered immutable once it ended this many slots ago (i.e., its last slots are finalized)
+UPDATE_FINALITY_SLOTS = 3 * SLOTS_PER_EPOCH
+# Missing periods are fetched concurrently, in requests of at most this many updates
+UPDATE_FETCH_CHUNK = 16
+UPDATE_FETCH_WORKERS = 4
+# Streamed responses are read in chunks of this many bytes, a page interrupted midway is fetched again a few times
+UPDATE_STREAM_CHUNK_SIZE = 64 * 1024
+UPDATE_STREAM_RETRIES = 3
+
+update_cache = None
+
 
 def beacon_api(url):
     """
@@ -25,13 +46,75 @@ def get_genesis_validators_root():
     return Root(beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/genesis")['data']['genesis_validators_root'])
 
 
+def stream_beacon_api(url):
+    """
+    Retrieve a JSON array by means of the beacon chain node API, yielding its elements as they arrive.
+    A stream ending before the end of the array raises a ChunkedEncodingError, as an interrupted transfer does.
+    """
+    with requests.get(url, stream=True, timeout=60) as response:
+        assert response.ok
+        try:
+            yield from iter_json_array(response.iter_content(chunk_size=UPDATE_STREAM_CHUNK_SIZE))
+        except TruncatedJSONError as e:
+            raise requests.exceptions.ChunkedEncodingError(f"{e} from {url}") from e
+
+
+def get_update_cache() -> UpdateCache:
+    global update_cache
+    if update_cache is None:
+        update_cache = UpdateCache(UPDATES_CACHE_DIR)
+    return update_cache
+
+
+def fetch_updates(start_period, count):
+    """
+    Retrieve the raw sync committee updates of a period range from the beacon chain node
+    """
+    return beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/updates?start_period={start_period}&count={count}")
+
+
+def missing_ranges(periods, max_count):
+    """
+    Group sorted periods into (start period, count) ranges of consecutive periods, of at most max_count periods
+    """
+    ranges = []
+    for period in periods:
+        if ranges and ranges[-1][0] + ranges[-1][1] == period and ranges[-1][1] < max_count:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([period, 1])
+    return ranges
+
+
 def get_updates_for_period(sync_period, count):
     """
-    Retrieve the sync committee updates for a given sync period
+    Retrieve the sync committee updates for a given sync period range.
+    Updates of immutable periods are read from the local cache, missing ones are fetched concurrently
     """
-    sync_period = str(sync_period)
-    updates = beacon_api(f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/updates?start_period={sync_period}&count={count}")
-    return parse_light_client_updates(updates)
+    cache = get_update_cache()
+    last_immutable_period = compute_sync_committee_period_at_slot(
+        max(int(get_current_slot()) - int(UPDATE_FINALITY_SLOTS), 0)) - 1
+    periods = range(int(sync_period), int(sync_period) + int(count))
+
+    updates = {}
+    for period in periods:
+        if period <= last_immutable_period:
+            update = cache.get(period)
+            if update is not None:
+                updates[period] = update
+
+    ranges = missing_ranges([period for period in periods if period not in updates], UPDATE_FETCH_CHUNK)
+    with ThreadPoolExecutor(max_workers=UPDATE_FETCH_WORKERS) as executor:
+        fetched = executor.map(lambda r: fetch_updates(*r), ranges)
+        for (start_period, _), raw_updates in zip(ranges, fetched):
+            # the node may return fewer updates than requested, e.g. for periods it does not have
+            for update in raw_updates:
+                period = compute_sync_committee_period_at_slot(int(update['data']['attested_header']['beacon']['slot']))
+                updates[period] = update
+                if period <= last_immutable_period:
+                    cache.put(period, update)
+
+    return parse_light_client_updates([updates[period] for period in periods if period in updates])
 
 
 def get_trusted_block_root():
@@ -45,31 +128,86 @@ def get_light_client_bootstrap(trusted_block_root):
     """
     Retrieve and parse the light client bootstrap data from the beacon chain node
     """
-    response = beacon_api(
-        f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/bootstrap/{trusted_block_root}")['data']
-
-    return LightClientBootstrap(
-        header=parse_header(response['header']),
-        current_sync_committee=parse_sync_committee(
-            response['current_sync_committee']),
-        current_sync_committee_branch=response['current_sync_committee_branch']
-    )
+    return parse_light_client_bootstrap(beacon_api(
+        f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/bootstrap/{trusted_block_root}")['data'])
 
 
 def get_finality_update():
     """
     Retrieve and parse the latest finality update from the beacon chain node
     """
-    finality_update = beacon_api(
-        f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/finality_update")['data']
-
-    return LightClientFinalityUpdate(
-        attested_header=parse_header(
-            finality_update['attested_header']),
-        finalized_header=parse_header(
-            finality_update['finalized_header']),
-        finality_branch=finality_update['finality_branch'],
-        sync_aggregate=parse_sync_aggregate(
-            finality_update['sync_aggregate']),
-        signature_slot=int(finality_update['signature_slot'])
-    )
\ No newline at end of file
+    return parse_light_client_finality_update(beacon_api(
+        f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/finality_update")['data'])
+
+
+def get_optimistic_update():
+    """
+    Retrieve and parse the latest optimistic update from the beacon chain node
+    """
+    return parse_light_client_optimistic_update(beacon_api(
+        f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/optimistic_update")['data'])
+
+
+def fetch_update_page(start_period, count):
+    """
+    Retrieve the raw sync committee updates of a period range, reading the whole page before returning it so that
+    no connection stays open while the updates are processed. Interrupted transfers of the page are retried.
+    """
+    url = f"{ENDPOINT_NODE_URL}/eth/v1/beacon/light_client/updates?start_period={start_period}&count={count}"
+    for attempt in range(UPDATE_STREAM_RETRIES + 1):
+        try:
+            return list(stream_beacon_api(url))
+        except requests.RequestException as e:
+            if attempt == UPDATE_STREAM_RETRIES:
+                raise
+            print("Update page interrupted (%s), retrying periods %d to %d" % (e, start_period, start_period + count - 1))
+
+
+def iter_updates_for_period(sync_period, count):
+    """
+    Retrieve the sync committee updates for a given sync period range, yielding each one as soon as it is available.
+    Updates of immutable periods are read from the local cache. The missing ones are fetched concurrently, in pages of
+    UPDATE_FETCH_CHUNK periods read entirely into memory, at most UPDATE_FETCH_WORKERS pages ahead of the consumer.
+    """
+    cache = get_update_cache()
+    last_immutable_period = compute_sync_committee_period_at_slot(
+        max(int(get_current_slot()) - int(UPDATE_FINALITY_SLOTS), 0)) - 1
+    periods = range(int(sync_period), int(sync_period) + int(count))
+    ranges = missing_ranges(
+        [period for period in periods if not (period <= last_immutable_period and cache.contains(period))],
+        UPDATE_FETCH_CHUNK)
+
+    def parse_page(raw_updates):
+        for update in raw_updates:
+            update_period = compute_sync_committee_period_at_slot(int(update['data']['attested_header']['beacon']['slot']))
+            if update_period <= last_immutable_period:
+                cache.put(update_period, update)
+            yield parse_light_client_update(update['data'])
+
+    executor = ThreadPoolExecutor(max_workers=UPDATE_FETCH_WORKERS, thread_name_prefix='updates')
+    # (start period, count, future) of the pages being fetched, in period order
+    pending = deque()
+    next_range = 0
+    try:
+        period = periods.start
+        while period < periods.stop:
+            while next_range < len(ranges) and len(pending) < UPDATE_FETCH_WORKERS:
+                start_period, range_count = ranges[next_range]
+                pending.append((start_period, range_count, executor.submit(fetch_update_page, start_period, range_count)))
+                next_range += 1
+            if pending and pending[0][0] == period:
+                _, range_count, page = pending.popleft()
+                # the node may not have all the requested periods
+                yield from parse_page(page.result())
+                period += range_count
+                continue
+
+            update = cache.get(period)
+            if update is not None:
+                yield parse_light_client_update(update['data'])
+            else:
+                # damaged entry, fetch it again
+                yield from parse_page(fetch_update_page(period, 1))
+            period += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
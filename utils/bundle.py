@@ -0,0 +1,181 @@
+"""
+Binary proof bundles, which decouple proving from submission.
+A bundle file starts with a header (magic and version) followed by length-prefixed records:
+    bootstrap record: trusted block root, genesis validators root, sync committee poseidon, SSZ light client bootstrap
+    update record:    flags, current slot, sync committee poseidon, signature proof,
+                      [next sync committee poseidon, commitment mapping proof], [SSZ signing sync committee],
+                      SSZ light client update
+For combined proofs the signature proof field holds the combined proof, and no commitment mapping proof follows.
+Integers are big endian, poseidon commitments and proof coordinates are 32 bytes each.
+"""
+import struct
+
+from utils.specs import LightClientBootstrap, LightClientUpdate, Root, Slot, SYNC_COMMITTEE_SIZE
+from utils.sync_committee import CompactSyncCommittee, BLS_PUBKEY_LENGTH
+
+BUNDLE_MAGIC = b'BBPB'
+BUNDLE_VERSION = 1
+
+RECORD_BOOTSTRAP = 0
+RECORD_UPDATE = 1
+
+# update record flags
+FLAG_SYNC_COMMITTEE_UPDATE = 1
+FLAG_SIGNING_SYNC_COMMITTEE = 2
+FLAG_COMBINED_PROOF = 4
+
+FIELD_LENGTH = 32
+PROOF_LENGTH = 8 * FIELD_LENGTH
+SYNC_COMMITTEE_LENGTH = (SYNC_COMMITTEE_SIZE + 1) * BLS_PUBKEY_LENGTH
+
+
+def encode_field(value) -> bytes:
+    """
+    Encode a field element, given as int or hex string
+    """
+    if isinstance(value, str):
+        value = int(value, 16)
+    return int(value).to_bytes(FIELD_LENGTH, 'big')
+
+
+def decode_field(data) -> str:
+    return hex(int.from_bytes(data, 'big'))
+
+
+def encode_proof(proof) -> bytes:
+    """
+    Encode a Groth16 proof [[a0, a1], [[b00, b01], [b10, b11]], [c0, c1]] as 8 field elements
+    """
+    (a, b, c) = proof
+    return b''.join(encode_field(value) for value in [*a, *b[0], *b[1], *c])
+
+
+def decode_proof(data) -> list:
+    values = [int.from_bytes(data[i:i + FIELD_LENGTH], 'big') for i in range(0, PROOF_LENGTH, FIELD_LENGTH)]
+    return [values[0:2], [values[2:4], values[4:6]], values[6:8]]
+
+
+def encode_bootstrap_record(trusted_block_root: Root,
+                            genesis_validators_root: Root,
+                            sync_committee_poseidon,
+                            bootstrap: LightClientBootstrap) -> bytes:
+    return b''.join([
+        bytes([RECORD_BOOTSTRAP]),
+        bytes(trusted_block_root),
+        bytes(genesis_validators_root),
+        encode_field(sync_committee_poseidon),
+        bootstrap.encode_bytes(),
+    ])
+
+
+def decode_bootstrap_record(data: memoryview):
+    """
+    Return trusted block root, genesis validators root, sync committee poseidon and light client bootstrap
+    """
+    offset = 1
+    trusted_block_root = Root(bytes(data[offset:offset + 32]))
+    genesis_validators_root = Root(bytes(data[offset + 32:offset + 64]))
+    sync_committee_poseidon = decode_field(data[offset + 64:offset + 96])
+    bootstrap = LightClientBootstrap.decode_bytes(bytes(data[offset + 96:]))
+    return trusted_block_root, genesis_validators_root, sync_committee_poseidon, bootstrap
+
+
+def encode_update_record(proven_update, include_sync_committee=False) -> bytes:
+    """
+    Encode a ProvenUpdate. The signing sync committee is included only if requested,
+    since the contract needs it only when the committee commitment calldata mode is disabled.
+    """
+    flags = 0
+    parts = []
+    if proven_update.next_sync_committee_poseidon is not None:
+        flags |= FLAG_SYNC_COMMITTEE_UPDATE
+        parts.append(encode_field(proven_update.next_sync_committee_poseidon))
+        if proven_update.combined:
+            flags |= FLAG_COMBINED_PROOF
+        else:
+            parts.append(encode_proof(proven_update.commitment_mapping_proof))
+    if include_sync_committee:
+        flags |= FLAG_SIGNING_SYNC_COMMITTEE
+        parts.append(proven_update.sync_committee.pubkeys_buffer + proven_update.sync_committee.aggregate_pubkey)
+    return b''.join([
+        bytes([RECORD_UPDATE, flags]),
+        struct.pack('>Q', int(proven_update.current_slot)),
+        encode_field(proven_update.sync_committee_poseidon),
+        encode_proof(proven_update.signature_proof),
+        *parts,
+        proven_update.update.encode_bytes(),
+    ])
+
+
+def decode_update_record(data: memoryview) -> dict:
+    """
+    Return the fields of a ProvenUpdate, the encoded update argument is left to the caller
+    """
+    flags = data[1]
+    offset = 2
+    (current_slot,) = struct.unpack_from('>Q', data, offset)
+    offset += 8
+    fields = {
+        'current_slot': Slot(current_slot),
+        'sync_committee_poseidon': decode_field(data[offset:offset + FIELD_LENGTH]),
+        'signature_proof': decode_proof(data[offset + FIELD_LENGTH:offset + FIELD_LENGTH + PROOF_LENGTH]),
+        'sync_committee': None,
+        'next_sync_committee_poseidon': None,
+        'commitment_mapping_proof': None,
+        'combined': bool(flags & FLAG_COMBINED_PROOF),
+    }
+    offset += FIELD_LENGTH + PROOF_LENGTH
+    if flags & FLAG_SYNC_COMMITTEE_UPDATE:
+        fields['next_sync_committee_poseidon'] = decode_field(data[offset:offset + FIELD_LENGTH])
+        offset += FIELD_LENGTH
+        if not fields['combined']:
+            fields['commitment_mapping_proof'] = decode_proof(data[offset:offset + PROOF_LENGTH])
+            offset += PROOF_LENGTH
+    if flags & FLAG_SIGNING_SYNC_COMMITTEE:
+        split = offset + SYNC_COMMITTEE_SIZE * BLS_PUBKEY_LENGTH
+        fields['sync_committee'] = CompactSyncCommittee(data[offset:split], data[split:offset + SYNC_COMMITTEE_LENGTH])
+        offset += SYNC_COMMITTEE_LENGTH
+    fields['update'] = LightClientUpdate.decode_bytes(bytes(data[offset:]))
+    return fields
+
+
+class BundleWriter:
+    """
+    Write records to a new bundle file
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(BUNDLE_MAGIC + bytes([BUNDLE_VERSION]))
+
+    def write(self, record: bytes):
+        self.file.write(struct.pack('>I', len(record)) + record)
+        # flush every record, so that a submitter can follow the file while proving goes on
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_bundles(path):
+    """
+    Yield the (record type, record) pairs of a bundle file, one at a time
+    """
+    with open(path, 'rb') as file:
+        header = file.read(len(BUNDLE_MAGIC) + 1)
+        assert header[:len(BUNDLE_MAGIC)] == BUNDLE_MAGIC, "Not a proof bundle file"
+        assert header[len(BUNDLE_MAGIC)] == BUNDLE_VERSION, "Unsupported proof bundle version"
+        while True:
+            length = file.read(4)
+            if len(length) < 4:
+                return
+            (length,) = struct.unpack('>I', length)
+            record = file.read(length)
+            assert len(record) == length, "Truncated proof bundle"
+            yield record[0], memoryview(record)
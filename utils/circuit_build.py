@@ -0,0 +1,238 @@
+"""
+Build orchestrator of the zkSNARK circuits, used by the circuits/scripts/init_*.sh scripts.
+Every stage (r1cs, witness generator, zkey, vkey, verifier contract) is fingerprinted with its inputs: the circom
+sources included by the circuit, the ptau, the compiler flags and the build of the stage it depends on.
+Stages whose fingerprint and outputs did not change are reused, the others are run reporting time and peak memory.
+
+Usage (from the repository root):
+    python -m utils.circuit_build [--force STAGE] [CIRCUIT ...]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import time
+
+CIRCUITS = ['step', 'rotate', 'step_rotate']
+STAGES = ['r1cs', 'witness', 'zkey', 'vkey', 'verifier']
+
+CIRCUITS_DIR = './circuits/circuits'
+# Library paths given to circom, also used to resolve the includes when fingerprinting the sources
+INCLUDE_PATHS = ['./circuits/circuits/utils']
+BUILD_DIR = './build'
+PTAU_PATH = './resources/powersOfTau28_hez_final_27.ptau'
+SNARKJS = './node_modules/.bin/snarkjs'
+
+CIRCOM_FLAGS = ['--O1', '--r1cs', '--sym', '--c']
+# zkey generation for the step circuit needs around 200 GB of memory
+NODE_MAX_OLD_SPACE_SIZE = 2048000
+ZKEY_CONTRIBUTION_NAME = 'First phase2 contribution'
+ZKEY_CONTRIBUTION_ENTROPY = 'some random text for entropy'
+
+MANIFEST_FILE = 'build_manifest.json'
+
+INCLUDE_PATTERN = re.compile(r'^\s*include\s+"([^"]+)"\s*;', re.MULTILINE)
+
+
+def digest(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def file_digest(path, memo) -> str:
+    """
+    Digest of the content of a file. Large files (e.g., the ptau) are hashed again only if their size
+    or modification time changed since the digest was recorded in memo.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = memo.get(key)
+    if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(block)
+    memo[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+    return memo[key]['sha256']
+
+
+def resolve_include(include, directory):
+    for base in [directory, *INCLUDE_PATHS]:
+        path = os.path.normpath(os.path.join(base, include))
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def source_digests(main):
+    """
+    Return the digests of the circom files compiled with the given main file, following its includes
+    (circomlib included)
+    """
+    pending = [os.path.normpath(main)]
+    sources = {}
+    while pending:
+        path = pending.pop()
+        if path in sources:
+            continue
+        with open(path, 'rb') as file:
+            content = file.read()
+        sources[path] = hashlib.sha256(content).hexdigest()
+        for include in INCLUDE_PATTERN.findall(content.decode()):
+            resolved = resolve_include(include, os.path.dirname(path))
+            # an unresolved include makes circom fail, it is kept in the fingerprint by name
+            if resolved is None:
+                sources[f'unresolved:{include}'] = None
+            else:
+                pending.append(resolved)
+    return sources
+
+
+def circuit_sources(circuit):
+    return source_digests(os.path.join(CIRCUITS_DIR, f'{circuit}.circom'))
+
+
+def tool_version(command):
+    try:
+        return subprocess.run(command, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def snarkjs(*args, max_old_space_size=None):
+    command = ['node']
+    if max_old_space_size is not None:
+        command.append(f'--max-old-space-size={max_old_space_size}')
+    return command + [SNARKJS, *args]
+
+
+def build_stages(circuit, memo):
+    """
+    Return the build stages of a circuit as (name, dependency, inputs, outputs, commands).
+    Inputs are callables, evaluated only when the fingerprint of the stage is needed.
+    """
+    directory = os.path.join(BUILD_DIR, circuit)
+    r1cs = os.path.join(directory, f'{circuit}.r1cs')
+    cpp_dir = os.path.join(directory, f'{circuit}_cpp')
+    zkey_p1 = os.path.join(directory, f'{circuit}_p1.zkey')
+    zkey_p2 = os.path.join(directory, f'{circuit}_p2.zkey')
+    include_flags = [flag for path in INCLUDE_PATHS for flag in ['-l', path]]
+    return [
+        ('r1cs', None,
+         lambda: {'sources': circuit_sources(circuit), 'flags': CIRCOM_FLAGS + include_flags,
+                  'circom': tool_version(['circom', '--version'])},
+         [r1cs, os.path.join(directory, f'{circuit}.sym'), cpp_dir],
+         [['circom', os.path.join(CIRCUITS_DIR, f'{circuit}.circom'), *CIRCOM_FLAGS, *include_flags,
+           '--output', directory]]),
+        ('witness', 'r1cs',
+         lambda: {},
+         [os.path.join(cpp_dir, circuit)],
+         [['make', '-C', cpp_dir]]),
+        ('zkey', 'r1cs',
+         lambda: {'ptau': file_digest(PTAU_PATH, memo), 'contribution': ZKEY_CONTRIBUTION_NAME},
+         [zkey_p2],
+         [snarkjs('zkey', 'new', r1cs, PTAU_PATH, zkey_p1, max_old_space_size=NODE_MAX_OLD_SPACE_SIZE),
+          snarkjs('zkey', 'contribute', zkey_p1, zkey_p2, f'-n={ZKEY_CONTRIBUTION_NAME}',
+                  f'-e={ZKEY_CONTRIBUTION_ENTROPY}', max_old_space_size=NODE_MAX_OLD_SPACE_SIZE)]),
+        ('vkey', 'zkey',
+         lambda: {},
+         [os.path.join(directory, f'{circuit}_vkey.json')],
+         [snarkjs('zkey', 'export', 'verificationkey', zkey_p2, os.path.join(directory, f'{circuit}_vkey.json'))]),
+        ('verifier', 'zkey',
+         lambda: {},
+         [os.path.join(directory, f'{circuit}_verifier.sol')],
+         [snarkjs('zkey', 'export', 'solidityverifier', zkey_p2, os.path.join(directory, f'{circuit}_verifier.sol'))]),
+    ]
+
+
+def run_command(command):
+    """
+    Run a command, returning its peak resident memory in bytes (including the processes it waited for)
+    """
+    print("$", " ".join(command))
+    process = subprocess.Popen(command)
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    assert process.returncode == 0, f"{command[0]} failed with exit code {process.returncode}"
+    # ru_maxrss is in KiB on Linux
+    return rusage.ru_maxrss * 1024
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {'stages': {}, 'files': {}}
+
+
+def write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def build(circuit, force=None):
+    """
+    Build the artifacts of a circuit, reusing the stages whose inputs did not change.
+    Stages from force onwards are run regardless. Return the report of every stage.
+    """
+    directory = os.path.join(BUILD_DIR, circuit)
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    forced = set(STAGES[STAGES.index(force):]) if force is not None else set()
+
+    report = []
+    for name, dependency, inputs, outputs, commands in build_stages(circuit, manifest['files']):
+        # a stage depends on the build of its dependency, not only on its inputs: rebuilding it invalidates the stage
+        upstream = manifest['stages'].get(dependency) if dependency is not None else None
+        fingerprint = digest({
+            'stage': name,
+            'inputs': inputs(),
+            'commands': commands,
+            'upstream': [upstream['fingerprint'], upstream['built_at']] if upstream is not None else None,
+        })
+        previous = manifest['stages'].get(name)
+        if (name not in forced and previous is not None and previous['fingerprint'] == fingerprint
+                and all(os.path.exists(output) for output in outputs)):
+            report.append({'stage': name, 'reused': True})
+            print(f"[{circuit}] {name}: unchanged, reused")
+            continue
+
+        print(f"[{circuit}] {name}: building")
+        start_time = time.time()
+        peak_rss = max(run_command(command) for command in commands)
+        seconds = time.time() - start_time
+        manifest['stages'][name] = {
+            'fingerprint': fingerprint, 'built_at': time.time(), 'seconds': round(seconds, 1), 'peak_rss': peak_rss
+        }
+        write_manifest(directory, manifest)
+        report.append({'stage': name, 'reused': False, 'seconds': seconds, 'peak_rss': peak_rss})
+        print(f"[{circuit}] {name}: built in {seconds:.1f}s, peak memory {peak_rss / 2 ** 30:.1f} GiB")
+    return report
+
+
+def print_report(circuit, report):
+    print(f"Build report: {circuit}")
+    for stage in report:
+        if stage['reused']:
+            print(f"    {stage['stage']:<10} reused")
+        else:
+            print(f"    {stage['stage']:<10} {stage['seconds']:>10.1f}s {stage['peak_rss'] / 2 ** 30:>8.1f} GiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the zkSNARK circuits, skipping the unchanged stages")
+    parser.add_argument('circuits', nargs='*', help=f"circuits to build, among {', '.join(CIRCUITS)} (all if omitted)")
+    parser.add_argument('--force', choices=STAGES, default=None, help="rebuild from this stage onwards")
+    args = parser.parse_args()
+    for circuit in args.circuits:
+        if circuit not in CIRCUITS:
+            parser.error(f"unknown circuit {circuit}")
+
+    reports = [(circuit, build(circuit, args.force)) for circuit in args.circuits or CIRCUITS]
+    for circuit, report in reports:
+        print_report(circuit, report)
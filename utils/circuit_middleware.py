@@ -4,9 +4,193 @@ Middleware for zk circuits
 
 import subprocess
 import json
+import random
+import time
 
 from utils.serialize import convert_rotate_data_to_JSON, step_data_to_JSON
 from utils.specs import SyncCommittee
+from utils.proof_cache import ProofCache, signature_proof_key, step_rotate_proof_key
+from utils.sync_committee import CompactSyncCommittee
+from utils import poseidon, profiling
+
+# Proofs already generated for a signing committee, signing root and participation (and next sync committee for the
+# combined circuit). Repeated attested headers (e.g., after a restart) are served from here instead of being proven again.
+SIGNATURE_PROOF_CACHE_DIR = './data/proof_cache'
+SIGNATURE_PROOF_CACHE_SIZE = 256
+
+# Fraction of the generated proofs verified locally before being used, 0 disables the check.
+# A proof not matching the verification key (e.g., corrupted or mismatched zkey) would only show up as a reverted transaction.
+PROOF_VERIFICATION_RATE = 1.0
+VERIFICATION_KEYS = {
+    'step': './build/step/step_vkey.json',
+    'rotate': './build/rotate/rotate_vkey.json',
+    'step_rotate': './build/step_rotate/step_rotate_vkey.json',
+}
+
+# Inputs of the combined circuit taken from the converted step and rotate data, by circuit signal name
+STEP_ROTATE_STEP_INPUTS = {
+    'pubkeysX': 'pubkeysBigIntX',
+    'pubkeysY': 'pubkeysBigIntY',
+    'aggregationBits': 'aggregationBits',
+    'signature': 'signature',
+    'signingRoot': 'signingRoot',
+    'participation': 'participation',
+    'syncCommitteePoseidon': 'syncCommitteePoseidon',
+}
+STEP_ROTATE_ROTATE_INPUTS = {
+    'nextPubkeysBigIntX': 'pubkeysBigIntX',
+    'nextPubkeysBigIntY': 'pubkeysBigIntY',
+    'nextSyncCommitteeSSZ': 'syncCommitteeSSZ',
+}
+
+# When enabled, poseidon commitments needed without a proof (e.g., at bootstrap) are computed natively instead of
+# running the rotate circuit, once a run of the rotate circuit has matched the native computation. Every run of the
+# rotate circuit is checked against the native computation, which is disabled on mismatch.
+NATIVE_POSEIDON = False
+
+signature_proof_cache = None
+native_poseidon_mismatch = False
+native_poseidon_verified = False
+proof_verification_stats = {'verified': 0, 'skipped': 0, 'failed': 0, 'total_time': 0.0}
+
+
+def get_signature_proof_cache() -> ProofCache:
+    """
+    Return the signature proof cache, loading its index from disk on first use
+    """
+    global signature_proof_cache
+    if signature_proof_cache is None:
+        signature_proof_cache = ProofCache(SIGNATURE_PROOF_CACHE_SIZE, SIGNATURE_PROOF_CACHE_DIR)
+    return signature_proof_cache
+
+
+def verify_proof(circuit, proof, public_signals, always=False):
+    """
+    Verify a proof generated for the given circuit, according to PROOF_VERIFICATION_RATE unless always is set.
+    Raises an AssertionError if the proof is invalid.
+    """
+    if not always and random.random() >= PROOF_VERIFICATION_RATE:
+        proof_verification_stats['skipped'] += 1
+        return
+    # imported on first use, py_ecc is only needed when proofs are generated
+    from utils.groth16 import load_verification_key, verify
+
+    start_time = time.time()
+    valid = verify(load_verification_key(VERIFICATION_KEYS[circuit]), proof, public_signals)
+    verification_time = time.time() - start_time
+    proof_verification_stats['total_time'] += verification_time
+    if not valid:
+        proof_verification_stats['failed'] += 1
+        raise AssertionError(f"Invalid {circuit} proof")
+    proof_verification_stats['verified'] += 1
+    print("Verified %s proof in %.2fs" % (circuit, verification_time))
+
+
+def read_proof(circuit):
+    """
+    Read and verify the proof generated for the given circuit, returning it in the format of the contract
+    and the public signals
+    """
+    with open(f'./build/{circuit}/{circuit}_proof.json', 'r') as file:
+        proof = json.load(file)
+    with open(f'./build/{circuit}/{circuit}_public.json', 'r') as file:
+        public_signals = json.load(file)
+
+    with profiling.stage(f'verify {circuit} proof'):
+        verify_proof(circuit, proof, public_signals)
+
+    return [
+        [int(proof['pi_a'][0]), int(proof['pi_a'][1])],
+        [
+            [int(proof['pi_b'][0][1]), int(proof['pi_b'][0][0])],
+            [int(proof['pi_b'][1][1]), int(proof['pi_b'][1][0])]
+        ],
+        [int(proof['pi_c'][0]), int(proof['pi_c'][1])]
+    ], public_signals
+
+
+def snarkjs_proof(proof):
+    """
+    Convert a proof from the format of the contract back to the snarkjs one
+    """
+    (a, b, c) = proof
+    return {
+        'pi_a': [str(a[0]), str(a[1]), '1'],
+        'pi_b': [[str(b[0][1]), str(b[0][0])], [str(b[1][1]), str(b[1][0])], ['1', '0']],
+        'pi_c': [str(c[0]), str(c[1]), '1'],
+    }
+
+
+def step_public_signals(sync_committee_poseidon, signing_root):
+    """
+    Public signals of the step circuit: the poseidon commitment followed by the bytes of the signing root
+    """
+    return [str(int(sync_committee_poseidon, 16))] + [str(byte) for byte in bytes(signing_root)]
+
+
+def step_rotate_public_signals(next_sync_committee_poseidon, sync_committee_poseidon, signing_root,
+                               next_sync_committee_root):
+    """
+    Public signals of the step_rotate circuit: the next poseidon commitment (output), the step public signals and the
+    bytes of the SSZ root of the next sync committee
+    """
+    return [str(int(next_sync_committee_poseidon, 16))] + step_public_signals(sync_committee_poseidon, signing_root) + \
+        [str(byte) for byte in bytes(next_sync_committee_root)]
+
+
+def is_valid_cached_proof(circuit, proof, public_signals) -> bool:
+    """
+    Verify a proof read from the proof cache, which may be corrupted or come from a previous build of the circuit
+    """
+    try:
+        verify_proof(circuit, snarkjs_proof(proof), public_signals, always=True)
+    except (AssertionError, OSError, TypeError, ValueError) as e:
+        print("Dropping cached %s proof: %s" % (circuit, e))
+        return False
+    return True
+
+
+def native_sync_committee_poseidon(sync_committee) -> str:
+    if not isinstance(sync_committee, CompactSyncCommittee):
+        sync_committee = CompactSyncCommittee.from_view(sync_committee)
+    return poseidon.sync_committee_poseidon(sync_committee.iter_pubkeys())
+
+
+def compute_sync_committee_poseidon(sync_committee) -> str:
+    """
+    Poseidon commitment of a sync committee, natively if possible, otherwise through the rotate circuit.
+    The native computation is only trusted after it matched the rotate circuit once.
+    """
+    if NATIVE_POSEIDON and native_poseidon_verified and not native_poseidon_mismatch:
+        try:
+            return native_sync_committee_poseidon(sync_committee)
+        except (OSError, ValueError, KeyError) as e:
+            # the circomlib constants are missing or unreadable
+            print("Native poseidon unavailable:", e)
+    _, sync_committee_poseidon = poseidon_committment(sync_committee)
+    return sync_committee_poseidon
+
+
+def check_native_poseidon(sync_committee, sync_committee_poseidon):
+    """
+    Differential check of the native poseidon commitment against the output of the rotate circuit
+    """
+    global native_poseidon_mismatch, native_poseidon_verified
+    if not NATIVE_POSEIDON or native_poseidon_mismatch:
+        return
+    try:
+        native = native_sync_committee_poseidon(sync_committee)
+    except (OSError, ValueError, KeyError) as e:
+        # the circomlib constants are missing or unreadable, the circuit stays the only source
+        print("Native poseidon unavailable:", e)
+        return
+    if int(native, 16) != int(sync_committee_poseidon, 16):
+        native_poseidon_mismatch = True
+        print("Native poseidon mismatch (%s instead of %s), using the rotate circuit from now on" % (
+            native, sync_committee_poseidon))
+    else:
+        native_poseidon_verified = True
+
 
 def poseidon_committment(
         sync_committee: SyncCommittee
@@ -16,24 +200,15 @@ def poseidon_committment(
     """
     
     # convert sync committee to a format suitable for zk circuis
-    with open('./data/sync_committee_poseidon_data.json', 'w') as file:
+    with profiling.stage('serialize rotate data'), open('./data/sync_committee_poseidon_data.json', 'w') as file:
         file.write(convert_rotate_data_to_JSON(sync_committee))
-    subprocess.run(["ts-node", "./ts/convert_rotate_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    subprocess.run(["./circuits/scripts/rotate.sh"], shell=True)
-    with open('./build/rotate/rotate_public.json', 'r') as file:
-        sync_committee_poseidon = hex(int(json.load(file)[1]))
+    profiling.run(["ts-node", "./ts/convert_rotate_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    profiling.run(["./circuits/scripts/rotate.sh"], shell=True)
 
     # retrieve sync committee poseidon proof
-    with open('./build/rotate/rotate_proof.json', 'r') as file:
-        proof = json.load(file)
-        proof = [
-            [int(proof['pi_a'][0]), int(proof['pi_a'][1])], 
-            [
-                [int(proof['pi_b'][0][1]), int(proof['pi_b'][0][0])], 
-                [int(proof['pi_b'][1][1]), int(proof['pi_b'][1][0])]
-            ], 
-            [int(proof['pi_c'][0]), int(proof['pi_c'][1])]
-        ]
+    proof, public_signals = read_proof('rotate')
+    sync_committee_poseidon = hex(int(public_signals[1]))
+    check_native_poseidon(sync_committee, sync_committee_poseidon)
 
     return proof, sync_committee_poseidon
 
@@ -50,7 +225,20 @@ def validate_light_client_update(
     """
     Generate signature proof for a signed header
     """
-    with open('./data/my_step_data.json', 'w') as file:
+    cache_key = signature_proof_key(
+        sync_committee_poseidon,
+        signing_root,
+        sync_committee_bits,
+        sync_committee_signature
+    )
+    public_signals = step_public_signals(sync_committee_poseidon, signing_root)
+    signature_proof = get_signature_proof_cache().get(
+        cache_key, validate=lambda proof: is_valid_cached_proof('step', proof, public_signals)
+    )
+    if signature_proof is not None:
+        return signature_proof
+
+    with profiling.stage('serialize step data'), open('./data/my_step_data.json', 'w') as file:
         file.write(step_data_to_JSON(
             sync_committee,
             sync_committee_bits,
@@ -59,20 +247,82 @@ def validate_light_client_update(
             participation,
             sync_committee_poseidon
             ))
-    subprocess.run(["ts-node", "./ts/convert_step_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    profiling.run(["ts-node", "./ts/convert_step_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     # generate signature proof
-    subprocess.run(["./circuits/scripts/step.sh"], shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    profiling.run(["./circuits/scripts/step.sh"], shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     
-    # retrieve bls verify proof
-    with open('./build/step/step_proof.json', 'r') as file:
-        signature_proof = json.load(file)
-        signature_proof = [
-            [int(signature_proof['pi_a'][0]), int(signature_proof['pi_a'][1])], 
-            [
-                [int(signature_proof['pi_b'][0][1]), int(signature_proof['pi_b'][0][0])], 
-                [int(signature_proof['pi_b'][1][1]), int(signature_proof['pi_b'][1][0])]
-            ], 
-            [int(signature_proof['pi_c'][0]), int(signature_proof['pi_c'][1])]
-        ]
-    return signature_proof
\ No newline at end of file
+    # retrieve bls verify proof, invalid proofs are not cached
+    signature_proof, _ = read_proof('step')
+
+    get_signature_proof_cache().put(cache_key, signature_proof)
+    return signature_proof
+
+
+def step_rotate_proof(
+        sync_committee,
+        sync_committee_bits,
+        sync_committee_signature,
+        signing_root,
+        participation,
+        sync_committee_poseidon,
+        next_sync_committee
+    ):
+    """
+    Generate a single proof of the signature of a header and of the poseidon commitment of the next sync committee,
+    returning the proof and the poseidon commitment
+    """
+    if not isinstance(next_sync_committee, CompactSyncCommittee):
+        next_sync_committee = CompactSyncCommittee.from_view(next_sync_committee)
+
+    next_sync_committee_root = next_sync_committee.hash_tree_root()
+    cache_key = step_rotate_proof_key(
+        signature_proof_key(sync_committee_poseidon, signing_root, sync_committee_bits, sync_committee_signature),
+        next_sync_committee_root
+    )
+    cached = get_signature_proof_cache().get(
+        cache_key, validate=lambda entry: is_valid_cached_proof('step_rotate', entry['proof'], step_rotate_public_signals(
+            entry['next_sync_committee_poseidon'], sync_committee_poseidon, signing_root, next_sync_committee_root))
+    )
+    if cached is not None:
+        return cached['proof'], cached['next_sync_committee_poseidon']
+
+    # the inputs are converted as for the step and rotate circuits, then merged
+    with profiling.stage('serialize step_rotate data'), open('./data/my_step_data.json', 'w') as file:
+        file.write(step_data_to_JSON(
+            sync_committee,
+            sync_committee_bits,
+            sync_committee_signature,
+            signing_root,
+            participation,
+            sync_committee_poseidon
+            ))
+    profiling.run(["ts-node", "./ts/convert_step_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with profiling.stage('serialize step_rotate data'), open('./data/rotate_data.json', 'w') as file:
+        file.write(convert_rotate_data_to_JSON(next_sync_committee))
+    profiling.run(["ts-node", "./ts/convert_rotate_data.ts"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    with profiling.stage('serialize step_rotate data'):
+        with open('./data/input_step.json', 'r') as file:
+            step_input = json.load(file)
+        with open('./data/input_rotate.json', 'r') as file:
+            rotate_input = json.load(file)
+        step_rotate_input = {name: step_input[key] for name, key in STEP_ROTATE_STEP_INPUTS.items()}
+        step_rotate_input.update({name: rotate_input[key] for name, key in STEP_ROTATE_ROTATE_INPUTS.items()})
+        # the SSZ root is computed in the circuit from the compressed pubkeys
+        step_rotate_input['nextPubkeysBytes'] = [list(pubkey) for pubkey in next_sync_committee.iter_pubkeys()]
+        step_rotate_input['nextAggregatePubkeyBytes'] = list(next_sync_committee.aggregate_pubkey)
+        with open('./data/input_step_rotate.json', 'w') as file:
+            json.dump(step_rotate_input, file)
+
+    # a single witness generation and proof for both statements
+    profiling.run(["./circuits/scripts/step_rotate.sh"], shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # the output (next sync committee poseidon) is the first public signal, invalid proofs are not cached
+    proof, public_signals = read_proof('step_rotate')
+    next_sync_committee_poseidon = hex(int(public_signals[0]))
+    check_native_poseidon(next_sync_committee, next_sync_committee_poseidon)
+
+    get_signature_proof_cache().put(
+        cache_key, {'proof': proof, 'next_sync_committee_poseidon': next_sync_committee_poseidon})
+    return proof, next_sync_committee_poseidon
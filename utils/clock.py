@@ -1,7 +1,49 @@
 from utils.specs import (
     Slot, SLOTS_PER_EPOCH, config
 )
-import time, math
+import asyncio, time, math
+
+# Source of the current time (seconds since the epoch) and its speed with respect to real time.
+# Replaced by the replay harness (see benchmarks/replay.py) to run the relayer faster than real time.
+time_source = time.time
+time_speed = 1
+
+
+class AcceleratedClock:
+    """
+    Clock starting at the given time and running speed times faster than real time
+    """
+
+    def __init__(self, start_time, speed=1):
+        self.start_time = start_time
+        self.speed = speed
+        self.real_start_time = time.monotonic()
+
+    def time(self):
+        return self.start_time + (time.monotonic() - self.real_start_time) * self.speed
+
+
+def set_clock(source=time.time, speed=1):
+    """
+    Set the source of the current time, the default restores the wall clock
+    """
+    global time_source, time_speed
+    time_source = source
+    time_speed = speed
+
+
+def now():
+    """
+    Return the current time, in seconds since the epoch
+    """
+    return time_source()
+
+
+async def sleep(seconds):
+    """
+    Sleep for the given number of seconds of the clock
+    """
+    await asyncio.sleep(max(seconds, 0) / time_speed)
 
 
 def get_current_slot(tolerance=0):
@@ -9,18 +51,32 @@ def get_current_slot(tolerance=0):
     Return the current slot
     Tolerance is used to account for clock drift
     """
-    diff_in_seconds = time.time() - config.MIN_GENESIS_TIME + tolerance
+    diff_in_seconds = now() - config.MIN_GENESIS_TIME + tolerance
     return Slot(math.floor(diff_in_seconds / config.SECONDS_PER_SLOT))
 
 
+def compute_time_at_slot(slot):
+    """
+    Return the time at which the given slot starts
+    """
+    return int(config.MIN_GENESIS_TIME) + int(slot) * int(config.SECONDS_PER_SLOT)
+
+
+def time_until_next_slot():
+    """
+    Return the number of seconds until the next slot starts
+    """
+    return compute_time_at_slot(get_current_slot() + 1) - now()
+
+
 def time_until_next_epoch():
     """
     Return the number of seconds until the next epoch starts
     """
     millis_per_epoch = int(SLOTS_PER_EPOCH) * int(config.SECONDS_PER_SLOT) * 1000
-    millis_from_genesis = round(time.time_ns() // 1_000_000) - int(config.MIN_GENESIS_TIME) * 1000
+    millis_from_genesis = round(now() * 1000) - int(config.MIN_GENESIS_TIME) * 1000
 
     if millis_from_genesis >= 0:
         return (millis_per_epoch - (millis_from_genesis % millis_per_epoch)) / 1000
     else:
-        return abs((millis_from_genesis % millis_per_epoch)) / 1000
\ No newline at end of file
+        return abs((millis_from_genesis % millis_per_epoch)) / 1000
@@ -1,176 +1,842 @@
 """
-Miidleware for interacting with the light client contract
+Miidleware for interacting with the light client contract.
+Each update is proven once and then submitted to the light client contract of every destination chain.
+web3 and solcx are imported when first needed, so that importing this module stays cheap.
 """
-from web3 import Web3, HTTPProvider
-from solcx import install_solc, compile_source
-
 from utils.specs import (
-    Root, LightClientBootstrap, LightClientStore, MyLightClientStore, SyncCommittee, LightClientUpdate, Slot,
+    Root, LightClientBootstrap, MyLightClientStore, SyncCommittee, LightClientUpdate, Slot,
     compute_sync_committee_period_at_slot, compute_fork_version, compute_epoch_at_slot,
-    compute_domain, DOMAIN_SYNC_COMMITTEE, compute_signing_root
+    compute_domain, DOMAIN_SYNC_COMMITTEE, compute_signing_root, is_sync_committee_update
 )
 
 from utils.serialize import light_client_bootstrap_to_string, light_client_update_to_string, sync_committee_to_string
 
-from utils.circuit_middleware import poseidon_committment, validate_light_client_update
+from utils.circuit_middleware import (
+    poseidon_committment, validate_light_client_update, compute_sync_committee_poseidon, step_rotate_proof
+)
+
+from utils.preflight import preflight_light_client_update
+
+from utils.sync_committee import CompactSyncCommittee
+
+from utils.header_db import HeaderDatabase
+
+from utils.update_tracker import UpdateTracker
 
 from utils.ssz.ssz_typing import uint64
 
-import asyncio, ast
+from utils.clock import compute_time_at_slot, now
+
+from utils import startup, profiling
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import ast, copy, hashlib, json, os, threading, time
+
+# When enabled, updates are submitted without the signing sync committee (512 pubkeys and the aggregate pubkey):
+# the contract takes its poseidon commitment from the sync committees it stores, instead of hashing the calldata.
+COMMITTEE_COMMITMENT_CALLDATA = True
+
+# When enabled, updates with a sync committee update are proven by a single proof of the combined step_rotate circuit
+# (signature and commitment mapping of the next sync committee), whose verifier is deployed with the light client.
+# Requires the committee commitment calldata mode and the build of the step_rotate circuit.
+COMBINED_ROTATION_PROOFS = False
+STEP_ROTATE_VERIFIER_PATH = './build/step_rotate/step_rotate_verifier.sol'
+
+# Destination chain used when none is configured
+DEFAULT_DESTINATION_CHAIN = 'http://localhost:8545'
+TRANSACTION_GAS = 30_000_000
 
+SOLC_VERSION = '0.8.17'
+SOLC_OPTIMIZE_RUNS = 200
+# Compiled contracts, keyed by a digest of the sources and of the compiler settings
+COMPILE_CACHE_DIR = './data/contracts'
 
-def init_web3():
+# Finalized headers submitted to the destination chains, for downstream lookups
+HEADER_DB_PATH = './data/headers.sqlite'
+
+# Head-to-chain latency of the optimistic headers: from the start of their slot to the receipt of the transaction
+optimistic_stats = {'submitted': 0, 'superseded': 0, 'last_latency': None, 'max_latency': None}
+
+# Light client contracts the updates are submitted to
+targets = []
+# Local view of the light client store used for proving, shared by all the destination chains
+store = None
+# Set when no destination chain applied a sync committee update: the local view is then ahead of all of them
+resync_store = False
+# Finalized headers database, opened by the first submitter thread that needs it
+header_db = None
+header_db_lock = threading.Lock()
+# Sync committee updates proven and applied for each period
+update_tracker = UpdateTracker()
+
+
+@dataclass
+class ProvenUpdate(object):
     """
-    Initialize web3 instance
+    Light client update together with its proofs, ready to be submitted to any destination chain
     """
-    global web3
-    web3 = Web3(HTTPProvider('http://localhost:8545', request_kwargs={'timeout': 300}))
-    web3.eth.default_account = web3.eth.accounts[0]
+    update: LightClientUpdate
+    # update encoded as contract call argument
+    encoded_update: tuple
+    current_slot: Slot
+    # sync committee which signed the update and its poseidon commitment
+    sync_committee: CompactSyncCommittee
+    sync_committee_poseidon: str
+    signature_proof: list
+    # poseidon commitment of the next sync committee and its proof, for updates carrying a sync committee update
+    next_sync_committee_poseidon: Optional[str] = None
+    commitment_mapping_proof: Optional[list] = None
+    # optimistic updates only advance the optimistic header of the contract
+    optimistic: bool = False
+    # the signature proof is a combined proof, which also proves the poseidon commitment of the next sync committee
+    combined: bool = False
 
 
-def compile_contract():
+def contracts_digest(contracts_dir='./contracts'):
     """
-    Compile the light client contract
+    Digest of the contract sources and of the compiler settings
     """
-    install_solc('0.8.17')
-    with open ('./contracts/LightClient.sol', 'r') as file:
-        source = file.read()
-    compiled_solc = compile_source(source, 
-        output_values=['abi', 'bin'], 
-        base_path='./contracts',
-        optimize=True, 
-        optimize_runs=200,
-        solc_version='0.8.17')
+    digest = hashlib.sha256(f'{SOLC_VERSION}:{SOLC_OPTIMIZE_RUNS}'.encode())
+    for name in sorted(os.listdir(contracts_dir)):
+        if name.endswith('.sol'):
+            digest.update(name.encode())
+            with open(os.path.join(contracts_dir, name), 'rb') as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def install_solc_if_missing():
+    """
+    Install the solc compiler, unless it is already installed
+    """
+    from solcx import install_solc, get_installed_solc_versions
+    if SOLC_VERSION not in [str(version) for version in get_installed_solc_versions()]:
+        install_solc(SOLC_VERSION)
+
+
+def compile_contract(contracts_dir='./contracts'):
+    """
+    Compile the light client contract, returning its abi and bytecode.
+    Compilation is skipped when the sources did not change since the last run.
+    """
+    cache_file = os.path.join(COMPILE_CACHE_DIR, f'LightClient-{contracts_digest(contracts_dir)}.json')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'r') as file:
+            compiled = json.load(file)
+        return compiled['abi'], compiled['bin']
+
+    with startup.phase('install solc'):
+        install_solc_if_missing()
+    with startup.phase('compile contracts'):
+        from solcx import compile_source
+        with open (f'{contracts_dir}/LightClient.sol', 'r') as file:
+            source = file.read()
+        compiled_solc = compile_source(source,
+            output_values=['abi', 'bin'],
+            base_path=contracts_dir,
+            optimize=True,
+            optimize_runs=SOLC_OPTIMIZE_RUNS,
+            solc_version=SOLC_VERSION)
     abi = compiled_solc['<stdin>:LightClient']['abi']
     bytecode = compiled_solc['<stdin>:LightClient']['bin']
-    LightClient = web3.eth.contract(abi=abi, bytecode=bytecode)
-    return LightClient, abi
 
+    os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+    with open(cache_file, 'w') as file:
+        json.dump({'abi': abi, 'bin': bytecode}, file)
+    return abi, bytecode
 
-def init_contract():
+
+def compile_step_rotate_verifier(path=STEP_ROTATE_VERIFIER_PATH):
     """
-    Deploy the light client contract
+    Compile the verifier contract exported by snarkjs for the step_rotate circuit, returning its abi and bytecode
     """
-    global light_client 
-    init_web3()
-    LightClient, abi = compile_contract()
-    tx_hash = LightClient.constructor().transact({'gas': 30_000_000})
-    tx_receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-    light_client = web3.eth.contract(address=tx_receipt.contractAddress, abi=abi)
+    install_solc_if_missing()
+    from solcx import compile_source
+    with open(path, 'r') as file:
+        source = file.read()
+    compiled_solc = compile_source(source,
+        output_values=['abi', 'bin'],
+        optimize=True,
+        optimize_runs=SOLC_OPTIMIZE_RUNS,
+        solc_version=SOLC_VERSION)
+    # the name of the contract depends on the snarkjs version
+    (compiled,) = [compiled for name, compiled in compiled_solc.items() if name.endswith('Verifier')]
+    return compiled['abi'], compiled['bin']
 
 
-def initialize_light_client_store(trusted_block_root: Root, 
-                                  bootstrap: LightClientBootstrap,
-                                  genesis_validators_root: Root) -> LightClientStore:
+def init_light_client_store(bootstrap: LightClientBootstrap, sync_committee_poseidon) -> MyLightClientStore:
     """
-    Initialize the light client store with the light client bootstrap data by calling the light client contract
+    Initialize a local view of the light client store with the light client bootstrap data
     """
-    global store
-    global current_sync_committee_poseidon, next_sync_committee_poseidon
-    store = MyLightClientStore(
-        beacon_slot=uint64(0),
-        current_sync_committee=SyncCommittee(),
-        next_sync_committee=SyncCommittee(),
+    return MyLightClientStore(
+        beacon_slot=bootstrap.header.beacon.slot,
+        current_sync_committee=CompactSyncCommittee.from_view(bootstrap.current_sync_committee),
+        next_sync_committee=CompactSyncCommittee.empty(),
         previous_max_active_participants=uint64(0),
-        current_max_active_participants=uint64(0)
+        current_max_active_participants=uint64(0),
+        current_sync_committee_poseidon=sync_committee_poseidon,
+        next_sync_committee_poseidon=None
     )
 
-    # generate sync committee poseidon hash
-    sync_committee_poseidon = poseidon_committment(bootstrap.current_sync_committee)
 
-    event_filter = light_client.events.BootstrapComplete.create_filter(fromBlock='latest')
+def get_header_db() -> HeaderDatabase:
+    global header_db
+    # submitters of different chains may apply their first update concurrently
+    with header_db_lock:
+        if header_db is None:
+            os.makedirs(os.path.dirname(HEADER_DB_PATH), exist_ok=True)
+            header_db = HeaderDatabase(HEADER_DB_PATH)
+    return header_db
 
-    # call initialize light client store
-    light_client.functions.initializeLightClientStore(
-        ast.literal_eval(light_client_bootstrap_to_string(bootstrap)),
-        str(trusted_block_root),
-        sync_committee_poseidon,
-        str(genesis_validators_root)
-    ).transact()
 
-    # wait for BootstrapComplete event
-    while True:
-        entries = event_filter.get_new_entries()
-        if len(entries) > 0:
-            break
-        asyncio.sleep(2)
+def sync_committee_root(sync_committee: CompactSyncCommittee) -> bytes:
+    """
+    Root of a sync committee as stored by the contract, zero for an unknown sync committee
+    """
+    if sync_committee.is_empty():
+        return bytes(32)
+    return bytes(sync_committee.hash_tree_root())
 
-    # update local view of light client store
-    store.beacon_slot = bootstrap.header.beacon.slot
-    store.current_sync_committee = bootstrap.current_sync_committee
-    current_sync_committee_poseidon = sync_committee_poseidon
-    next_sync_committee_poseidon = None
-    
-    
-def process_light_client_update(update: LightClientUpdate,
-                                current_slot: Slot,
-                                genesis_validators_root: Root) -> None:
+
+def encode_light_client_update(update: LightClientUpdate):
+    """
+    Encode a light client update as argument of the contract calls
+    """
+    return ast.literal_eval(light_client_update_to_string(update))
+
+
+def signing_sync_committee(store: MyLightClientStore, update: LightClientUpdate):
     """
-    Process a light client update by calling the light client contract
+    Return the sync committee expected to sign the update and its poseidon commitment
     """
     store_period = compute_sync_committee_period_at_slot(store.beacon_slot)
     update_signature_period = compute_sync_committee_period_at_slot(update.signature_slot)
-
-    # get sync committee that signed the update
-    sync_committee = SyncCommittee()
     if(update_signature_period == store_period):
-        sync_committee = store.current_sync_committee
-        sync_committee_poseidon = current_sync_committee_poseidon
-    else:
-        sync_committee = store.next_sync_committee    
-        sync_committee_poseidon = next_sync_committee_poseidon
+        return store.current_sync_committee, store.current_sync_committee_poseidon
+    return store.next_sync_committee, store.next_sync_committee_poseidon
+
 
+def has_sync_committee_update(store: MyLightClientStore, update: LightClientUpdate) -> bool:
+    """
+    Check if the update has to be submitted together with the next sync committee
+    """
+    store_period = compute_sync_committee_period_at_slot(store.beacon_slot)
+    update_finalized_period = compute_sync_committee_period_at_slot(update.finalized_header.beacon.slot)
+    return store.next_sync_committee.is_empty() or (update_finalized_period == store_period + 1)
+
+
+def apply_light_client_update(store: MyLightClientStore,
+                              update: LightClientUpdate,
+                              next_sync_committee_poseidon) -> None:
+    """
+    Update a local view of the light client store as the contract does when processing the update
+    """
+    store_period = compute_sync_committee_period_at_slot(store.beacon_slot)
+    update_finalized_period = compute_sync_committee_period_at_slot(update.finalized_header.beacon.slot)
+
+    if store.next_sync_committee.is_empty():
+        store.next_sync_committee = CompactSyncCommittee.from_view(update.next_sync_committee)
+        store.next_sync_committee_poseidon = next_sync_committee_poseidon
+    elif update_finalized_period == store_period + 1:
+        store.current_sync_committee = store.next_sync_committee
+        store.current_sync_committee_poseidon = store.next_sync_committee_poseidon
+        store.next_sync_committee = CompactSyncCommittee.from_view(update.next_sync_committee)
+        store.next_sync_committee_poseidon = next_sync_committee_poseidon
+        store.previous_max_active_participants = store.current_max_active_participants
+        store.current_max_active_participants = 0
+    if update.finalized_header.beacon.slot > store.beacon_slot:
+        store.beacon_slot = update.finalized_header.beacon.slot
+
+
+def update_signing_root(update: LightClientUpdate, genesis_validators_root: Root) -> Root:
+    """
+    Signing root of the attested header of the update, signed by the sync committee
+    """
     domain = compute_domain(
-            DOMAIN_SYNC_COMMITTEE, 
-            compute_fork_version(compute_epoch_at_slot(max(update.signature_slot, Slot(1)) - Slot(1))), 
+            DOMAIN_SYNC_COMMITTEE,
+            compute_fork_version(compute_epoch_at_slot(max(update.signature_slot, Slot(1)) - Slot(1))),
             str(genesis_validators_root)
         )
+    return compute_signing_root(update.attested_header.beacon, domain)
+
+
+def prove_combined(store: MyLightClientStore,
+                   update: LightClientUpdate,
+                   current_slot: Slot,
+                   genesis_validators_root: Root) -> ProvenUpdate:
+    """
+    Generate a single proof of the sync committee signature of the update and of the poseidon commitment
+    of its next sync committee
+    """
+    sync_committee, sync_committee_poseidon = signing_sync_committee(store, update)
+    with profiling.stage('encode update'):
+        encoded_update = encode_light_client_update(update)
+
+    combined_proof, next_sync_committee_poseidon = step_rotate_proof(
+        sync_committee,
+        update.sync_aggregate.sync_committee_bits,
+        update.sync_aggregate.sync_committee_signature,
+        update_signing_root(update, genesis_validators_root),
+        sum(update.sync_aggregate.sync_committee_bits),
+        sync_committee_poseidon,
+        update.next_sync_committee
+    )
+
+    return ProvenUpdate(
+        update=update,
+        encoded_update=encoded_update,
+        current_slot=current_slot,
+        sync_committee=sync_committee,
+        sync_committee_poseidon=sync_committee_poseidon,
+        signature_proof=combined_proof,
+        next_sync_committee_poseidon=next_sync_committee_poseidon,
+        combined=True
+    )
+
+
+def prove_signature(store: MyLightClientStore,
+                    update: LightClientUpdate,
+                    current_slot: Slot,
+                    genesis_validators_root: Root) -> ProvenUpdate:
+    """
+    Generate the proof of the sync committee signature of the update
+    """
+    # get sync committee that signed the update
+    sync_committee, sync_committee_poseidon = signing_sync_committee(store, update)
 
     # verify header signature and generate proof
     signature_proof = validate_light_client_update(
-        sync_committee, 
-        update.sync_aggregate.sync_committee_bits, 
+        sync_committee,
+        update.sync_aggregate.sync_committee_bits,
         update.sync_aggregate.sync_committee_signature,
-        compute_signing_root(update.attested_header.beacon, domain), # compute the signing root for header signature verification
+        update_signing_root(update, genesis_validators_root),
         sum(update.sync_aggregate.sync_committee_bits),
         sync_committee_poseidon
     )
+    with profiling.stage('encode update'):
+        encoded_update = encode_light_client_update(update)
 
-    update_finalized_period = compute_sync_committee_period_at_slot(update.finalized_header.beacon.slot)
+    proven_update = ProvenUpdate(
+        update=update,
+        encoded_update=encoded_update,
+        current_slot=current_slot,
+        sync_committee=sync_committee,
+        sync_committee_poseidon=sync_committee_poseidon,
+        signature_proof=signature_proof
+    )
+    return proven_update
+
+
+def prove_light_client_update(store: MyLightClientStore,
+                              update: LightClientUpdate,
+                              current_slot: Slot,
+                              genesis_validators_root: Root) -> ProvenUpdate:
+    """
+    Generate the proofs required by the light client contract to process the update
+    """
+    if COMBINED_ROTATION_PROOFS and has_sync_committee_update(store, update):
+        # one witness generation and one proof for both the signature and the next sync committee
+        return prove_combined(store, update, current_slot, genesis_validators_root)
+
+    proven_update = prove_signature(store, update, current_slot, genesis_validators_root)
 
-    if (store.next_sync_committee == SyncCommittee()) or (update_finalized_period == store_period + 1):
+    if has_sync_committee_update(store, update):
         # the update contains a sync committee update
         # generate sync committee poseidon hash and proof
-        sync_committee_poseidon, commitment_mapping_proof = poseidon_committment(update.next_sync_committee)
+        proven_update.commitment_mapping_proof, proven_update.next_sync_committee_poseidon = \
+            poseidon_committment(update.next_sync_committee)
 
-        # call with sync committee update
-        light_client.functions.processLightClientUpdate(
-            ast.literal_eval(light_client_update_to_string(update)),
-            int(str(current_slot)),
-            ast.literal_eval(sync_committee_to_string(sync_committee)),
+    return proven_update
+
+
+class LightClientTarget:
+    """
+    Light client contract deployed on a destination chain.
+    Transactions are sent by a dedicated submitter thread, which tracks the nonce of the account,
+    and the target keeps its own view of the light client store.
+    """
+
+    def __init__(self, name, provider):
+        from web3 import Web3
+        self.name = name
+        self.web3 = Web3(provider)
+        self.account = self.web3.eth.accounts[0]
+        self.web3.eth.default_account = self.account
+        self.light_client = None
+        self.store = None
+        self.nonce = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'submitter-{name}')
+
+    def deploy(self, abi, bytecode, step_rotate_verifier=None):
+        """
+        Deploy the light client contract, together with the verifier of the combined proofs if given (abi, bytecode)
+        """
+        LightClient = self.web3.eth.contract(abi=abi, bytecode=bytecode)
+        tx_receipt = self.transact(LightClient.constructor())
+        self.light_client = self.web3.eth.contract(address=tx_receipt.contractAddress, abi=abi)
+
+        if step_rotate_verifier is not None:
+            verifier_abi, verifier_bytecode = step_rotate_verifier
+            Verifier = self.web3.eth.contract(abi=verifier_abi, bytecode=verifier_bytecode)
+            tx_receipt = self.transact(Verifier.constructor())
+            tx_receipt = self.transact(self.light_client.functions.setStepRotateVerifier(tx_receipt.contractAddress))
+            assert tx_receipt.status == 1, f"Setting the combined proof verifier failed on {self.name}"
+
+    def transact(self, call):
+        """
+        Send a transaction with the next nonce of the account and wait for its receipt
+        """
+        if self.nonce is None:
+            self.nonce = self.web3.eth.get_transaction_count(self.account, 'pending')
+        try:
+            tx_hash = call.transact({'gas': TRANSACTION_GAS, 'nonce': self.nonce})
+        except Exception:
+            # the nonce may not have been used, retrieve it again from the chain
+            self.nonce = None
+            raise
+        self.nonce += 1
+        return self.web3.eth.wait_for_transaction_receipt(tx_hash)
+
+    def initialize_light_client_store_call(self,
+                                           bootstrap: LightClientBootstrap,
+                                           trusted_block_root: Root,
+                                           sync_committee_poseidon,
+                                           genesis_validators_root: Root):
+        """
+        Build the contract call initializing the light client store
+        """
+        return self.light_client.functions.initializeLightClientStore(
+            ast.literal_eval(light_client_bootstrap_to_string(bootstrap)),
+            str(trusted_block_root),
             sync_committee_poseidon,
-            commitment_mapping_proof,
-            signature_proof
-        ).transact({'gas': 30_000_000})
-    else:
-        # the update does not contain a sync committee update
-        # call without sync committee update
-        light_client.functions.processLightClientUpdate(
-            ast.literal_eval(light_client_update_to_string(update)),
-            int(str(current_slot)),
-            ast.literal_eval(sync_committee_to_string(sync_committee)),
-            signature_proof
-        ).transact({'gas': 30_000_000})
+            str(genesis_validators_root)
+        )
+
+    def process_light_client_update_call(self,
+                                         update: LightClientUpdate,
+                                         current_slot: Slot,
+                                         sync_committee: SyncCommittee,
+                                         signature_proof,
+                                         next_sync_committee_poseidon=None,
+                                         commitment_mapping_proof=None,
+                                         committee_commitment=None,
+                                         encoded_update=None):
+        """
+        Build the contract call processing a light client update.
+        The sync committee update overload is selected when the next sync committee poseidon is given,
+        the signing sync committee is sent only if the committee commitment calldata mode is disabled.
+        """
+        if committee_commitment is None:
+            committee_commitment = COMMITTEE_COMMITMENT_CALLDATA
+        if encoded_update is None:
+            encoded_update = encode_light_client_update(update)
+
+        args = [encoded_update, int(str(current_slot))]
+        if not committee_commitment:
+            args.append(ast.literal_eval(sync_committee_to_string(sync_committee)))
+        if next_sync_committee_poseidon is not None:
+            args += [int(str(next_sync_committee_poseidon), 16), commitment_mapping_proof]
+        args.append(signature_proof)
+
+        return self.light_client.functions.processLightClientUpdate(*args)
+
+    def process_light_client_update_combined_call(self,
+                                                  update: LightClientUpdate,
+                                                  current_slot: Slot,
+                                                  next_sync_committee_poseidon,
+                                                  combined_proof,
+                                                  encoded_update=None):
+        """
+        Build the contract call processing an update with a sync committee update, proven by a combined proof.
+        The signing sync committee is never sent, the contract takes its commitment from the store.
+        """
+        if encoded_update is None:
+            encoded_update = encode_light_client_update(update)
+        return self.light_client.functions.processLightClientUpdateCombined(
+            encoded_update, int(str(current_slot)), int(str(next_sync_committee_poseidon), 16), combined_proof)
+
+    def process_light_client_optimistic_update_call(self,
+                                                    update: LightClientUpdate,
+                                                    current_slot: Slot,
+                                                    signature_proof,
+                                                    encoded_update=None):
+        """
+        Build the contract call processing an optimistic update.
+        The signing sync committee is never sent, the contract takes its commitment from the store.
+        """
+        if encoded_update is None:
+            encoded_update = encode_light_client_update(update)
+        return self.light_client.functions.processLightClientOptimisticUpdate(
+            encoded_update, int(str(current_slot)), signature_proof)
+
+    def initialize_light_client_store(self,
+                                      trusted_block_root: Root,
+                                      bootstrap: LightClientBootstrap,
+                                      sync_committee_poseidon,
+                                      genesis_validators_root: Root) -> None:
+        """
+        Initialize the light client store with the light client bootstrap data by calling the light client contract
+        """
+        tx_receipt = self.transact(self.initialize_light_client_store_call(
+            bootstrap, trusted_block_root, sync_committee_poseidon, genesis_validators_root
+        ))
+        assert tx_receipt.status == 1, f"Bootstrap failed on {self.name}"
+
+        # update local view of light client store
+        self.store = init_light_client_store(bootstrap, sync_committee_poseidon)
+
+    def submit_light_client_update(self, proven_update: ProvenUpdate):
+        """
+        Submit a proven update, if it fits the view of the light client store of this chain
+        """
+        update = proven_update.update
+        _, sync_committee_poseidon = signing_sync_committee(self.store, update)
+        if sync_committee_poseidon != proven_update.sync_committee_poseidon:
+            print(f"[{self.name}] Skipping update: signed by a sync committee unknown to this chain")
+            return None
+
+        if proven_update.optimistic:
+            return self.submit_light_client_optimistic_update(proven_update)
+
+        if has_sync_committee_update(self.store, update):
+            if proven_update.next_sync_committee_poseidon is None:
+                print(f"[{self.name}] Skipping update: the next sync committee has not been proven")
+                return None
+            if proven_update.combined:
+                # call with sync committee update, single proof
+                call = self.process_light_client_update_combined_call(
+                    update, proven_update.current_slot, proven_update.next_sync_committee_poseidon,
+                    proven_update.signature_proof, encoded_update=proven_update.encoded_update
+                )
+            else:
+                # call with sync committee update
+                call = self.process_light_client_update_call(
+                    update, proven_update.current_slot, proven_update.sync_committee, proven_update.signature_proof,
+                    proven_update.next_sync_committee_poseidon, proven_update.commitment_mapping_proof,
+                    encoded_update=proven_update.encoded_update
+                )
+        else:
+            # call without sync committee update
+            call = self.process_light_client_update_call(
+                update, proven_update.current_slot, proven_update.sync_committee, proven_update.signature_proof,
+                encoded_update=proven_update.encoded_update
+            )
+
+        try:
+            tx_receipt = self.transact(call)
+        except Exception:
+            # the transaction may still have been mined
+            self.reconcile()
+            raise
+        if tx_receipt.status != 1:
+            print(f"[{self.name}] Update reverted: attested slot {update.attested_header.beacon.slot}")
+            self.reconcile()
+            return tx_receipt
+
+        # update local view of light client store
+        apply_light_client_update(self.store, update, proven_update.next_sync_committee_poseidon)
+        if is_sync_committee_update(update):
+            update_tracker.mark_applied(self.name, update)
+            update_tracker.mark_proven(update)
+        if update.finalized_header.beacon.slot != 0:
+            get_header_db().add_header(self.name, update.finalized_header, '0x' + bytes(tx_receipt.transactionHash).hex())
+        return tx_receipt
+
+    def submit_light_client_optimistic_update(self, proven_update: ProvenUpdate):
+        """
+        Submit a proven optimistic update and report the head-to-chain latency of its header
+        """
+        update = proven_update.update
+        attested_slot = update.attested_header.beacon.slot
+        if attested_slot <= self.store.optimistic_slot:
+            # a more recent optimistic header was submitted while this one was waiting
+            print(f"[{self.name}] Skipping optimistic update: slot {attested_slot} superseded")
+            return None
+
+        tx_receipt = self.transact(self.process_light_client_optimistic_update_call(
+            update, proven_update.current_slot, proven_update.signature_proof,
+            encoded_update=proven_update.encoded_update
+        ))
+        if tx_receipt.status != 1:
+            print(f"[{self.name}] Optimistic update reverted: attested slot {attested_slot}")
+            self.reconcile()
+            return tx_receipt
+
+        self.store.optimistic_slot = attested_slot
+        # the prover drops the optimistic updates older than the header accepted by a destination chain
+        if store is not None and attested_slot > store.optimistic_slot:
+            store.optimistic_slot = attested_slot
+        latency = now() - compute_time_at_slot(attested_slot)
+        optimistic_stats['submitted'] += 1
+        optimistic_stats['last_latency'] = round(latency, 1)
+        optimistic_stats['max_latency'] = max(optimistic_stats['max_latency'] or 0, round(latency, 1))
+        print(f"[{self.name}] Optimistic header: slot {attested_slot} on chain {latency:.1f}s after the start of its slot")
+        return tx_receipt
+
+    def read_light_client_store(self):
+        """
+        Read the light client store and the poseidon roots of its sync committees with a single call
+        """
+        (beacon_slot, current_sync_committee_root, next_sync_committee_root,
+         current_sync_committee_poseidon, next_sync_committee_poseidon) = \
+            self.light_client.functions.getLightClientStore().call()
+        return {
+            'beacon_slot': beacon_slot,
+            'current_sync_committee_root': bytes(current_sync_committee_root),
+            'next_sync_committee_root': bytes(next_sync_committee_root),
+            'current_sync_committee_poseidon': bytes(current_sync_committee_poseidon),
+            'next_sync_committee_poseidon': bytes(next_sync_committee_poseidon),
+        }
+
+    def reconcile(self) -> bool:
+        """
+        Compare the local view of the light client store with the contract and fix the fields that differ.
+        Sync committees are looked up among the ones known locally, since the contract only stores their roots.
+        Return False if the local view could not be repaired.
+        """
+        if self.store is None:
+            return False
+        try:
+            onchain = self.read_light_client_store()
+        except Exception as e:
+            print(f"[{self.name}] Unable to read the light client store: {e}")
+            return False
+
+        # sync committees known locally, by root
+        known_committees = {}
+        for known_store in [self.store, store]:
+            if known_store is not None:
+                for committee in [known_store.current_sync_committee, known_store.next_sync_committee]:
+                    known_committees[sync_committee_root(committee)] = committee
+
+        fixed = []
+        repaired = True
+        if self.store.beacon_slot != onchain['beacon_slot']:
+            self.store.beacon_slot = uint64(onchain['beacon_slot'])
+            fixed.append('beacon_slot')
+        for name in ['current', 'next']:
+            root = onchain[f'{name}_sync_committee_root']
+            if sync_committee_root(getattr(self.store, f'{name}_sync_committee')) != root:
+                if not any(root):
+                    # the contract does not know the sync committee, e.g., the rotation was not applied
+                    setattr(self.store, f'{name}_sync_committee', CompactSyncCommittee.empty())
+                elif root in known_committees:
+                    setattr(self.store, f'{name}_sync_committee', known_committees[root])
+                else:
+                    print(f"[{self.name}] The {name} sync committee of the contract is unknown, a new bootstrap is needed")
+                    repaired = False
+                    continue
+                fixed.append(f'{name}_sync_committee')
+            poseidon = onchain[f'{name}_sync_committee_poseidon']
+            poseidon = hex(int.from_bytes(poseidon, 'big')) if any(root) and any(poseidon) else None
+            if getattr(self.store, f'{name}_sync_committee_poseidon') != poseidon:
+                setattr(self.store, f'{name}_sync_committee_poseidon', poseidon)
+                fixed.append(f'{name}_sync_committee_poseidon')
+
+        if fixed:
+            print(f"[{self.name}] Reconciled local view of the light client store: {', '.join(fixed)}")
+        return repaired
+
+
+def init_contract(destination_chains=None, contracts_dir='./contracts'):
+    """
+    Compile the light client contract and deploy it on every destination chain,
+    given as RPC endpoint URLs or web3 providers
+    """
+    global targets
+    if destination_chains is None:
+        destination_chains = [DEFAULT_DESTINATION_CHAIN]
+
+    abi, bytecode = compile_contract(contracts_dir)
+    step_rotate_verifier = None
+    if COMBINED_ROTATION_PROOFS:
+        assert COMMITTEE_COMMITMENT_CALLDATA, "Combined proofs require the committee commitment calldata mode"
+        with startup.phase('compile combined proof verifier'):
+            step_rotate_verifier = compile_step_rotate_verifier()
+    with startup.phase('deploy contracts'):
+        from web3 import HTTPProvider
+        targets = []
+        for i, chain in enumerate(destination_chains):
+            if isinstance(chain, str):
+                target = LightClientTarget(chain, HTTPProvider(chain, request_kwargs={'timeout': 300}))
+            else:
+                target = LightClientTarget(f'{type(chain).__name__}-{i}', chain)
+            target.deploy(abi, bytecode, step_rotate_verifier)
+            targets.append(target)
+
+
+def initialize_light_client_store(trusted_block_root: Root,
+                                  bootstrap: LightClientBootstrap,
+                                  genesis_validators_root: Root,
+                                  sync_committee_poseidon=None) -> None:
+    """
+    Initialize the light client store of every destination chain with the light client bootstrap data.
+    The sync committee poseidon is generated unless given (e.g., by a proof bundle).
+    """
+    global store
+
+    if sync_committee_poseidon is None:
+        # only the commitment is needed, the contract does not verify its mapping at bootstrap
+        sync_committee_poseidon = compute_sync_committee_poseidon(bootstrap.current_sync_committee)
 
     # update local view of light client store
-    if store.next_sync_committee != SyncCommittee():
-       store.next_sync_committee = update.next_sync_committee
-       next_sync_committee_poseidon = sync_committee_poseidon
-    elif update_finalized_period == store_period + 1:
-        store.current_sync_committee = store.next_sync_committee
-        store.next_sync_committee = update.next_sync_committee
-        next_sync_committee_poseidon = sync_committee_poseidon
-        store.previous_max_active_participants = store.current_max_active_participants
-        store.current_max_active_participants = 0
-    if update.finalized_header.beacon.slot > store.beacon_slot:
-        store.beacon_slot = update.finalized_header.beacon.slot
\ No newline at end of file
+    store = init_light_client_store(bootstrap, sync_committee_poseidon)
+
+    for target in targets:
+        target.initialize_light_client_store(
+            trusted_block_root, bootstrap, sync_committee_poseidon, genesis_validators_root
+        )
+        # cheap check that the contract and the local view agree before relaying
+        target.reconcile()
+
+
+def report_submission(target: LightClientTarget, future) -> None:
+    exception = future.exception()
+    if exception is not None:
+        print(f"[{target.name}] Unable to submit update: {exception}")
+    elif future.result() is not None and startup.mark('first update submitted'):
+        startup.report()
+
+
+def submit_to_target(target: LightClientTarget, proven_update: ProvenUpdate, update_profile=None):
+    """
+    Submit a proven update to a destination chain, recording the submission in the profile of the update
+    """
+    try:
+        with profiling.stage(f'submit {target.name}', update_profile):
+            return target.submit_light_client_update(proven_update)
+    finally:
+        if update_profile is not None:
+            update_profile.release()
+
+
+def submit_proven_update(proven_update: ProvenUpdate) -> list:
+    """
+    Hand a proven update over to the submitter of every destination chain, returning the submission futures
+    """
+    # submitters run independently, a slow or failing chain does not delay the others
+    futures = []
+    update_profile = profiling.current()
+    for target in targets:
+        if update_profile is not None:
+            update_profile.hold()
+        future = target.executor.submit(submit_to_target, target, proven_update, update_profile)
+        future.add_done_callback(lambda future, target=target: report_submission(target, future))
+        futures.append(future)
+    return futures
+
+
+def track_sync_committee_update(update: LightClientUpdate, futures: list) -> None:
+    """
+    Once every submission of a sync committee update completed, it is no longer in flight: check that a destination
+    chain applied it. Otherwise the local view of the prover is resynchronized before the next update, so that the
+    update is proven again when it is fetched anew.
+    """
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def submission_done(future):
+        global resync_store
+        with lock:
+            pending[0] -= 1
+            if pending[0] > 0:
+                return
+        update_tracker.clear_in_flight(update)
+        if not update_tracker.is_applied(update):
+            print("No destination chain applied the sync committee update (attested slot %s), it will be retried" % (
+                update.attested_header.beacon.slot))
+            resync_store = True
+
+    for future in futures:
+        future.add_done_callback(submission_done)
+
+
+def resync_prover_store() -> None:
+    """
+    Replace the local view of the prover with the one of the first destination chain, reconciled after failures
+    """
+    global store, resync_store
+    resync_store = False
+    for target in targets:
+        if target.store is not None:
+            store = copy.copy(target.store)
+            print(f"Resynchronized the local view of the light client store with {target.name}")
+            return
+
+
+def process_light_client_update(update: LightClientUpdate,
+                                current_slot: Slot,
+                                genesis_validators_root: Root) -> Optional[ProvenUpdate]:
+    """
+    Process a light client update: prove it once and hand it over to the submitter of every destination chain.
+    Without destination chains, the update is only proven (see the prove command of the relayer).
+    """
+    with profiling.profile(f'update-{update.attested_header.beacon.slot}'):
+        if resync_store:
+            resync_prover_store()
+
+        # period updates are fetched again every epoch close to the end of the period: only prove strictly better ones
+        tracked = is_sync_committee_update(update)
+        if tracked and not update_tracker.is_candidate(update):
+            print("Dropping update: not better than the update proven for its period (attested slot %s)" % (
+                update.attested_header.beacon.slot))
+            return None
+
+        # drop updates the contract would reject or ignore before spending minutes on proving them
+        start_time = time.time()
+        try:
+            with profiling.stage('preflight'):
+                preflight_light_client_update(store, update, current_slot, genesis_validators_root)
+        except AssertionError as e:
+            print("Dropping update: %s (attested slot %s, checked in %.3fs)" % (
+                e, update.attested_header.beacon.slot, time.time() - start_time))
+            return None
+
+        with profiling.stage('prove'):
+            proven_update = prove_light_client_update(store, update, current_slot, genesis_validators_root)
+        if tracked and targets:
+            # the update counts as proven once a destination chain applied it, until then it is in flight
+            update_tracker.mark_in_flight(update)
+        futures = submit_proven_update(proven_update)
+        if tracked:
+            if targets:
+                track_sync_committee_update(update, futures)
+            else:
+                update_tracker.mark_proven(update)
+
+        # update local view of light client store
+        apply_light_client_update(store, update, proven_update.next_sync_committee_poseidon)
+        return proven_update
+
+
+def process_light_client_optimistic_update(update: LightClientUpdate,
+                                           current_slot: Slot,
+                                           genesis_validators_root: Root,
+                                           is_superseded=None) -> Optional[ProvenUpdate]:
+    """
+    Process an optimistic update: prove its signature and hand it over to the submitter of every destination chain.
+    is_superseded is checked before proving, so that a header is not proven once a newer one arrives. A proven header
+    is always submitted: proving takes longer than a slot, and the destination chains drop the stale ones.
+    """
+    slot = update.attested_header.beacon.slot
+    with profiling.profile(f'optimistic-{slot}'):
+        try:
+            with profiling.stage('preflight'):
+                preflight_light_client_update(store, update, current_slot, genesis_validators_root, optimistic=True)
+        except AssertionError as e:
+            print("Dropping optimistic update: %s (attested slot %s)" % (e, slot))
+            return None
+        if is_superseded is not None and is_superseded():
+            optimistic_stats['superseded'] += 1
+            print("Dropping optimistic update: slot %s superseded before proving" % slot)
+            return None
+
+        with profiling.stage('prove'):
+            proven_update = prove_signature(store, update, current_slot, genesis_validators_root)
+        proven_update.optimistic = True
+
+        # the local view of the prover advances once a destination chain accepts the header
+        submit_proven_update(proven_update)
+        return proven_update
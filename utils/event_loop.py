@@ -0,0 +1,50 @@
+"""
+Utilities for keeping the asyncio event loop of the relayer responsive
+"""
+import asyncio
+import time
+
+
+class LoopLagMonitor:
+    """
+    Measure the responsiveness of the event loop: a task sleeps for a fixed interval and records
+    how late it is woken up. A lag close to zero means no blocking work is running on the loop.
+    """
+
+    def __init__(self, interval=0.5, warning_threshold=0.2):
+        self.interval = interval
+        self.warning_threshold = warning_threshold
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.slow_samples = 0
+
+    async def run(self):
+        """
+        Sample the loop lag forever, to be run as a task
+        """
+        while True:
+            start_time = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start_time - self.interval, 0.0)
+
+            self.samples += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            if lag > self.warning_threshold:
+                self.slow_samples += 1
+                print("Event loop blocked for %.3fs" % lag)
+
+    def stats(self):
+        """
+        Return the lag statistics in seconds
+        """
+        return {
+            'samples': self.samples,
+            'last_lag': self.last_lag,
+            'mean_lag': self.total_lag / self.samples if self.samples else 0.0,
+            'max_lag': self.max_lag,
+            'slow_samples': self.slow_samples,
+        }
@@ -0,0 +1,72 @@
+"""
+Groth16 verifier over BN254, used to check the proofs generated by rapidsnark before submitting them.
+Verification keys are the ones exported by snarkjs (`*_vkey.json`), proofs and public signals use the snarkjs format.
+"""
+import json
+
+from py_ecc.optimized_bn128 import (
+    FQ, FQ2, FQ12, add, multiply, neg, pairing, final_exponentiate, is_on_curve, b, b2, curve_order
+)
+
+verification_keys = {}
+
+
+def parse_g1(point):
+    x, y = FQ(int(point[0])), FQ(int(point[1]))
+    point = (x, y, FQ.one())
+    assert is_on_curve(point, b), "G1 point not on curve"
+    return point
+
+
+def parse_g2(point):
+    # snarkjs represents an element of FQ2 as [c0, c1]
+    x = FQ2([int(point[0][0]), int(point[0][1])])
+    y = FQ2([int(point[1][0]), int(point[1][1])])
+    point = (x, y, FQ2.one())
+    assert is_on_curve(point, b2), "G2 point not on curve"
+    return point
+
+
+def load_verification_key(path):
+    """
+    Load a verification key exported by snarkjs, parsed keys are kept in memory
+    """
+    if path not in verification_keys:
+        with open(path, 'r') as file:
+            vkey = json.load(file)
+        assert vkey['protocol'] == 'groth16' and vkey['curve'] == 'bn128', "Unsupported verification key"
+        verification_keys[path] = {
+            'alpha_1': parse_g1(vkey['vk_alpha_1']),
+            'beta_2': parse_g2(vkey['vk_beta_2']),
+            'gamma_2': parse_g2(vkey['vk_gamma_2']),
+            'delta_2': parse_g2(vkey['vk_delta_2']),
+            'ic': [parse_g1(point) for point in vkey['IC']],
+        }
+    return verification_keys[path]
+
+
+def verify(vkey, proof, public_signals) -> bool:
+    """
+    Check e(A, B) == e(alpha, beta) * e(vk_x, gamma) * e(C, delta), with vk_x = IC_0 + sum(s_i * IC_i)
+    """
+    if len(public_signals) + 1 != len(vkey['ic']):
+        return False
+    signals = [int(signal) for signal in public_signals]
+    if any(signal >= curve_order for signal in signals):
+        return False
+    try:
+        a, c = parse_g1(proof['pi_a']), parse_g1(proof['pi_c'])
+        b_2 = parse_g2(proof['pi_b'])
+    except (AssertionError, ValueError, IndexError):
+        return False
+
+    vk_x = vkey['ic'][0]
+    for signal, point in zip(signals, vkey['ic'][1:]):
+        if signal != 0:
+            vk_x = add(vk_x, multiply(point, signal))
+
+    # a single final exponentiation for the product of the four Miller loops
+    product = FQ12.one()
+    for q, p in [(b_2, neg(a)), (vkey['beta_2'], vkey['alpha_1']), (vkey['gamma_2'], vk_x), (vkey['delta_2'], c)]:
+        product = product * pairing(q, p, final_exponentiate=False)
+    return final_exponentiate(product) == FQ12.one()
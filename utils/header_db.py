@@ -0,0 +1,141 @@
+"""
+Embedded database of the finalized headers submitted to the destination chains.
+It answers downstream lookups (e.g., which execution block was finalized at a slot) through indexed queries.
+
+Usage:
+    python -m utils.header_db slot SLOT
+    python -m utils.header_db block-number NUMBER
+    python -m utils.header_db block-hash HASH
+    python -m utils.header_db range FROM_SLOT TO_SLOT
+"""
+import argparse
+import sqlite3
+import threading
+
+from utils.specs import LightClientHeader
+from utils.ssz.ssz_impl import hash_tree_root
+
+COLUMNS = [
+    'chain', 'beacon_slot', 'beacon_root', 'beacon_state_root', 'beacon_body_root',
+    'execution_block_number', 'execution_block_hash', 'execution_state_root', 'tx_hash'
+]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS headers (
+    chain TEXT NOT NULL,
+    beacon_slot INTEGER NOT NULL,
+    beacon_root TEXT NOT NULL,
+    beacon_state_root TEXT NOT NULL,
+    beacon_body_root TEXT NOT NULL,
+    execution_block_number INTEGER NOT NULL,
+    execution_block_hash TEXT NOT NULL,
+    execution_state_root TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    PRIMARY KEY (beacon_slot, chain)
+);
+CREATE INDEX IF NOT EXISTS headers_execution_block_number ON headers (execution_block_number);
+CREATE INDEX IF NOT EXISTS headers_execution_block_hash ON headers (execution_block_hash);
+CREATE INDEX IF NOT EXISTS headers_beacon_root ON headers (beacon_root);
+'''
+
+
+class HeaderDatabase:
+    """
+    SQLite database of finalized headers, one row per header and destination chain.
+    Lookups by slot, beacon root, execution block number or hash go through B-tree indexes.
+    The connection is shared by the submitter threads, a lock serializes its use.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def add_header(self, chain, header: LightClientHeader, tx_hash):
+        """
+        Record a finalized header submitted to a destination chain
+        """
+        row = (
+            chain,
+            int(header.beacon.slot),
+            '0x' + bytes(hash_tree_root(header.beacon)).hex(),
+            '0x' + bytes(header.beacon.state_root).hex(),
+            '0x' + bytes(header.beacon.body_root).hex(),
+            int(header.execution.block_number),
+            '0x' + bytes(header.execution.block_hash).hex(),
+            '0x' + bytes(header.execution.state_root).hex(),
+            tx_hash,
+        )
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO headers ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", row)
+
+    def _query(self, condition, parameters, chain=None):
+        if chain is not None:
+            condition += ' AND chain = ?'
+            parameters = (*parameters, chain)
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM headers WHERE {condition} ORDER BY beacon_slot, chain", parameters).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_by_slot(self, slot, chain=None):
+        return self._query('beacon_slot = ?', (int(slot),), chain)
+
+    def get_by_beacon_root(self, root, chain=None):
+        return self._query('beacon_root = ?', (root.lower(),), chain)
+
+    def get_by_block_number(self, block_number, chain=None):
+        return self._query('execution_block_number = ?', (int(block_number),), chain)
+
+    def get_by_block_hash(self, block_hash, chain=None):
+        return self._query('execution_block_hash = ?', (block_hash.lower(),), chain)
+
+    def get_range(self, from_slot, to_slot, chain=None):
+        """
+        Return the headers with slot in [from_slot, to_slot], ordered by slot
+        """
+        return self._query('beacon_slot BETWEEN ? AND ?', (int(from_slot), int(to_slot)), chain)
+
+    def latest(self, chain=None):
+        """
+        Return the most recent header, None if there is none
+        """
+        condition, parameters = ('WHERE chain = ?', (chain,)) if chain is not None else ('', ())
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT * FROM headers {condition} ORDER BY beacon_slot DESC LIMIT 1", parameters).fetchone()
+        return dict(row) if row is not None else None
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    from utils.contract_middleware import HEADER_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Query the finalized headers submitted by the relayer")
+    parser.add_argument('--db', default=HEADER_DB_PATH)
+    parser.add_argument('--chain', default=None, help="destination chain, all if omitted")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('slot').add_argument('slot', type=int)
+    subparsers.add_parser('block-number').add_argument('block_number', type=int)
+    subparsers.add_parser('block-hash').add_argument('block_hash')
+    range_parser = subparsers.add_parser('range')
+    range_parser.add_argument('from_slot', type=int)
+    range_parser.add_argument('to_slot', type=int)
+    args = parser.parse_args()
+
+    database = HeaderDatabase(args.db)
+    if args.command == 'slot':
+        headers = database.get_by_slot(args.slot, args.chain)
+    elif args.command == 'block-number':
+        headers = database.get_by_block_number(args.block_number, args.chain)
+    elif args.command == 'block-hash':
+        headers = database.get_by_block_hash(args.block_hash, args.chain)
+    else:
+        headers = database.get_range(args.from_slot, args.to_slot, args.chain)
+    for header in headers:
+        print(header)
@@ -3,7 +3,15 @@ Utility functions for parsing data from the beacon API
 """
 from utils.specs import (
     BeaconBlockHeader, LightClientHeader, BeaconBlockHeader, ExecutionPayloadHeader,
-    SyncCommittee, LightClientUpdate, SyncAggregate)
+    SyncCommittee, LightClientUpdate, SyncAggregate, LightClientBootstrap, LightClientFinalityUpdate,
+    LightClientOptimisticUpdate)
+import codecs
+import json
+import re
+
+# characters delimiting the objects of a JSON array, and the end of a string or an escape inside a string
+JSON_STRUCTURAL = re.compile(r'[\[\]{}",]')
+JSON_STRING_SPECIAL = re.compile(r'["\\]')
 
 
 def hex_to_bytes(hex_string):
@@ -116,4 +124,118 @@ def parse_light_client_updates(updates):
     """
     Parse a list of light client updates from the beacon API
     """
-    return [parse_light_client_update(update['data']) for update in updates]
\ No newline at end of file
+    return [parse_light_client_update(update['data']) for update in updates]
+
+
+def parse_light_client_bootstrap(bootstrap):
+    """
+    Parse a light client bootstrap from the beacon API
+    """
+    return LightClientBootstrap(
+        header=parse_header(bootstrap['header']),
+        current_sync_committee=parse_sync_committee(
+            bootstrap['current_sync_committee']),
+        current_sync_committee_branch=bootstrap['current_sync_committee_branch']
+    )
+
+
+def parse_light_client_finality_update(finality_update):
+    """
+    Parse a light client finality update from the beacon API
+    """
+    return LightClientFinalityUpdate(
+        attested_header=parse_header(
+            finality_update['attested_header']),
+        finalized_header=parse_header(
+            finality_update['finalized_header']),
+        finality_branch=finality_update['finality_branch'],
+        sync_aggregate=parse_sync_aggregate(
+            finality_update['sync_aggregate']),
+        signature_slot=int(finality_update['signature_slot'])
+    )
+
+
+def parse_light_client_optimistic_update(optimistic_update):
+    """
+    Parse a light client optimistic update from the beacon API
+    """
+    return LightClientOptimisticUpdate(
+        attested_header=parse_header(
+            optimistic_update['attested_header']),
+        sync_aggregate=parse_sync_aggregate(
+            optimistic_update['sync_aggregate']),
+        signature_slot=int(optimistic_update['signature_slot'])
+    )
+
+
+class TruncatedJSONError(ValueError):
+    """
+    The stream of a JSON array ended before the array was closed
+    """
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally decode a JSON array of objects received in chunks of bytes,
+    yielding each object as soon as it is complete. Only the current object is buffered.
+    Every character is scanned once, tracking the nesting depth, and an object is decoded when it is closed.
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    # text of the current object received in the previous chunks
+    pieces = []
+    depth = 0
+    started = in_string = escaped = False
+    for chunk in chunks:
+        text = text_decoder.decode(chunk)
+        # position of the next character to scan, and start of the current object in this chunk
+        position = 0
+        element_start = 0
+        while position < len(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                    position += 1
+                    continue
+                match = JSON_STRING_SPECIAL.search(text, position)
+                if match is None:
+                    break
+                position = match.end()
+                if match.group() == '\\':
+                    escaped = True
+                else:
+                    in_string = False
+                continue
+
+            match = JSON_STRUCTURAL.search(text, position)
+            if match is None:
+                if depth == 0:
+                    assert not text[position:].strip(), "Not a JSON array of objects"
+                break
+            char = match.group()
+            if depth == 0:
+                assert not text[position:match.start()].strip(), "Not a JSON array of objects"
+            position = match.end()
+
+            if not started:
+                assert char == '[', "Not a JSON array"
+                started = True
+            elif char == '"':
+                assert depth > 0, "Not a JSON array of objects"
+                in_string = True
+            elif char in '{[':
+                if depth == 0:
+                    element_start = match.start()
+                depth += 1
+            elif char in '}]':
+                if depth == 0:
+                    assert char == ']', "Malformed JSON array"
+                    return
+                depth -= 1
+                if depth == 0:
+                    pieces.append(text[element_start:position])
+                    element = json.loads(''.join(pieces))
+                    pieces = []
+                    yield element
+        if depth > 0:
+            pieces.append(text[element_start:])
+    raise TruncatedJSONError("Truncated JSON array")
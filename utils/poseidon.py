@@ -0,0 +1,171 @@
+"""
+Native computation of the Poseidon commitment of a sync committee, as done by the rotate circuit.
+The commitment is PoseidonSponge over the pubkeys as G1 points, each coordinate split in K limbs of N bits
+(see PoseidonG1Array in circuits/circuits/utils/poseidon.circom).
+The permutation is circomlib's PoseidonEx, whose constants are read from the circomlib sources used to build the circuits.
+
+Usage (differential check against the output of the rotate circuit):
+    python -m utils.poseidon check [ROTATE_DATA [ROTATE_PUBLIC]]
+"""
+import ast
+import json
+import re
+import sys
+
+# BN254 scalar field
+FIELD_MODULUS = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+# BLS12-381 base field
+BLS12_381_MODULUS = 0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaaab
+
+POSEIDON_CONSTANTS_PATH = './ts/node_modules/circomlib/circuits/poseidon_constants.circom'
+N_ROUNDS_F = 8
+N_ROUNDS_P = [56, 57, 56, 60, 60, 63, 64, 63, 60, 66, 60, 65, 70, 60, 64, 68]
+
+# same parameters as the rotate circuit (getNumBitsPerRegister, getNumRegisters)
+N = 55
+K = 7
+SPONGE_SIZE = 16
+
+constants = {}
+
+
+def read_constant(source, name, t):
+    """
+    Extract the value returned by the circomlib function `name` for the given t
+    """
+    body = source[source.index(f'function {name}(t)'):]
+    match = re.search(r't\s*==\s*%d\s*\)\s*\{\s*return\s*' % t, body)
+    if match is None:
+        raise ValueError(f"No {name} constants for t = {t}")
+    start = match.end()
+    depth = 0
+    for end in range(start, len(body)):
+        if body[end] == '[':
+            depth += 1
+        elif body[end] == ']':
+            depth -= 1
+            if depth == 0:
+                try:
+                    return ast.literal_eval(body[start:end + 1])
+                except SyntaxError as e:
+                    raise ValueError(f"Malformed {name} constants") from e
+    raise ValueError(f"Malformed {name} constants")
+
+
+def load_constants(t, path=POSEIDON_CONSTANTS_PATH):
+    """
+    Load the optimized Poseidon constants (C, S, M, P) for t inputs (including the capacity)
+    """
+    if t not in constants:
+        with open(path, 'r') as file:
+            source = file.read()
+        constants[t] = {name: read_constant(source, f'POSEIDON_{name}', t) for name in ['C', 'S', 'M', 'P']}
+    return constants[t]
+
+
+def mix(state, matrix):
+    # out[i] = sum_j M[j][i] * in[j]
+    return [sum(m * s for m, s in zip(column, state)) % FIELD_MODULUS for column in matrix]
+
+
+def poseidon_ex(inputs, initial_state=0, n_outs=1):
+    """
+    circomlib's PoseidonEx(len(inputs), n_outs) template
+    """
+    t = len(inputs) + 1
+    n_rounds_p = N_ROUNDS_P[t - 2]
+    parameters = load_constants(t)
+    C, S, p = parameters['C'], parameters['S'], FIELD_MODULUS
+    # columns of the matrices, so that mixing is a dot product per output
+    M = [list(column) for column in zip(*parameters['M'])]
+    P = [list(column) for column in zip(*parameters['P'])]
+    half = N_ROUNDS_F // 2
+
+    state = [(x + c) % p for x, c in zip([initial_state, *inputs], C[0:t])]
+    for r in range(half):
+        state = [pow(x, 5, p) for x in state]
+        state = [(x + c) % p for x, c in zip(state, C[(r + 1) * t:(r + 2) * t])]
+        state = mix(state, M if r < half - 1 else P)
+
+    offset = (half + 1) * t
+    for r in range(n_rounds_p):
+        state[0] = (pow(state[0], 5, p) + C[offset + r]) % p
+        s = S[(t * 2 - 1) * r:(t * 2 - 1) * (r + 1)]
+        first = sum(a * b for a, b in zip(s[:t], state)) % p
+        state = [first] + [(state[i] + state[0] * s[t + i - 1]) % p for i in range(1, t)]
+
+    offset = (half + 1) * t + n_rounds_p
+    for r in range(half - 1):
+        state = [pow(x, 5, p) for x in state]
+        state = [(x + c) % p for x, c in zip(state, C[offset + r * t:offset + (r + 1) * t])]
+        state = mix(state, M)
+    state = [pow(x, 5, p) for x in state]
+    return mix(state, M[:n_outs])
+
+
+def poseidon_sponge(inputs):
+    """
+    PoseidonSponge template: 16 inputs per round, chained through the first output
+    """
+    assert len(inputs) % SPONGE_SIZE == 0
+    rounds = len(inputs) // SPONGE_SIZE
+    state = 0
+    for i in range(rounds):
+        outputs = poseidon_ex(inputs[i * SPONGE_SIZE:(i + 1) * SPONGE_SIZE], state, 1 if i < rounds - 1 else 2)
+        state = outputs[0]
+    return outputs[1]
+
+
+def decompress_g1(pubkey: bytes):
+    """
+    Affine coordinates of a compressed BLS12-381 G1 point
+    """
+    assert len(pubkey) == 48 and pubkey[0] & 0x80, "Not a compressed G1 point"
+    assert not pubkey[0] & 0x40, "Point at infinity"
+    x = int.from_bytes(bytes([pubkey[0] & 0x1f]) + bytes(pubkey[1:]), 'big')
+    q = BLS12_381_MODULUS
+    y = pow((pow(x, 3, q) + 4) % q, (q + 1) // 4, q)
+    assert y * y % q == (pow(x, 3, q) + 4) % q, "Not a G1 point"
+    # the flag selects the lexicographically largest y
+    if bool(pubkey[0] & 0x20) != (y > q - y):
+        y = q - y
+    return x, y
+
+
+def to_limbs(value, n=N, k=K):
+    mask = (1 << n) - 1
+    return [(value >> (n * i)) & mask for i in range(k)]
+
+
+def sync_committee_poseidon(pubkeys) -> str:
+    """
+    Poseidon commitment of the sync committee with the given pubkeys (bytes), in the format of the rotate public output
+    """
+    inputs = []
+    for pubkey in pubkeys:
+        x, y = decompress_g1(bytes(pubkey))
+        # PoseidonG1Array layout: limb j of x, then limb j of y
+        for limb_x, limb_y in zip(to_limbs(x), to_limbs(y)):
+            inputs += [limb_x, limb_y]
+    return hex(poseidon_sponge(inputs))
+
+
+def check(rotate_data='./data/sync_committee_poseidon_data.json', rotate_public='./build/rotate/rotate_public.json'):
+    """
+    Compare the native commitment with the output of the last run of the rotate circuit
+    """
+    with open(rotate_data, 'r') as file:
+        pubkeys = [bytes.fromhex(pubkey[2:]) for pubkey in json.load(file)['pubkeys']]
+    with open(rotate_public, 'r') as file:
+        expected = hex(int(json.load(file)[1]))
+    computed = sync_committee_poseidon(pubkeys)
+    print("circuit:", expected)
+    print("native: ", computed)
+    return computed == expected
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'check':
+        print(__doc__)
+        sys.exit(1)
+    sys.exit(0 if check(*sys.argv[2:4]) else 1)
@@ -0,0 +1,124 @@
+"""
+Pre-flight validation of light client updates.
+It performs locally the checks of the light client contract (and of the zk circuit for the signature),
+so that invalid or ignored updates are dropped before generating the proofs and submitting them.
+Adapted from validate_light_client_update in:
+    https://github.com/ethereum/consensus-specs/blob/dev/specs/capella/light-client/sync-protocol.md
+"""
+import milagro_bls_binding as bls
+
+from utils.specs import (
+    MyLightClientStore, LightClientUpdate, LightClientHeader, SyncCommittee, Slot, Root, Bytes32,
+    SYNC_COMMITTEE_SIZE, MIN_SYNC_COMMITTEE_PARTICIPANTS, GENESIS_SLOT, DOMAIN_SYNC_COMMITTEE,
+    FINALIZED_ROOT_INDEX, NEXT_SYNC_COMMITTEE_INDEX,
+    floorlog2, get_subtree_index, is_valid_merkle_branch, is_valid_light_client_header,
+    is_sync_committee_update, is_finality_update, hash_tree_root,
+    compute_sync_committee_period_at_slot, compute_fork_version, compute_epoch_at_slot,
+    compute_domain, compute_signing_root
+)
+
+
+def is_next_sync_committee_known(store: MyLightClientStore) -> bool:
+    return not store.next_sync_committee.is_empty()
+
+
+def preflight_light_client_update(store: MyLightClientStore,
+                                  update: LightClientUpdate,
+                                  current_slot: Slot,
+                                  genesis_validators_root: Root,
+                                  optimistic: bool = False) -> None:
+    """
+    Validate a light client update against the local view of the light client store.
+    Optimistic updates are checked against the optimistic header instead of the finalized one.
+    Raises an AssertionError describing the first failed check.
+    """
+    sync_aggregate = update.sync_aggregate
+    participants = sum(sync_aggregate.sync_committee_bits)
+    assert participants >= MIN_SYNC_COMMITTEE_PARTICIPANTS, "Not enough sync committee participants"
+    # the contract ignores updates without a supermajority
+    assert participants * 3 >= SYNC_COMMITTEE_SIZE * 2, "No sync committee supermajority"
+
+    # Verify update does not skip a sync committee period
+    assert is_valid_light_client_header(update.attested_header), "Invalid attested header"
+    update_attested_slot = update.attested_header.beacon.slot
+    update_finalized_slot = update.finalized_header.beacon.slot
+    assert current_slot >= update.signature_slot > update_attested_slot >= update_finalized_slot, "Invalid slots"
+    store_period = compute_sync_committee_period_at_slot(store.beacon_slot)
+    update_signature_period = compute_sync_committee_period_at_slot(update.signature_slot)
+    if is_next_sync_committee_known(store):
+        assert update_signature_period in (store_period, store_period + 1), "Invalid signature period"
+    else:
+        assert update_signature_period == store_period, "Invalid signature period"
+
+    # Verify update is relevant
+    update_attested_period = compute_sync_committee_period_at_slot(update_attested_slot)
+    update_finalized_period = compute_sync_committee_period_at_slot(update_finalized_slot)
+    # updateHasNextSyncCommittee of the validator
+    update_has_next_sync_committee = not is_next_sync_committee_known(store) and (
+        is_sync_committee_update(update) and update_attested_period == store_period
+    )
+    # updateHasFinalizedNextSyncCommittee of the contract
+    update_has_finalized_next_sync_committee = not is_next_sync_committee_known(store) and (
+        is_sync_committee_update(update) and is_finality_update(update)
+        and update_finalized_period == update_attested_period
+    )
+    assert update_attested_slot > store.beacon_slot or update_has_next_sync_committee, "Stale attested header"
+    if optimistic:
+        # the contract only accepts optimistic updates which advance the optimistic header
+        assert not is_finality_update(update) and not is_sync_committee_update(update), "Not an optimistic update"
+        assert update_attested_slot > store.optimistic_slot, "Stale optimistic header"
+    else:
+        # the contract ignores updates which neither advance the finalized slot nor finalize the next sync committee.
+        # Together with the check of the attested header, the next sync committee is the one of the store period.
+        assert update_finalized_slot > store.beacon_slot or update_has_finalized_next_sync_committee, \
+            "Stale finalized header"
+
+    # Verify that the `finality_branch`, if present, confirms `finalized_header`
+    # to match the finalized checkpoint root saved in the state of `attested_header`.
+    if not is_finality_update(update):
+        assert update.finalized_header == LightClientHeader(), "Invalid finalized header"
+    else:
+        if update_finalized_slot == GENESIS_SLOT:
+            assert update.finalized_header == LightClientHeader(), "Invalid finalized header"
+            finalized_root = Bytes32()
+        else:
+            assert is_valid_light_client_header(update.finalized_header), "Invalid finalized header"
+            finalized_root = hash_tree_root(update.finalized_header.beacon)
+        assert is_valid_merkle_branch(
+            leaf=finalized_root,
+            branch=update.finality_branch,
+            depth=floorlog2(FINALIZED_ROOT_INDEX),
+            index=get_subtree_index(FINALIZED_ROOT_INDEX),
+            root=update.attested_header.beacon.state_root,
+        ), "Invalid finality branch"
+
+    # Verify that the `next_sync_committee`, if present, actually is the next sync committee saved in the
+    # state of the `attested_header`
+    if not is_sync_committee_update(update):
+        assert update.next_sync_committee == SyncCommittee(), "Invalid sync committee update"
+    else:
+        if update_attested_period == store_period and is_next_sync_committee_known(store):
+            assert store.next_sync_committee == update.next_sync_committee, "Invalid sync committee"
+        assert is_valid_merkle_branch(
+            leaf=hash_tree_root(update.next_sync_committee),
+            branch=update.next_sync_committee_branch,
+            depth=floorlog2(NEXT_SYNC_COMMITTEE_INDEX),
+            index=get_subtree_index(NEXT_SYNC_COMMITTEE_INDEX),
+            root=update.attested_header.beacon.state_root,
+        ), "Invalid sync committee branch"
+
+    # Verify sync committee aggregate signature
+    if update_signature_period == store_period:
+        sync_committee = store.current_sync_committee
+    else:
+        sync_committee = store.next_sync_committee
+    participant_pubkeys = [
+        bytes(pubkey) for (bit, pubkey) in zip(sync_aggregate.sync_committee_bits, sync_committee.iter_pubkeys())
+        if bit
+    ]
+    fork_version = compute_fork_version(compute_epoch_at_slot(max(update.signature_slot, Slot(1)) - Slot(1)))
+    domain = compute_domain(DOMAIN_SYNC_COMMITTEE, fork_version, genesis_validators_root)
+    signing_root = compute_signing_root(update.attested_header.beacon, domain)
+    assert bls.FastAggregateVerify(
+        participant_pubkeys, bytes(signing_root), bytes(sync_aggregate.sync_committee_signature)
+    ), "Invalid sync committee signature"
@@ -0,0 +1,221 @@
+"""
+Opt-in profiling of the light client updates, cheap enough to stay enabled in production.
+While an update is processed, a sampling profiler records the stacks of the thread processing it, and its stages
+(preflight, converters, circuits, encoding, submission to each chain) record their duration and, for the
+subprocesses, their peak memory. The profile of an update ends when its submissions complete: if the update took
+longer than SLOW_UPDATE_SECONDS, the collapsed stacks (flame graph format) and the stage breakdown are written
+to PROFILE_DIR.
+"""
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+PROFILING = False
+SLOW_UPDATE_SECONDS = 300
+# A sample every 20ms of the thread processing the update
+SAMPLING_INTERVAL = 0.02
+PROFILE_DIR = './data/profiles'
+
+# profiles being sampled, by thread id
+sampled = {}
+sampled_lock = threading.Lock()
+sampler = None
+local = threading.local()
+profiling_stats = {'profiles': 0, 'dumped': 0, 'samples': 0}
+
+
+class Profile:
+    """
+    Sampled stacks and stages of the processing of an update.
+    Submitters hold the profile until their submission completes, it is finished when the last holder releases it.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.start_time = time.time()
+        self.start_perf_counter = time.perf_counter()
+        self.stacks = {}
+        self.stages = []
+        self.holders = 1
+        self.lock = threading.Lock()
+
+    def add_sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        with self.lock:
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def add_stage(self, name, seconds, peak_rss=None):
+        with self.lock:
+            self.stages.append({
+                'stage': name,
+                'thread': threading.current_thread().name,
+                'seconds': seconds,
+                'peak_rss': peak_rss,
+            })
+
+    def hold(self):
+        with self.lock:
+            self.holders += 1
+
+    def release(self):
+        with self.lock:
+            self.holders -= 1
+            finished = self.holders == 0
+        if finished:
+            finish(self)
+
+
+def sample():
+    """
+    Sampler thread: record the stack of every thread being profiled
+    """
+    while True:
+        time.sleep(SAMPLING_INTERVAL)
+        with sampled_lock:
+            if not sampled:
+                continue
+            profiles = list(sampled.items())
+        frames = sys._current_frames()
+        for thread_id, profile in profiles:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                profile.add_sample(frame)
+        # frames keep the locals of every thread alive
+        frames = frame = None
+
+
+def start_sampler():
+    global sampler
+    with sampled_lock:
+        if sampler is None:
+            sampler = threading.Thread(target=sample, name='profiler', daemon=True)
+            sampler.start()
+
+
+def current():
+    """
+    Return the profile of the update processed by the current thread, None if it is not profiled
+    """
+    return getattr(local, 'profile', None)
+
+
+@contextlib.contextmanager
+def profile(label):
+    """
+    Profile the processing of an update by the current thread, if profiling is enabled
+    """
+    if not PROFILING:
+        yield None
+        return
+    start_sampler()
+    update_profile = Profile(label)
+    thread_id = threading.get_ident()
+    local.profile = update_profile
+    with sampled_lock:
+        sampled[thread_id] = update_profile
+    try:
+        yield update_profile
+    finally:
+        with sampled_lock:
+            del sampled[thread_id]
+        local.profile = None
+        update_profile.release()
+
+
+@contextlib.contextmanager
+def stage(name, update_profile=None):
+    """
+    Record the duration of a stage in the given profile, by default the one of the current thread
+    """
+    if update_profile is None:
+        update_profile = current()
+    if update_profile is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        update_profile.add_stage(name, time.perf_counter() - start_time)
+
+
+def run(args, **kwargs):
+    """
+    subprocess.run replacement recording the duration and the peak memory of the command (including the processes
+    it waited for) in the profile of the current thread. Output pipes are not supported while profiling.
+    """
+    update_profile = current()
+    if update_profile is None:
+        return subprocess.run(args, **kwargs)
+    start_time = time.perf_counter()
+    process = subprocess.Popen(args, **kwargs)
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KiB on Linux
+    update_profile.add_stage(' '.join(os.path.basename(arg) for arg in args),
+                             time.perf_counter() - start_time, rusage.ru_maxrss * 1024)
+    return process
+
+
+def breakdown(update_profile):
+    """
+    Total duration and peak memory of every stage
+    """
+    stages = {}
+    for entry in update_profile.stages:
+        stats = stages.setdefault(entry['stage'], {'count': 0, 'seconds': 0.0, 'peak_rss': None})
+        stats['count'] += 1
+        stats['seconds'] += entry['seconds']
+        if entry['peak_rss'] is not None:
+            stats['peak_rss'] = max(stats['peak_rss'] or 0, entry['peak_rss'])
+    return dict(sorted(stages.items(), key=lambda item: -item[1]['seconds']))
+
+
+def dump(update_profile, seconds):
+    """
+    Write the collapsed stacks and the stage breakdown of a profile, returning the path of the breakdown
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = '%s-%s' % (update_profile.label, time.strftime('%Y%m%d-%H%M%S', time.localtime(update_profile.start_time)))
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path + '.folded', 'w') as file:
+        for stack, count in sorted(update_profile.stacks.items()):
+            file.write(f'{stack} {count}\n')
+    with open(path + '.json', 'w') as file:
+        json.dump({
+            'label': update_profile.label,
+            'start_time': update_profile.start_time,
+            'seconds': seconds,
+            'sampling_interval': SAMPLING_INTERVAL,
+            'samples': sum(update_profile.stacks.values()),
+            # peak resident memory of the relayer and of its largest subprocess, since the start of the relayer
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'children_peak_rss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+            'breakdown': breakdown(update_profile),
+            'stages': update_profile.stages,
+        }, file, indent=2)
+    return path + '.json'
+
+
+def finish(update_profile):
+    seconds = time.perf_counter() - update_profile.start_perf_counter
+    profiling_stats['profiles'] += 1
+    profiling_stats['samples'] += sum(update_profile.stacks.values())
+    if seconds < SLOW_UPDATE_SECONDS:
+        return
+    path = dump(update_profile, seconds)
+    profiling_stats['dumped'] += 1
+    print("Slow update %s: %.1fs, profile written to %s" % (update_profile.label, seconds, path))
+    for name, stats in breakdown(update_profile).items():
+        print("    %-40s %8.1fs%s" % (name, stats['seconds'],
+              '' if stats['peak_rss'] is None else ' %8.2f GiB' % (stats['peak_rss'] / 2 ** 30)))
@@ -0,0 +1,124 @@
+"""
+Content-addressed store for the Groth16 proofs generated by the zk circuits
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+class ProofCache:
+    """
+    LRU cache of proofs keyed by a digest of the inputs that determine them.
+    When a directory is given, entries are also kept on disk so that they survive restarts.
+    """
+
+    def __init__(self, max_entries=256, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.invalid = 0
+        # key -> proof, or None if the proof has not been loaded from disk yet
+        self.entries = OrderedDict()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            # restore the least recently used order from the file modification times
+            files = [f for f in os.listdir(directory) if f.endswith('.json')]
+            files.sort(key=lambda f: os.path.getmtime(os.path.join(directory, f)))
+            for file in files:
+                self.entries[file[:-len('.json')]] = None
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _remove(self, key):
+        if self.directory is not None and os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            key, _ = self.entries.popitem(last=False)
+            self._remove(key)
+
+    def get(self, key, validate=None):
+        """
+        Return the proof stored for the given key, None if there is none.
+        Proofs loaded from disk are checked with validate, if given, and dropped when it returns False.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        proof = self.entries[key]
+        if proof is None:
+            try:
+                with open(self._path(key), 'r') as file:
+                    proof = json.load(file)
+            except (OSError, ValueError):
+                # unreadable entry, drop it and prove again
+                del self.entries[key]
+                self.misses += 1
+                return None
+            if validate is not None and not validate(proof):
+                # e.g., a corrupted entry or a proof of a previous build of the circuit
+                del self.entries[key]
+                self._remove(key)
+                self.invalid += 1
+                self.misses += 1
+                return None
+            self.entries[key] = proof
+
+        self.entries.move_to_end(key)
+        if self.directory is not None:
+            # the modification time records the use, so that the order survives restarts
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+        self.hits += 1
+        return proof
+
+    def put(self, key, proof):
+        """
+        Store a proof for the given key, evicting the least recently used entries if needed
+        """
+        self.entries[key] = proof
+        self.entries.move_to_end(key)
+        if self.directory is not None:
+            with open(self._path(key), 'w') as file:
+                json.dump(proof, file)
+        self._evict()
+
+    def stats(self):
+        """
+        Return the hit, miss and invalid entry counters together with the number of stored entries
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'invalid': self.invalid, 'entries': len(self.entries)}
+
+
+def signature_proof_key(sync_committee_poseidon, signing_root, sync_committee_bits, sync_committee_signature):
+    """
+    Compute the cache key of a signature proof.
+    The proof only depends on the signing sync committee (through its poseidon commitment),
+    the signing root, the participation bits and the aggregated signature.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(sync_committee_poseidon).encode())
+    digest.update(bytes(signing_root))
+    digest.update(sync_committee_bits.encode_bytes())
+    digest.update(bytes(sync_committee_signature))
+    return digest.hexdigest()
+
+
+def step_rotate_proof_key(signature_key, next_sync_committee_root):
+    """
+    Compute the cache key of a combined step and rotate proof: the proof depends on what determines the signature
+    proof (its key) and on the next sync committee (through its SSZ root)
+    """
+    digest = hashlib.sha256()
+    digest.update(signature_key.encode())
+    digest.update(bytes(next_sync_committee_root))
+    return digest.hexdigest()
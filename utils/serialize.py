@@ -4,6 +4,26 @@ Utility functions for serializing data structures to strings and JSON
 
 from utils.specs import LightClientBootstrap, LightClientUpdate, LightClientHeader, SyncCommittee, SyncAggregate, Domain
 from utils.ssz.ssz_impl import hash_tree_root
+from utils.sync_committee import CompactSyncCommittee
+
+
+def sync_committee_hex_pubkeys(committee):
+    """
+    Return the pubkeys of a sync committee (remerkleable or compact) as hex strings
+    """
+    if isinstance(committee, CompactSyncCommittee):
+        return committee.hex_pubkeys()
+    return [str(pubkey) for pubkey in committee.pubkeys]
+
+
+def sync_committee_root(committee):
+    """
+    Return the hash tree root of a sync committee (remerkleable or compact)
+    """
+    if isinstance(committee, CompactSyncCommittee):
+        return committee.hash_tree_root()
+    return hash_tree_root(committee)
+
 
 def light_client_header_to_string(header: LightClientHeader):
     """
@@ -48,16 +68,16 @@ def light_client_header_to_string(header: LightClientHeader):
 
 def sync_committee_to_string(committee: SyncCommittee):
     """
-    Convert a sync committee to a string
+    Convert a sync committee (remerkleable or compact) to a string
     """
+    if isinstance(committee, CompactSyncCommittee):
+        aggregate_pubkey = committee.hex_aggregate_pubkey()
+    else:
+        aggregate_pubkey = str(committee.aggregate_pubkey)
     res = "["
     # Pubkeys
-    res += "["
-    for i in range(len(committee.pubkeys) - 1):
-        res += "\"" + str(committee.pubkeys[i]) + "\","
-    res += "\"" + str(committee.pubkeys[len(committee.pubkeys) - 1]) + "\""
-    res += "],"
-    res += "\"" + str(committee.aggregate_pubkey) + "\""
+    res += "[\"" + "\",\"".join(sync_committee_hex_pubkeys(committee)) + "\"],"
+    res += "\"" + aggregate_pubkey + "\""
     res += "]"
     return res
 
@@ -135,14 +155,9 @@ def light_client_update_to_string(update: LightClientUpdate):
 def convert_rotate_data_to_JSON(syncCommittee: SyncCommittee):
     json = "{\n"
     json += "\t\"pubkeys\": [\n"
-    for i in range(len(syncCommittee.pubkeys)):
-        json += "\t\t\"" + str(syncCommittee.pubkeys[i]) + "\""
-        if i != len(syncCommittee.pubkeys) - 1:
-            json += ",\n"
-        else:
-            json += "\n"
+    json += ",\n".join("\t\t\"" + pubkey + "\"" for pubkey in sync_committee_hex_pubkeys(syncCommittee)) + "\n"
     json += "\t],\n"
-    json += "\t\"syncCommitteeSSZ\": \"" + str(hash_tree_root(syncCommittee)) + "\"\n"
+    json += "\t\"syncCommitteeSSZ\": \"" + str(sync_committee_root(syncCommittee)) + "\"\n"
     json += "}"
     return json
 
@@ -155,18 +170,10 @@ def step_data_to_JSON(
         sync_committee_poseidon):
     json = "{\n"
     json += "\t\"pubkeys\": [\n"
-    for i in range(len(sync_committee.pubkeys)):
-        json += "\t\t\"" + str(sync_committee.pubkeys[i]) + "\""
-        if i != len(sync_committee.pubkeys) - 1:
-            json += ",\n"
-        else:
-            json += "\n"
+    json += ",\n".join("\t\t\"" + pubkey + "\"" for pubkey in sync_committee_hex_pubkeys(sync_committee)) + "\n"
     json += "\t],\n"
     json += "\t\"pubkeybits\": [\n"
-    for i in range(len(sync_committee_bits)):
-        json += "\t\t" + str(int(sync_committee_bits[i]))
-        if i != len(sync_committee_bits) - 1:
-            json += ", "
+    json += "\t\t" + ", ".join(str(int(bit)) for bit in sync_committee_bits)
     json += "\t],\n"
     json += "\t\"signature\": \"" + str(sync_committee_signature) + "\",\n"
     json += "\t\"signingRoot\": \"" + str(signing_root) + "\",\n"
@@ -12,7 +12,13 @@ from utils.ssz.ssz_typing import (
 
 from utils.ssz.ssz_impl import hash_tree_root
 
-from typing import NewType, Optional, NamedTuple, TypeVar
+from typing import NewType, Optional, NamedTuple, TypeVar, Sequence, TYPE_CHECKING
+
+from hashlib import sha256
+
+if TYPE_CHECKING:
+    # utils.sync_committee imports this module, only type checkers resolve the forward references
+    from utils.sync_committee import CompactSyncCommittee
 
 SSZObject = TypeVar('SSZObject', bound=View)
 
@@ -73,6 +79,8 @@ EXECUTION_PAYLOAD_INDEX = GeneralizedIndex(25)
 # Constant vars
 MAX_REQUEST_LIGHT_CLIENT_UPDATES = 2**7
 DOMAIN_SYNC_COMMITTEE = DomainType('0x07000000')
+GENESIS_SLOT = Slot(0)
+MIN_SYNC_COMMITTEE_PARTICIPANTS = 1
 
 # Preset vars
 SLOTS_PER_EPOCH = uint64(32)
@@ -221,14 +229,20 @@ class LightClientStore(object):
     current_max_active_participants: uint64
 
 
-# Customized light client store, which is used for storing on-chain data
+# Customized light client store, which is used for storing on-chain data.
+# Sync committees are kept in compact form (see utils.sync_committee.CompactSyncCommittee).
 @dataclass
 class MyLightClientStore(object):
     beacon_slot: uint64
-    current_sync_committee: SyncCommittee
-    next_sync_committee: SyncCommittee
+    current_sync_committee: 'CompactSyncCommittee'
+    next_sync_committee: 'CompactSyncCommittee'
     previous_max_active_participants: uint64
     current_max_active_participants: uint64
+    # Poseidon commitments of the sync committees, as stored by the contract
+    current_sync_committee_poseidon: Optional[str] = None
+    next_sync_committee_poseidon: Optional[str] = None
+    # Slot of the most recent optimistic header, updated only in optimistic mode
+    optimistic_slot: uint64 = uint64(0)
 
 
 def compute_epoch_at_slot(slot: Slot) -> Epoch:
@@ -286,4 +300,104 @@ def compute_signing_root(ssz_object: SSZObject, domain: Domain) -> Root:
     return hash_tree_root(SigningData(
         object_root=hash_tree_root(ssz_object),
         domain=domain,
-    ))
\ No newline at end of file
+    ))
+
+
+def hash(data: bytes) -> Bytes32:
+    return Bytes32(sha256(data).digest())
+
+
+def get_subtree_index(generalized_index: GeneralizedIndex) -> uint64:
+    return uint64(generalized_index % 2**(floorlog2(generalized_index)))
+
+
+def is_valid_merkle_branch(leaf: Bytes32, branch: Sequence[Bytes32], depth: uint64, index: uint64, root: Root) -> bool:
+    """
+    Check if ``leaf`` at ``index`` verifies against the Merkle ``root`` and ``branch``.
+    """
+    value = bytes(leaf)
+    for i in range(depth):
+        if index // (2**i) % 2:
+            value = bytes(hash(bytes(branch[i]) + value))
+        else:
+            value = bytes(hash(value + bytes(branch[i])))
+    return value == bytes(root)
+
+
+def is_valid_light_client_header(header: LightClientHeader) -> bool:
+    epoch = compute_epoch_at_slot(header.beacon.slot)
+
+    if epoch < config.CAPELLA_FORK_EPOCH:
+        return (
+            header.execution == ExecutionPayloadHeader()
+            and header.execution_branch == [Bytes32() for _ in range(floorlog2(EXECUTION_PAYLOAD_INDEX))]
+        )
+
+    return is_valid_merkle_branch(
+        leaf=hash_tree_root(header.execution),
+        branch=header.execution_branch,
+        depth=floorlog2(EXECUTION_PAYLOAD_INDEX),
+        index=get_subtree_index(EXECUTION_PAYLOAD_INDEX),
+        root=header.beacon.body_root,
+    )
+
+
+def is_sync_committee_update(update: LightClientUpdate) -> bool:
+    return update.next_sync_committee_branch != [Bytes32() for _ in range(floorlog2(NEXT_SYNC_COMMITTEE_INDEX))]
+
+
+def is_finality_update(update: LightClientUpdate) -> bool:
+    return update.finality_branch != [Bytes32() for _ in range(floorlog2(FINALIZED_ROOT_INDEX))]
+
+
+def is_better_update(new_update: LightClientUpdate, old_update: LightClientUpdate) -> bool:
+    # Compare supermajority (> 2/3) sync committee participation
+    max_active_participants = len(new_update.sync_aggregate.sync_committee_bits)
+    new_num_active_participants = sum(new_update.sync_aggregate.sync_committee_bits)
+    old_num_active_participants = sum(old_update.sync_aggregate.sync_committee_bits)
+    new_has_supermajority = new_num_active_participants * 3 >= max_active_participants * 2
+    old_has_supermajority = old_num_active_participants * 3 >= max_active_participants * 2
+    if new_has_supermajority != old_has_supermajority:
+        return new_has_supermajority > old_has_supermajority
+    if not new_has_supermajority and new_num_active_participants != old_num_active_participants:
+        return new_num_active_participants > old_num_active_participants
+
+    # Compare presence of relevant sync committee
+    new_has_relevant_sync_committee = is_sync_committee_update(new_update) and (
+        compute_sync_committee_period_at_slot(new_update.attested_header.beacon.slot)
+        == compute_sync_committee_period_at_slot(new_update.signature_slot)
+    )
+    old_has_relevant_sync_committee = is_sync_committee_update(old_update) and (
+        compute_sync_committee_period_at_slot(old_update.attested_header.beacon.slot)
+        == compute_sync_committee_period_at_slot(old_update.signature_slot)
+    )
+    if new_has_relevant_sync_committee != old_has_relevant_sync_committee:
+        return new_has_relevant_sync_committee
+
+    # Compare indication of any finality
+    new_has_finality = is_finality_update(new_update)
+    old_has_finality = is_finality_update(old_update)
+    if new_has_finality != old_has_finality:
+        return new_has_finality
+
+    # Compare sync committee finality
+    if new_has_finality:
+        new_has_sync_committee_finality = (
+            compute_sync_committee_period_at_slot(new_update.finalized_header.beacon.slot)
+            == compute_sync_committee_period_at_slot(new_update.attested_header.beacon.slot)
+        )
+        old_has_sync_committee_finality = (
+            compute_sync_committee_period_at_slot(old_update.finalized_header.beacon.slot)
+            == compute_sync_committee_period_at_slot(old_update.attested_header.beacon.slot)
+        )
+        if new_has_sync_committee_finality != old_has_sync_committee_finality:
+            return new_has_sync_committee_finality
+
+    # Tiebreaker 1: Sync committee participation beyond supermajority
+    if new_num_active_participants != old_num_active_participants:
+        return new_num_active_participants > old_num_active_participants
+
+    # Tiebreaker 2: Prefer older data (fewer changes to best)
+    if new_update.attested_header.beacon.slot != old_update.attested_header.beacon.slot:
+        return new_update.attested_header.beacon.slot < old_update.attested_header.beacon.slot
+    return new_update.signature_slot < old_update.signature_slot
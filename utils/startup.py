@@ -0,0 +1,126 @@
+"""
+Startup profiling of the relayer: time spent importing each package and time to the first relayed update.
+Imports are only measured when the IMPORT_TIMER_ENV environment variable is set, since the measure wraps the loader
+of every module (`python -X importtime` gives a finer breakdown without it).
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+IMPORT_TIMER_ENV = 'RELAY_IMPORT_TIMES'
+
+process_start = time.perf_counter()
+# package -> seconds spent importing it (including its own imports of other packages)
+import_times = {}
+# (name, seconds since process start), in the order they were reached
+milestones = []
+# (name, seconds) of the deferred initialization steps
+phases = []
+_import_stack = []
+reported = False
+
+
+class _TimedLoader:
+    """
+    Loader wrapper measuring the execution of top level packages
+    """
+
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        package = self.name.partition('.')[0]
+        # only the outermost import of a package is accounted, nested ones are part of it
+        outermost = package not in _import_stack
+        _import_stack.append(package)
+        start_time = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            _import_stack.pop()
+            if outermost:
+                import_times[package] = import_times.get(package, 0.0) + time.perf_counter() - start_time
+
+
+class _ImportTimer:
+    """
+    Meta path finder which times the modules found by the other finders
+    """
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, name)
+                return spec
+        return None
+
+
+def import_timer_installed() -> bool:
+    return any(isinstance(finder, _ImportTimer) for finder in sys.meta_path)
+
+
+def install_import_timer(enabled=None):
+    """
+    Start measuring imports if enabled (by default, if IMPORT_TIMER_ENV is set), to be called before importing
+    anything else
+    """
+    if enabled is None:
+        enabled = bool(os.environ.get(IMPORT_TIMER_ENV))
+    if enabled and not import_timer_installed():
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def mark(name) -> bool:
+    """
+    Record the first time a milestone is reached, return True if it has just been reached
+    """
+    if any(milestone == name for milestone, _ in milestones):
+        return False
+    milestones.append((name, time.perf_counter() - process_start))
+    return True
+
+
+@contextmanager
+def phase(name):
+    """
+    Measure a step of the deferred initialization
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.append((name, time.perf_counter() - start_time))
+
+
+def report(max_packages=10):
+    """
+    Print the startup report, once
+    """
+    global reported
+    if reported:
+        return
+    reported = True
+    print("Startup report")
+    print("  imports:")
+    if not import_timer_installed():
+        print("    not measured, set %s=1 or run with python -X importtime" % IMPORT_TIMER_ENV)
+    for package, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True)[:max_packages]:
+        print("    %-30s %8.3fs" % (package, seconds))
+    print("  initialization:")
+    for name, seconds in phases:
+        print("    %-30s %8.3fs" % (name, seconds))
+    print("  milestones (since start):")
+    for name, seconds in milestones:
+        print("    %-30s %8.3fs" % (name, seconds))
@@ -0,0 +1,93 @@
+"""
+Compact representation of sync committees
+"""
+from utils.specs import SyncCommittee, Root, SYNC_COMMITTEE_SIZE
+from utils.ssz.ssz_impl import hash_tree_root
+
+BLS_PUBKEY_LENGTH = 48
+
+
+class CompactSyncCommittee:
+    """
+    Sync committee whose pubkeys are stored in a single contiguous buffer of SYNC_COMMITTEE_SIZE * 48 bytes,
+    instead of a tree of BLSPubkey views.
+    Pubkeys are accessed through zero-copy memoryview slices, the hex form and the hash tree root are computed once,
+    and the remerkleable container is only built temporarily, when SSZ hashing needs it.
+    """
+    __slots__ = ('pubkeys_buffer', 'aggregate_pubkey', '_hex_pubkeys', '_root')
+
+    def __init__(self, pubkeys_buffer: bytes, aggregate_pubkey: bytes):
+        assert len(pubkeys_buffer) == SYNC_COMMITTEE_SIZE * BLS_PUBKEY_LENGTH
+        assert len(aggregate_pubkey) == BLS_PUBKEY_LENGTH
+        self.pubkeys_buffer = bytes(pubkeys_buffer)
+        self.aggregate_pubkey = bytes(aggregate_pubkey)
+        self._hex_pubkeys = None
+        self._root = None
+
+    @classmethod
+    def empty(cls):
+        """
+        Return the empty (all zeros) sync committee, used when the committee is not known
+        """
+        return cls(bytes(int(SYNC_COMMITTEE_SIZE) * BLS_PUBKEY_LENGTH), bytes(BLS_PUBKEY_LENGTH))
+
+    @classmethod
+    def from_view(cls, sync_committee: SyncCommittee):
+        """
+        Build from a remerkleable sync committee, whose SSZ encoding is the pubkeys followed by the aggregate pubkey.
+        The container is not retained, so that its tree can be released.
+        """
+        encoding = memoryview(sync_committee.encode_bytes())
+        split = SYNC_COMMITTEE_SIZE * BLS_PUBKEY_LENGTH
+        return cls(encoding[:split], encoding[split:])
+
+    def __len__(self):
+        return SYNC_COMMITTEE_SIZE
+
+    def pubkey(self, index) -> memoryview:
+        """
+        Return the pubkey at the given index, without copying it
+        """
+        if not 0 <= index < SYNC_COMMITTEE_SIZE:
+            raise IndexError(index)
+        return memoryview(self.pubkeys_buffer)[index * BLS_PUBKEY_LENGTH:(index + 1) * BLS_PUBKEY_LENGTH]
+
+    def iter_pubkeys(self):
+        view = memoryview(self.pubkeys_buffer)
+        for offset in range(0, SYNC_COMMITTEE_SIZE * BLS_PUBKEY_LENGTH, BLS_PUBKEY_LENGTH):
+            yield view[offset:offset + BLS_PUBKEY_LENGTH]
+
+    def hex_pubkeys(self):
+        """
+        Return the pubkeys as 0x-prefixed hex strings
+        """
+        if self._hex_pubkeys is None:
+            self._hex_pubkeys = ['0x' + pubkey.hex() for pubkey in self.iter_pubkeys()]
+        return self._hex_pubkeys
+
+    def hex_aggregate_pubkey(self):
+        return '0x' + self.aggregate_pubkey.hex()
+
+    def to_view(self) -> SyncCommittee:
+        """
+        Return an equivalent remerkleable container, built anew on every call
+        """
+        return SyncCommittee.decode_bytes(self.pubkeys_buffer + self.aggregate_pubkey)
+
+    def hash_tree_root(self) -> Root:
+        if self._root is None:
+            # the container is only needed for hashing, its tree is released right after
+            self._root = Root(hash_tree_root(self.to_view()))
+        return self._root
+
+    def is_empty(self):
+        return not any(self.pubkeys_buffer) and not any(self.aggregate_pubkey)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactSyncCommittee):
+            return self.pubkeys_buffer == other.pubkeys_buffer and self.aggregate_pubkey == other.aggregate_pubkey
+        if isinstance(other, SyncCommittee):
+            return self.pubkeys_buffer + self.aggregate_pubkey == other.encode_bytes()
+        return NotImplemented
+
+    __hash__ = None
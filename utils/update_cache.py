@@ -0,0 +1,55 @@
+"""
+Local store of the light client updates of past sync committee periods.
+Once its period is over and finalized the best update of a period does not change anymore,
+so the raw beacon API payload is kept on disk (gzip compressed JSON, one file per period).
+"""
+import gzip
+import json
+import os
+
+
+class UpdateCache:
+    """
+    Raw light client updates keyed by sync committee period
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, period):
+        return os.path.join(self.directory, f'{int(period)}.json.gz')
+
+    def contains(self, period):
+        return os.path.exists(self.path(period))
+
+    def get(self, period):
+        """
+        Return the raw update of the given period, None if it is not stored
+        """
+        try:
+            with gzip.open(self.path(period), 'rt') as file:
+                update = json.load(file)
+        except (OSError, ValueError, EOFError):
+            # missing or damaged entry, fetch it again
+            self.misses += 1
+            return None
+        self.hits += 1
+        return update
+
+    def put(self, period, update):
+        """
+        Store the raw update of a period, the file is replaced atomically
+        """
+        path = self.path(period)
+        with gzip.open(path + '.tmp', 'wt') as file:
+            json.dump(update, file)
+        os.replace(path + '.tmp', path)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,85 @@
+"""
+Tracking of the sync committee updates proven and applied for each sync committee period.
+Close to the end of a period the relayer fetches the update of the period every epoch: a candidate is proven
+only if it is strictly better (see is_better_update) than the update already proven for its period.
+An update counts as proven once a destination chain applied it. Until its submissions complete it is in flight,
+and candidates must also be better than it; an update whose submissions all failed is proven again when it is fetched
+anew.
+"""
+import threading
+
+from utils.specs import LightClientUpdate, compute_sync_committee_period_at_slot, is_better_update
+
+
+def update_period(update: LightClientUpdate) -> int:
+    return int(compute_sync_committee_period_at_slot(update.attested_header.beacon.slot))
+
+
+class UpdateTracker:
+    """
+    Best update proven for each period, update in flight (proven, being submitted) for each period, and the periods
+    whose update has been applied by each destination chain.
+    Accessed by the prover and by the submitter threads, a lock serializes its use.
+    """
+
+    def __init__(self):
+        self.proven = {}
+        self.in_flight = {}
+        self.applied = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def is_candidate(self, update: LightClientUpdate) -> bool:
+        """
+        Check if the update is strictly better than the ones already proven or in flight for its period
+        """
+        with self.lock:
+            period = update_period(update)
+            for best in (self.proven.get(period), self.in_flight.get(period)):
+                if best is not None and not is_better_update(update, best):
+                    self.skipped += 1
+                    return False
+            return True
+
+    def mark_proven(self, update: LightClientUpdate) -> None:
+        with self.lock:
+            period = update_period(update)
+            best = self.proven.get(period)
+            if best is None or is_better_update(update, best):
+                self.proven[period] = update
+
+    def mark_in_flight(self, update: LightClientUpdate) -> None:
+        with self.lock:
+            period = update_period(update)
+            best = self.in_flight.get(period)
+            if best is None or is_better_update(update, best):
+                self.in_flight[period] = update
+
+    def clear_in_flight(self, update: LightClientUpdate) -> None:
+        """
+        Forget the update once its submissions completed, if a better one was not handed over in the meantime
+        """
+        with self.lock:
+            period = update_period(update)
+            if self.in_flight.get(period) is update:
+                del self.in_flight[period]
+
+    def mark_applied(self, chain, update: LightClientUpdate) -> None:
+        with self.lock:
+            self.applied.setdefault(chain, set()).add(update_period(update))
+
+    def is_applied(self, update: LightClientUpdate) -> bool:
+        """
+        Check if a destination chain applied an update of the period of the update
+        """
+        with self.lock:
+            return any(update_period(update) in periods for periods in self.applied.values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                'proven_periods': len(self.proven),
+                'in_flight': len(self.in_flight),
+                'applied_periods': {chain: len(periods) for chain, periods in self.applied.items()},
+                'skipped': self.skipped,
+            }